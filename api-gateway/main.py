@@ -1,21 +1,59 @@
 from fastapi import FastAPI, Request, Response, HTTPException, status, Depends
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import HTTPBearer
-from common.middleware import RequestIDMiddleware, REQUEST_ID_HEADER
+from fastapi.responses import StreamingResponse, ORJSONResponse
+from common.middleware import RequestContextMiddleware, REQUEST_ID_HEADER, request_id_var
 from common.errors import add_exception_handlers
-from common.responses import ok
+from common.responses import ok, if_none_match, not_modified
 from common.config import settings
-import httpx
-from fastapi_limiter import FastAPILimiter
-from fastapi_limiter.depends import RateLimiter
-import redis.asyncio as redis
+from common.upstream import UpstreamPool
+from common.cache import CACHE_INVALIDATE_HEADER, ResponseCache
+from common.jwt import INTERNAL_CLAIMS_HEADER, sign_internal_claims, verify_access_token
+from common.ratelimit import RateLimiter
+from common.singleflight import SingleFlight
 from common.logging import setup_logging
 from common.otel import setup_tracing
+from common.metrics import install_metrics, upstream_latency, UpstreamPoolCollector, RateLimiterCollector, SingleFlightCollector
+import re
+import time
+from functools import partial
 
 
-app = FastAPI(title="api-gateway", version="0.1.0")
-app.add_middleware(RequestIDMiddleware)
+app = FastAPI(title="api-gateway", version="0.1.0", default_response_class=ORJSONResponse)
+upstreams = UpstreamPool(
+    max_connections=settings.upstream_max_connections,
+    max_keepalive_connections=settings.upstream_max_keepalive_connections,
+    keepalive_expiry=settings.upstream_keepalive_expiry,
+    http2=settings.upstream_http2,
+    connect_timeout=settings.upstream_connect_timeout,
+    pool_timeout=settings.upstream_pool_timeout,
+    stream_max_connections=settings.upstream_stream_max_connections or None,
+)
+upstreams.register("users", settings.users_base_url, settings.users_timeout_seconds)
+upstreams.register("orders", settings.orders_base_url, settings.orders_timeout_seconds, streams=True)
+response_cache = (
+    ResponseCache(settings.redis_url, "gw:responses:v1", settings.gateway_cache_ttl_seconds) if settings.gateway_cache_enabled else None
+)
+# single-resource reads that the services tag with an ETag
+CACHEABLE_PATH = re.compile(r"^/api/v1/(orders/[0-9a-fA-F-]{36}|users/me)$")
+coalescer = SingleFlight(settings.gateway_singleflight_max_wait) if settings.gateway_singleflight_enabled else None
+# GETs that clients fan out in bursts; concurrent identical ones share one upstream request
+COALESCED_PATH = re.compile(r"^/api/v1/(orders/[0-9a-fA-F-]{36}|orders/stats|users/me)$")
+# unbounded responses (exports, SSE) are relayed chunk by chunk even when PROXY_STREAMING is off,
+# over the streaming client: they hold their connection for minutes and must not starve the pool
+STREAMED_PATH = re.compile(r"^/api/v1/orders/(export|events)$")
+limiter = RateLimiter(
+    settings.redis_url if settings.rate_limit_redis_sync else None,
+    sync_interval=settings.rate_limit_sync_interval,
+    workers=settings.web_concurrency,
+)
+app.add_middleware(RequestContextMiddleware, server_timing=settings.server_timing)
 add_exception_handlers(app)
+install_metrics(
+    app,
+    "api-gateway",
+    [UpstreamPoolCollector(upstreams), RateLimiterCollector(limiter)] + ([SingleFlightCollector(coalescer)] if coalescer else []),
+)
 
 if settings.cors_list:
     app.add_middleware(
@@ -29,31 +67,190 @@ if settings.cors_list:
 
 @app.on_event("startup")
 async def on_startup():
-    setup_logging("api-gateway")
+    setup_logging("api-gateway", queue_size=settings.log_queue_size, access_sample_rate=settings.log_access_sample_rate)
     setup_tracing(app, "api-gateway", settings.otel_exporter_otlp_endpoint)
-    r = redis.from_url(f"redis://{settings.redis_host}:{settings.redis_port}", encoding="utf-8", decode_responses=True)
-    await FastAPILimiter.init(r)
+    await upstreams.start()
+    await limiter.start()
+
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    await upstreams.aclose()
+    await limiter.aclose()
+    if response_cache is not None:
+        await response_cache.aclose()
 
 
 http_bearer = HTTPBearer(auto_error=False)
 
 
-def _auth_headers(request: Request) -> dict:
+async def verified_claims(creds = Depends(http_bearer)) -> dict:
+    if creds is None or not creds.credentials:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Not authenticated")
+    try:
+        return verify_access_token(creds.credentials)
+    except Exception:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
+
+
+def _auth_headers(request: Request, claims: dict | None = None) -> dict:
     headers = {}
     if request.headers.get("authorization"):
         headers["authorization"] = request.headers.get("authorization")
-    if request.headers.get(REQUEST_ID_HEADER):
-        headers[REQUEST_ID_HEADER] = request.headers.get(REQUEST_ID_HEADER)
+    # services trust this header instead of decoding the token again
+    if claims is not None and settings.internal_auth_secret:
+        headers[INTERNAL_CLAIMS_HEADER] = sign_internal_claims(claims, settings.internal_auth_secret)
+    # generated IDs are forwarded too, so upstream logs correlate with the gateway's
+    if request_id_var.get():
+        headers[REQUEST_ID_HEADER] = request_id_var.get()
     return headers
 
 
-async def _proxy(request: Request, base_url: str, path: str):
-    url = f"{base_url}{path}"
-    async with httpx.AsyncClient(timeout=30.0) as client:
-        method = request.method.lower()
+def _body_headers(request: Request) -> dict:
+    headers = {}
+    for name in ("content-type", "content-length"):
+        if request.headers.get(name):
+            headers[name] = request.headers.get(name)
+    return headers
+
+
+def _conditional_headers(request: Request) -> dict:
+    inm = request.headers.get("if-none-match")
+    return {"if-none-match": inm} if inm else {}
+
+
+def _response_headers(resp) -> dict:
+    return {k: v for k, v in resp.headers.items() if k.lower().startswith("content-") or k.lower() in ("etag", "cache-control")}
+
+
+def _has_body(request: Request) -> bool:
+    return "content-length" in request.headers or "transfer-encoding" in request.headers
+
+
+class UpstreamStreamingResponse(StreamingResponse):
+    """Relays an httpx streaming response and always returns its connection to the pool.
+
+    The close sits around the whole send, not in the body iterator: if the client is gone
+    before the body is first iterated, a generator's ``finally`` would never run.
+    """
+
+    def __init__(self, upstream, **kwargs):
+        super().__init__(upstream.aiter_raw(), **kwargs)
+        self.upstream = upstream
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            await self.upstream.aclose()
+
+
+async def _upstream_get(request: Request, upstream: str, path: str, claims: dict) -> tuple:
+    client = upstreams.client(upstream)
+    start = time.perf_counter()
+    # no If-None-Match upstream: the response may be cached or shared, so 304s are decided here
+    resp = await client.get(path, params=request.query_params.multi_items(), headers=_auth_headers(request, claims))
+    upstream_latency(upstream).observe(time.perf_counter() - start)
+    return resp.status_code, _response_headers(resp), resp.content
+
+
+async def _shared_get(request: Request, upstream: str, path: str, claims: dict, fetch) -> tuple:
+    if coalescer is None or not COALESCED_PATH.match(path):
+        return await fetch()
+    # roles are part of the key: a token minted after a role change must not get the old answer
+    key = (upstream, path, request.url.query, claims["sub"], tuple(claims.get("roles") or ()))
+    return await coalescer.do(key, fetch)
+
+
+def _get_response(request: Request, status_code: int, headers: dict, body: bytes) -> Response:
+    tag = headers.get("etag")
+    if status_code == 200 and tag is not None and if_none_match(request, tag):
+        return not_modified(tag)
+    return Response(content=body, status_code=status_code, headers=headers)
+
+
+async def _cached_get(request: Request, upstream: str, path: str, claims: dict):
+    user = claims["sub"]
+    target = f"{path}?{request.url.query}" if request.url.query else path
+    entry = await response_cache.get(user, target)
+    if entry is not None:
+        if if_none_match(request, entry["etag"]):
+            response = not_modified(entry["etag"])
+        else:
+            response = Response(
+                content=entry["body"],
+                media_type=entry["content_type"],
+                headers={"ETag": entry["etag"], "Cache-Control": "private, no-cache"},
+            )
+        response.headers["X-Cache"] = "HIT"
+        return response
+
+    async def fetch():
+        status_code, headers, body = await _upstream_get(request, upstream, path, claims)
+        if status_code == 200 and "etag" in headers:
+            # only the request that went upstream fills the cache
+            await response_cache.set(user, target, headers["etag"], headers.get("content-type", "application/json"), body.decode())
+        return status_code, headers, body
+
+    response = _get_response(request, *await _shared_get(request, upstream, path, claims, fetch))
+    response.headers["X-Cache"] = "MISS"
+    return response
+
+
+async def _invalidate(resp, claims: dict | None):
+    if response_cache is None or claims is None or resp.status_code >= 400:
+        return
+    others = [u for u in resp.headers.get(CACHE_INVALIDATE_HEADER, "").split(",") if u]
+    await response_cache.invalidate(claims["sub"], *others)
+
+
+async def _proxy(request: Request, upstream: str, path: str, claims: dict | None = None):
+    if response_cache is not None and claims is not None and request.method == "GET" and CACHEABLE_PATH.match(path):
+        return await _cached_get(request, upstream, path, claims)
+    if coalescer is not None and claims is not None and request.method == "GET" and COALESCED_PATH.match(path):
+        fetch = partial(_upstream_get, request, upstream, path, claims)
+        return _get_response(request, *await _shared_get(request, upstream, path, claims, fetch))
+    mutation = request.method not in ("GET", "HEAD")
+    client = upstreams.client(upstream, stream=STREAMED_PATH.match(path) is not None)
+    if not settings.proxy_streaming and not STREAMED_PATH.match(path):
         body = await request.body()
-        resp = await client.request(method, url, params=dict(request.query_params), content=body, headers=_auth_headers(request))
-        return Response(content=resp.content, status_code=resp.status_code, headers={k: v for k, v in resp.headers.items() if k.lower().startswith("content-")}, media_type=resp.headers.get("content-type"))
+        start = time.perf_counter()
+        resp = await client.request(
+            request.method,
+            path,
+            params=request.query_params.multi_items(),
+            content=body,
+            headers={**_auth_headers(request, claims), **_conditional_headers(request)},
+        )
+        upstream_latency(upstream).observe(time.perf_counter() - start)
+        if mutation:
+            await _invalidate(resp, claims)
+        return Response(content=resp.content, status_code=resp.status_code, headers=_response_headers(resp), media_type=resp.headers.get("content-type"))
+
+    # body chunks are relayed as they arrive, so memory per request is bounded by the chunk size
+    upstream_request = client.build_request(
+        request.method,
+        path,
+        params=request.query_params.multi_items(),
+        content=request.stream() if _has_body(request) else None,
+        # raw upstream bytes are relayed as-is, so only ask for encodings the client accepts
+        headers={
+            **_auth_headers(request, claims),
+            **_body_headers(request),
+            **_conditional_headers(request),
+            "accept-encoding": request.headers.get("accept-encoding", "identity"),
+        },
+    )
+    start = time.perf_counter()
+    resp = await client.send(upstream_request, stream=True)
+    upstream_latency(upstream).observe(time.perf_counter() - start)
+    if mutation:
+        try:
+            await _invalidate(resp, claims)
+        except BaseException:
+            await resp.aclose()
+            raise
+    return UpstreamStreamingResponse(resp, status_code=resp.status_code, headers=_response_headers(resp))
 
 
 @app.get("/health")
@@ -61,20 +258,43 @@ async def health():
     return ok({"status": "ok"})
 
 
-@app.api_route("/api/v1/auth/{path:path}", methods=["GET", "POST", "PUT", "PATCH", "DELETE"], dependencies=[Depends(RateLimiter(times=60, seconds=60))])
+@app.get("/health/upstreams")
+async def health_upstreams():
+    return ok(upstreams.stats())
+
+
+@app.get("/health/ratelimit")
+async def health_ratelimit():
+    return ok(limiter.stats())
+
+
+@app.get("/health/singleflight")
+async def health_singleflight():
+    return ok(coalescer.stats() if coalescer else {"enabled": False})
+
+
+PROXY_METHODS = ["GET", "POST", "PUT", "PATCH", "DELETE"]
+users_limit = Depends(limiter.dependency("users", settings.rate_limit_users, claims=verified_claims))
+orders_limit = Depends(limiter.dependency("orders", settings.rate_limit_orders, claims=verified_claims))
+
+
+def _upstream_path(prefix: str, path: str) -> str:
+    # collections live at the bare prefix; a trailing slash would only earn a redirect upstream
+    return f"{prefix}/{path}" if path else prefix
+
+
+@app.api_route("/api/v1/auth/{path:path}", methods=PROXY_METHODS, dependencies=[Depends(limiter.dependency("auth", settings.rate_limit_auth))])
 async def proxy_auth(request: Request, path: str):
-    return await _proxy(request, settings.users_base_url, f"/api/v1/auth/{path}")
+    return await _proxy(request, "users", f"/api/v1/auth/{path}")
 
 
-@app.api_route("/api/v1/users/{path:path}", methods=["GET", "POST", "PUT", "PATCH", "DELETE"], dependencies=[Depends(RateLimiter(times=120, seconds=60))])
-async def proxy_users(request: Request, path: str, creds = Depends(http_bearer)):
-    if creds is None or not creds.credentials:
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Not authenticated")
-    return await _proxy(request, settings.users_base_url, f"/api/v1/users/{path}")
+@app.api_route("/api/v1/users", methods=PROXY_METHODS, dependencies=[users_limit])
+@app.api_route("/api/v1/users/{path:path}", methods=PROXY_METHODS, dependencies=[users_limit])
+async def proxy_users(request: Request, path: str = "", claims: dict = Depends(verified_claims)):
+    return await _proxy(request, "users", _upstream_path("/api/v1/users", path), claims)
 
 
-@app.api_route("/api/v1/orders/{path:path}", methods=["GET", "POST", "PUT", "PATCH", "DELETE"], dependencies=[Depends(RateLimiter(times=120, seconds=60))])
-async def proxy_orders(request: Request, path: str, creds = Depends(http_bearer)):
-    if creds is None or not creds.credentials:
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Not authenticated")
-    return await _proxy(request, settings.orders_base_url, f"/api/v1/orders/{path}")
+@app.api_route("/api/v1/orders", methods=PROXY_METHODS, dependencies=[orders_limit])
+@app.api_route("/api/v1/orders/{path:path}", methods=PROXY_METHODS, dependencies=[orders_limit])
+async def proxy_orders(request: Request, path: str = "", claims: dict = Depends(verified_claims)):
+    return await _proxy(request, "orders", _upstream_path("/api/v1/orders", path), claims)
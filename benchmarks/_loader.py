@@ -0,0 +1,13 @@
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from common.launcher import import_app_module  # noqa: E402
+
+
+def load_service_module(service_dir: str, module: str = "main"):
+    """Import a module from a service directory (e.g. service-orders) as a package."""
+    return import_app_module(service_dir, module)
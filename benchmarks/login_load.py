@@ -0,0 +1,86 @@
+"""/users/me latency while a login storm runs against service-users.
+
+Registers a throwaway user, then runs --logins concurrent login loops and
+polls /users/me in parallel. Run it once per build to compare before/after:
+
+    python benchmarks/login_load.py --base-url http://localhost:8001 --logins 32 --duration 20
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+import uuid
+
+import httpx
+
+
+def _percentile(values: list[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct))]
+
+
+async def _login_loop(client: httpx.AsyncClient, creds: dict, deadline: float, stats: dict):
+    while time.monotonic() < deadline:
+        resp = await client.post("/api/v1/auth/login", json=creds)
+        stats[resp.status_code] = stats.get(resp.status_code, 0) + 1
+
+
+async def _poll_me(client: httpx.AsyncClient, token: str, deadline: float, latencies: list[float]):
+    headers = {"authorization": f"Bearer {token}"}
+    while time.monotonic() < deadline:
+        start = time.perf_counter()
+        resp = await client.get("/api/v1/users/me", headers=headers)
+        resp.raise_for_status()
+        latencies.append(time.perf_counter() - start)
+        await asyncio.sleep(0.01)
+
+
+async def run(base_url: str, logins: int, pollers: int, duration: float) -> dict:
+    creds = {"email": f"bench-{uuid.uuid4().hex[:8]}@example.com", "password": "bench-password"}
+    limits = httpx.Limits(max_connections=logins + pollers + 4)
+    async with httpx.AsyncClient(base_url=base_url, timeout=60.0, limits=limits) as client:
+        (await client.post("/api/v1/auth/register", json={**creds, "name": "bench"})).raise_for_status()
+        token = (await client.post("/api/v1/auth/login", json=creds)).json()["access_token"]
+
+        idle: list[float] = []
+        await _poll_me(client, token, time.monotonic() + min(duration, 5.0), idle)
+
+        loaded: list[float] = []
+        login_status: dict = {}
+        deadline = time.monotonic() + duration
+        await asyncio.gather(
+            *(_login_loop(client, creds, deadline, login_status) for _ in range(logins)),
+            *(_poll_me(client, token, deadline, loaded) for _ in range(pollers)),
+        )
+
+    def summary(values: list[float]) -> dict:
+        return {
+            "count": len(values),
+            "p50_ms": round(statistics.median(values) * 1000, 2) if values else None,
+            "p99_ms": round(_percentile(values, 0.99) * 1000, 2),
+            "max_ms": round(max(values) * 1000, 2) if values else None,
+        }
+
+    return {
+        "logins_concurrency": logins,
+        "users_me_idle": summary(idle),
+        "users_me_under_login_load": summary(loaded),
+        "login_status_counts": login_status,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--base-url", default="http://localhost:8001")
+    parser.add_argument("--logins", type=int, default=32)
+    parser.add_argument("--pollers", type=int, default=4)
+    parser.add_argument("--duration", type=float, default=20.0)
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(run(args.base_url, args.logins, args.pollers, args.duration)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
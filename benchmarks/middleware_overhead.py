@@ -0,0 +1,97 @@
+"""Per-request overhead of the request-ID middleware, measured in-process.
+
+Drives a minimal FastAPI app with the same middleware stack as the gateway and
+services (request ID + error handlers) straight through ASGI, with no network:
+
+  none          - no request-ID middleware
+  base_http     - the previous BaseHTTPMiddleware implementation
+  pure_asgi     - common.middleware.RequestContextMiddleware
+
+    python benchmarks/middleware_overhead.py --requests 20000
+"""
+import argparse
+import asyncio
+import json
+import sys
+import time
+import uuid
+from pathlib import Path
+
+from fastapi import FastAPI
+from starlette.middleware.base import BaseHTTPMiddleware
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from common.errors import add_exception_handlers  # noqa: E402
+from common.middleware import REQUEST_ID_HEADER, RequestContextMiddleware  # noqa: E402
+from common.responses import ok  # noqa: E402
+
+
+class BaseHTTPRequestIDMiddleware(BaseHTTPMiddleware):
+    async def dispatch(self, request, call_next):
+        req_id = request.headers.get(REQUEST_ID_HEADER) or str(uuid.uuid4())
+        request.state.request_id = req_id
+        response = await call_next(request)
+        response.headers[REQUEST_ID_HEADER] = req_id
+        return response
+
+
+def _make_app(middleware) -> FastAPI:
+    app = FastAPI()
+    if middleware is not None:
+        app.add_middleware(middleware)
+    add_exception_handlers(app)
+
+    @app.get("/health")
+    async def health():
+        return ok({"status": "ok"})
+
+    return app
+
+
+async def _drive(app, requests: int) -> float:
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": "/health",
+        "raw_path": b"/health",
+        "query_string": b"",
+        "root_path": "",
+        "headers": [(b"host", b"bench")],
+        "client": ("127.0.0.1", 1234),
+        "server": ("bench", 80),
+    }
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        pass
+
+    for _ in range(200):
+        await app(dict(scope), receive, send)
+    start = time.perf_counter()
+    for _ in range(requests):
+        await app(dict(scope), receive, send)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=20000)
+    args = parser.parse_args()
+    variants = {"none": None, "base_http": BaseHTTPRequestIDMiddleware, "pure_asgi": RequestContextMiddleware}
+    results = {}
+    for name, middleware in variants.items():
+        elapsed = asyncio.run(_drive(_make_app(middleware), args.requests))
+        results[name] = {"us_per_request": round(elapsed / args.requests * 1e6, 2)}
+    baseline = results["none"]["us_per_request"]
+    for stats in results.values():
+        stats["overhead_us"] = round(stats["us_per_request"] - baseline, 2)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""Orders per second: single POST /orders versus POST /orders/bulk.
+
+Talks to a running service-orders. The token is minted locally with the
+shared JWT settings (JWT_SECRET / JWT_ALGORITHM), so --user-id must be an
+existing users.users id.
+
+    python benchmarks/orders_bulk.py --base-url http://localhost:8002 --user-id <uuid> --orders 2000 --batch 500
+"""
+import argparse
+import asyncio
+import json
+import sys
+import time
+from pathlib import Path
+
+import httpx
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from common.config import settings  # noqa: E402
+from common.jwt import make_access_token, signing_key  # noqa: E402
+
+ITEMS = [{"sku": "SKU-1", "qty": 2, "price": 9.99}, {"sku": "SKU-2", "qty": 1, "price": 100.0}]
+
+
+async def _single(client: httpx.AsyncClient, total: int, concurrency: int) -> float:
+    queue = iter(range(total))
+
+    async def worker():
+        for _ in queue:
+            (await client.post("/api/v1/orders", json={"items": ITEMS})).raise_for_status()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return time.perf_counter() - start
+
+
+async def _bulk(client: httpx.AsyncClient, total: int, batch: int) -> float:
+    start = time.perf_counter()
+    for offset in range(0, total, batch):
+        orders = [{"items": ITEMS} for _ in range(min(batch, total - offset))]
+        resp = await client.post("/api/v1/orders/bulk", json={"orders": orders})
+        resp.raise_for_status()
+        assert resp.json()["data"]["failed"] == 0
+    return time.perf_counter() - start
+
+
+async def run(args) -> dict:
+    token = make_access_token(args.user_id, [], signing_key(), settings.jwt_algorithm, 3600)
+    headers = {"authorization": f"Bearer {token}"}
+    async with httpx.AsyncClient(base_url=args.base_url, headers=headers, timeout=120.0) as client:
+        single = await _single(client, args.orders, args.concurrency)
+        bulk = await _bulk(client, args.orders, args.batch)
+    return {
+        "orders": args.orders,
+        "single": {"seconds": round(single, 3), "orders_per_sec": round(args.orders / single, 1), "concurrency": args.concurrency},
+        "bulk": {"seconds": round(bulk, 3), "orders_per_sec": round(args.orders / bulk, 1), "batch": args.batch},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--base-url", default="http://localhost:8002")
+    parser.add_argument("--user-id", required=True)
+    parser.add_argument("--orders", type=int, default=2000)
+    parser.add_argument("--batch", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=16)
+    print(json.dumps(asyncio.run(run(parser.parse_args())), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""Gateway RSS and latency versus payload size.
+
+Starts an echo upstream and the api-gateway as local uvicorn processes, posts
+payloads of increasing size through /api/v1/orders/... and reports latency and
+gateway memory for each size.
+
+    python benchmarks/proxy_streaming.py --sizes 64K,1M,16M,64M --repeat 5
+    PROXY_STREAMING=false python benchmarks/proxy_streaming.py   # buffered baseline
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+import uuid
+from pathlib import Path
+
+import httpx
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+from common.config import settings  # noqa: E402
+from common.jwt import make_access_token, signing_key  # noqa: E402
+
+UPSTREAM_PORT = 18902
+GATEWAY_PORT = 18980
+
+
+async def upstream_app(scope, receive, send):
+    # echoes the request body back chunk by chunk
+    if scope["type"] != "http":
+        return
+    await send({"type": "http.response.start", "status": 200, "headers": [(b"content-type", b"application/octet-stream")]})
+    more = True
+    while more:
+        message = await receive()
+        more = message.get("more_body", False)
+        await send({"type": "http.response.body", "body": message.get("body", b""), "more_body": True})
+    await send({"type": "http.response.body", "body": b""})
+
+
+def _parse_size(value: str) -> int:
+    units = {"K": 1024, "M": 1024 ** 2, "G": 1024 ** 3}
+    value = value.strip().upper()
+    if value[-1] in units:
+        return int(value[:-1]) * units[value[-1]]
+    return int(value)
+
+
+def _rss_kb(pid: int) -> dict:
+    out = {}
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith(("VmRSS", "VmHWM")):
+                key, val = line.split(":", 1)
+                out[key] = int(val.split()[0])
+    return out
+
+
+def _spawn(args: list[str], env: dict) -> subprocess.Popen:
+    return subprocess.Popen([sys.executable, "-m", "uvicorn", *args, "--log-level", "warning"], env=env, cwd=ROOT)
+
+
+def _wait_ready(url: str, timeout: float = 15.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            httpx.get(url, timeout=1.0)
+            return
+        except httpx.TransportError:
+            time.sleep(0.2)
+    raise RuntimeError(f"{url} did not come up")
+
+
+def _payload(size: int):
+    chunk = b"x" * 65536
+    sent = 0
+    while sent < size:
+        part = chunk[: size - sent]
+        sent += len(part)
+        yield part
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="64K,1M,16M,64M")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    env = {**os.environ, "PYTHONPATH": str(ROOT)}
+    env["USERS_BASE_URL"] = env["ORDERS_BASE_URL"] = f"http://127.0.0.1:{UPSTREAM_PORT}"
+    upstream = _spawn(["benchmarks.proxy_streaming:upstream_app", "--port", str(UPSTREAM_PORT)], env)
+    gateway = _spawn(["main:app", "--app-dir", "api-gateway", "--port", str(GATEWAY_PORT)], env)
+    try:
+        _wait_ready(f"http://127.0.0.1:{GATEWAY_PORT}/health")
+        results = []
+        # the gateway verifies bearer tokens, so sign one with the same key it is configured with
+        token = make_access_token(str(uuid.uuid4()), [], signing_key(), settings.jwt_algorithm, 3600)
+        with httpx.Client(base_url=f"http://127.0.0.1:{GATEWAY_PORT}", timeout=120.0) as client:
+            for size in (_parse_size(s) for s in args.sizes.split(",")):
+                latencies = []
+                for _ in range(args.repeat):
+                    start = time.perf_counter()
+                    with client.stream(
+                        "POST",
+                        "/api/v1/orders/echo",
+                        content=_payload(size),
+                        headers={"authorization": f"Bearer {token}", "content-length": str(size)},
+                    ) as resp:
+                        received = sum(len(c) for c in resp.iter_raw())
+                    latencies.append(time.perf_counter() - start)
+                    assert received == size, (received, size)
+                mem = _rss_kb(gateway.pid)
+                results.append({
+                    "streaming": os.getenv("PROXY_STREAMING", "true"),
+                    "payload_bytes": size,
+                    "latency_ms_p50": round(statistics.median(latencies) * 1000, 2),
+                    "latency_ms_max": round(max(latencies) * 1000, 2),
+                    "gateway_rss_kb": mem.get("VmRSS"),
+                    "gateway_peak_rss_kb": mem.get("VmHWM"),
+                })
+                print(json.dumps(results[-1]))
+    finally:
+        gateway.terminate()
+        upstream.terminate()
+        gateway.wait()
+        upstream.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""Response encode time per page size for GET /api/v1/orders.
+
+Compares the previous path (OrderOut.model_dump() per row, then FastAPI's
+jsonable_encoder and stdlib json) against common.responses.ok_json, which
+hands the pydantic models to orjson and lets them serialize straight to bytes.
+
+    python benchmarks/response_encode.py --sizes 10,20,50,100 --rounds 500
+"""
+import argparse
+import json
+import sys
+import timeit
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+
+from fastapi.encoders import jsonable_encoder
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from _loader import load_service_module  # noqa: E402
+
+schemas = load_service_module("service-orders", "schemas")
+from common.responses import ok, ok_json  # noqa: E402
+
+
+class _Row:
+    def __init__(self, n_items: int):
+        self.id = uuid.uuid4()
+        self.user_id = uuid.uuid4()
+        self.items = [{"sku": f"SKU-{i}", "qty": i + 1, "price": 10.5 + i} for i in range(n_items)]
+        self.status = "created"
+        self.total_amount = 123.45
+        self.created_at = datetime.now(timezone.utc)
+
+
+def _old(rows):
+    items = [schemas.OrderOut.model_validate(o).model_dump() for o in rows]
+    body = jsonable_encoder(ok({"items": items, "total": len(rows), "page": 1, "size": len(rows)}))
+    return json.dumps(body).encode()
+
+
+def _new(rows):
+    items = [schemas.OrderOut.model_validate(o) for o in rows]
+    return ok_json({"items": items, "total": len(rows), "page": 1, "size": len(rows)}).body
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="10,20,50,100")
+    parser.add_argument("--items-per-order", type=int, default=5)
+    parser.add_argument("--rounds", type=int, default=500)
+    args = parser.parse_args()
+    results = []
+    for size in (int(s) for s in args.sizes.split(",")):
+        rows = [_Row(args.items_per_order) for _ in range(size)]
+        assert json.loads(_old(rows)) == json.loads(_new(rows))
+        old = min(timeit.repeat(lambda: _old(rows), number=args.rounds, repeat=3)) / args.rounds
+        new = min(timeit.repeat(lambda: _new(rows), number=args.rounds, repeat=3)) / args.rounds
+        results.append({
+            "page_size": size,
+            "old_us": round(old * 1e6, 1),
+            "orjson_us": round(new * 1e6, 1),
+            "speedup": round(old / new, 2),
+        })
+        print(json.dumps(results[-1]))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,405 @@
+"""End-to-end load benchmark: gateway + both services as local processes.
+
+Starts service-users, service-orders and api-gateway through common.launcher,
+seeds users and orders through the public API, then runs each scenario for
+--duration seconds with --concurrency clients against the gateway:
+
+  login_storm      POST /auth/login with a pool of seeded users
+  me_polling       GET  /users/me (add --etag to revalidate with If-None-Match)
+  order_create     POST /orders
+  deep_pagination  GET  /orders at a deep offset, and a keyset walk with cursors
+  admin_search     GET  /users?q=... as an admin
+
+Per route it reports requests, errors, throughput and p50/p95/p99 latency, and
+writes everything to --out as JSON. --compare prints the change against an
+earlier report.
+
+Stand-ins: --redis fake serves Redis from fakeredis in this process;
+--postgres local runs initdb/pg_ctl (from PATH or --pg-bin) for a throwaway
+cluster in a temp dir and applies docker/init.sql plus both services'
+migrations. Otherwise POSTGRES_* / REDIS_* from the environment are used
+as they are.
+
+    python benchmarks/suite.py --postgres local --redis fake --out baseline.json
+    python benchmarks/suite.py --postgres local --redis fake --env GATEWAY_CACHE_ENABLED=true \\
+        --out cache.json --compare baseline.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from contextlib import ExitStack, contextmanager
+from pathlib import Path
+
+import httpx
+
+ROOT = Path(__file__).resolve().parents[1]
+SCENARIOS = ("login_storm", "me_polling", "order_create", "deep_pagination", "admin_search")
+PASSWORD = "bench-password"
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _percentile(ordered: list[float], pct: float) -> float:
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct))]
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies: dict[str, list[float]] = {}
+        self.errors: dict[str, int] = {}
+
+    def record(self, route: str, seconds: float, ok: bool):
+        self.latencies.setdefault(route, []).append(seconds)
+        if not ok:
+            self.errors[route] = self.errors.get(route, 0) + 1
+
+    def summary(self, elapsed: float) -> dict:
+        out = {}
+        for route, values in self.latencies.items():
+            ordered = sorted(values)
+            out[route] = {
+                "requests": len(ordered),
+                "errors": self.errors.get(route, 0),
+                "rps": round(len(ordered) / elapsed, 1),
+                "p50_ms": round(_percentile(ordered, 0.50) * 1000, 2),
+                "p95_ms": round(_percentile(ordered, 0.95) * 1000, 2),
+                "p99_ms": round(_percentile(ordered, 0.99) * 1000, 2),
+                "max_ms": round(ordered[-1] * 1000, 2),
+            }
+        return out
+
+
+# --- stand-ins -----------------------------------------------------------------
+
+
+@contextmanager
+def fake_redis():
+    from fakeredis import TcpFakeServer
+
+    port = _free_port()
+    server = TcpFakeServer(("127.0.0.1", port), server_type="redis")
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield {"REDIS_HOST": "127.0.0.1", "REDIS_PORT": str(port)}
+    finally:
+        server.shutdown()
+
+
+@contextmanager
+def local_postgres(pg_bin: str | None):
+    def tool(name: str) -> str:
+        path = os.path.join(pg_bin, name) if pg_bin else shutil.which(name)
+        if not path:
+            raise SystemExit(f"{name} not found; pass --pg-bin or use --postgres env")
+        return path
+
+    datadir = tempfile.mkdtemp(prefix="bench-pg-")
+    port = _free_port()
+    user = "bench"
+    subprocess.run([tool("initdb"), "-D", datadir, "-U", user, "--auth=trust", "-E", "UTF8"], check=True, capture_output=True)
+    subprocess.run(
+        [tool("pg_ctl"), "-D", datadir, "-l", os.path.join(datadir, "log"), "-w", "start",
+         "-o", f"-p {port} -k {datadir} -c listen_addresses=127.0.0.1 -c fsync=off -c max_connections=300"],
+        check=True,
+        capture_output=True,
+    )
+    try:
+        subprocess.run(
+            [tool("createdb"), "-h", "127.0.0.1", "-p", str(port), "-U", user, "bench"], check=True, capture_output=True
+        )
+        yield {
+            "POSTGRES_HOST": "127.0.0.1",
+            "POSTGRES_PORT": str(port),
+            "POSTGRES_DB": "bench",
+            "POSTGRES_USER": user,
+            "POSTGRES_PASSWORD": "",
+            "_PSQL": tool("psql"),
+        }
+    finally:
+        subprocess.run([tool("pg_ctl"), "-D", datadir, "-m", "fast", "stop"], capture_output=True)
+        shutil.rmtree(datadir, ignore_errors=True)
+
+
+def migrate(env: dict):
+    psql = env.pop("_PSQL")
+    subprocess.run(
+        [psql, "-h", env["POSTGRES_HOST"], "-p", env["POSTGRES_PORT"], "-U", env["POSTGRES_USER"], "-d", env["POSTGRES_DB"],
+         "-v", "ON_ERROR_STOP=1", "-f", str(ROOT / "docker" / "init.sql")],
+        check=True,
+        capture_output=True,
+    )
+    # orders reference users.users, so users goes first
+    for service in ("service-users", "service-orders"):
+        subprocess.run(
+            [sys.executable, "-m", "alembic", "upgrade", "head"],
+            cwd=ROOT / service,
+            env={**os.environ, **env, "PYTHONPATH": str(ROOT)},
+            check=True,
+        )
+
+
+# --- stack -----------------------------------------------------------------------
+
+
+@contextmanager
+def run_stack(env: dict, workers: int, log_dir: Path):
+    ports = {name: _free_port() for name in ("service-users", "service-orders", "api-gateway")}
+    env = {
+        **os.environ,
+        **env,
+        "PYTHONPATH": str(ROOT),
+        "USERS_BASE_URL": f"http://127.0.0.1:{ports['service-users']}",
+        "ORDERS_BASE_URL": f"http://127.0.0.1:{ports['service-orders']}",
+    }
+    procs = []
+    try:
+        for name, port in ports.items():
+            log = open(log_dir / f"{name}.log", "wb")
+            procs.append(
+                subprocess.Popen(
+                    [sys.executable, "-m", "common.launcher", name, "--host", "127.0.0.1", "--port", str(port), "--workers", str(workers)],
+                    cwd=ROOT,
+                    env=env,
+                    stdout=log,
+                    stderr=subprocess.STDOUT,
+                )
+            )
+        for name, port in ports.items():
+            _wait_healthy(f"http://127.0.0.1:{port}/health", name)
+        yield f"http://127.0.0.1:{ports['api-gateway']}"
+    finally:
+        for proc in procs:
+            proc.terminate()
+        for proc in procs:
+            try:
+                proc.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+
+
+def _wait_healthy(url: str, name: str, timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(url, timeout=1.0).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise SystemExit(f"{name} did not become healthy at {url}")
+
+
+# --- seeding and scenarios ----------------------------------------------------------
+
+
+async def _register(client: httpx.AsyncClient, roles: list[str]) -> dict:
+    creds = {"email": f"bench-{uuid.uuid4().hex[:12]}@example.com", "password": PASSWORD}
+    resp = await client.post("/api/v1/auth/register", json={**creds, "name": "Bench User", "roles": roles})
+    resp.raise_for_status()
+    resp = await client.post("/api/v1/auth/login", json=creds)
+    resp.raise_for_status()
+    return {**creds, "token": resp.json()["access_token"]}
+
+
+async def seed(client: httpx.AsyncClient, users: int, orders: int) -> dict:
+    accounts = await asyncio.gather(*(_register(client, ["engineer"]) for _ in range(users)))
+    admin = await _register(client, ["admin"])
+    owner = accounts[0]
+    headers = {"authorization": f"Bearer {owner['token']}"}
+    batch = [{"items": [{"sku": f"SKU-{i % 50}", "qty": 1 + i % 3, "price": 9.99}]} for i in range(500)]
+    for _ in range(0, orders, len(batch)):
+        resp = await client.post("/api/v1/orders/bulk", json={"orders": batch}, headers=headers)
+        resp.raise_for_status()
+    return {"accounts": accounts, "admin": admin, "owner": owner}
+
+
+async def _timed(client, recorder: Recorder, route: str, method: str, url: str, **kwargs) -> httpx.Response:
+    start = time.perf_counter()
+    try:
+        resp = await client.request(method, url, **kwargs)
+    except httpx.HTTPError:
+        recorder.record(route, time.perf_counter() - start, False)
+        raise
+    recorder.record(route, time.perf_counter() - start, resp.status_code < 400)
+    return resp
+
+
+async def login_storm(client, recorder, fixtures, worker: int, args):
+    account = fixtures["accounts"][worker % len(fixtures["accounts"])]
+    await _timed(client, recorder, "POST /auth/login", "POST", "/api/v1/auth/login",
+                 json={"email": account["email"], "password": account["password"]})
+
+
+async def me_polling(client, recorder, fixtures, worker: int, args):
+    account = fixtures["accounts"][worker % len(fixtures["accounts"])]
+    etags = fixtures.setdefault("etags", {})
+    headers = {"authorization": f"Bearer {account['token']}"}
+    if args.etag and worker in etags:
+        headers["if-none-match"] = etags[worker]
+    resp = await _timed(client, recorder, "GET /users/me", "GET", "/api/v1/users/me", headers=headers)
+    if resp.headers.get("etag"):
+        etags[worker] = resp.headers["etag"]
+
+
+async def order_create(client, recorder, fixtures, worker: int, args):
+    account = fixtures["accounts"][worker % len(fixtures["accounts"])]
+    body = {"items": [{"sku": f"SKU-{worker % 50}", "qty": 2, "price": 19.5}, {"sku": "SKU-X", "qty": 1, "price": 5}]}
+    await _timed(client, recorder, "POST /orders", "POST", "/api/v1/orders",
+                 json=body, headers={"authorization": f"Bearer {account['token']}"})
+
+
+async def deep_pagination(client, recorder, fixtures, worker: int, args):
+    headers = {"authorization": f"Bearer {fixtures['owner']['token']}"}
+    deep_page = max(1, args.orders // 20 - 1)
+    await _timed(client, recorder, "GET /orders?page=deep", "GET", "/api/v1/orders",
+                 params={"page": deep_page, "size": 20}, headers=headers)
+    cursor = ""
+    for _ in range(args.keyset_pages):
+        resp = await _timed(client, recorder, "GET /orders?cursor", "GET", "/api/v1/orders",
+                            params={"cursor": cursor, "size": 20}, headers=headers)
+        cursor = (resp.json().get("data") or {}).get("next_cursor") if resp.status_code == 200 else None
+        if not cursor:
+            break
+
+
+async def admin_search(client, recorder, fixtures, worker: int, args):
+    headers = {"authorization": f"Bearer {fixtures['admin']['token']}"}
+    term = ("bench", "user", "example", "zz-no-match")[worker % 4]
+    await _timed(client, recorder, "GET /users?q", "GET", "/api/v1/users", params={"q": term, "size": 20}, headers=headers)
+
+
+async def run_scenario(base_url: str, name: str, fixtures: dict, args) -> dict:
+    step = globals()[name]
+    recorder = Recorder()
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30.0) as client:
+        deadline = time.monotonic() + args.duration
+
+        async def worker(i: int):
+            while time.monotonic() < deadline:
+                try:
+                    await step(client, recorder, fixtures, i, args)
+                except httpx.HTTPError:
+                    pass
+
+        start = time.monotonic()
+        await asyncio.gather(*(worker(i) for i in range(args.concurrency)))
+        elapsed = time.monotonic() - start
+    return recorder.summary(elapsed)
+
+
+# --- reporting ---------------------------------------------------------------------
+
+
+def _git_revision() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def compare(current: dict, baseline: dict) -> list[str]:
+    lines = [f"{'scenario / route':<48} {'rps':>16} {'p50 ms':>18} {'p99 ms':>18}"]
+    for scenario, routes in current["scenarios"].items():
+        for route, now in routes.items():
+            before = baseline.get("scenarios", {}).get(scenario, {}).get(route)
+            if before is None:
+                continue
+
+            def cell(key: str) -> str:
+                delta = (now[key] - before[key]) / before[key] * 100 if before[key] else 0.0
+                return f"{before[key]:>7} -> {now[key]:<7} {delta:+.0f}%"
+
+            lines.append(f"{scenario + ' / ' + route:<48} {cell('rps'):>16} {cell('p50_ms'):>18} {cell('p99_ms'):>18}")
+    return lines
+
+
+async def _main(args, base_url: str) -> dict:
+    async with httpx.AsyncClient(base_url=base_url, timeout=60.0) as client:
+        fixtures = await seed(client, args.users, args.orders)
+    report = {}
+    for name in args.scenarios:
+        report[name] = await run_scenario(base_url, name, fixtures, args)
+        print(f"{name}: {json.dumps(report[name])}", file=sys.stderr)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--duration", type=float, default=15.0)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers per app")
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--orders", type=int, default=5000)
+    parser.add_argument("--keyset-pages", type=int, default=10)
+    parser.add_argument("--etag", action="store_true", help="revalidate /users/me with If-None-Match")
+    parser.add_argument("--postgres", choices=["env", "local"], default="env")
+    parser.add_argument("--pg-bin", default=None)
+    parser.add_argument("--redis", choices=["env", "fake"], default="env")
+    parser.add_argument("--env", action="append", default=[], metavar="KEY=VALUE", help="extra settings for all three apps")
+    parser.add_argument("--out", default="benchmark-report.json")
+    parser.add_argument("--compare", default=None, metavar="BASELINE")
+    args = parser.parse_args()
+    args.scenarios = [s for s in args.scenarios.split(",") if s]
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+
+    extra = dict(item.split("=", 1) for item in args.env)
+    # the benchmark measures the apps, not the limiter's rejections
+    env = {
+        "RATE_LIMIT_AUTH": "1000000/1",
+        "RATE_LIMIT_USERS": "1000000/1",
+        "RATE_LIMIT_ORDERS": "1000000/1",
+        "WEB_ACCESS_LOG": "false",
+        "LOG_ACCESS_SAMPLE_RATE": "0",
+        **extra,
+    }
+    with ExitStack() as stack, tempfile.TemporaryDirectory(prefix="bench-logs-") as log_dir:
+        if args.redis == "fake":
+            env.update(stack.enter_context(fake_redis()))
+        if args.postgres == "local":
+            env.update(stack.enter_context(local_postgres(args.pg_bin)))
+            migrate(env)
+        base_url = stack.enter_context(run_stack(env, args.workers, Path(log_dir)))
+        scenarios = asyncio.run(_main(args, base_url))
+
+    report = {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "revision": _git_revision(),
+        "config": {
+            "duration": args.duration,
+            "concurrency": args.concurrency,
+            "workers": args.workers,
+            "users": args.users,
+            "orders": args.orders,
+            "etag": args.etag,
+            "env": extra,
+        },
+        "scenarios": scenarios,
+    }
+    Path(args.out).write_text(json.dumps(report, indent=2))
+    print(json.dumps(report, indent=2))
+    if args.compare:
+        print("\n".join(compare(report, json.loads(Path(args.compare).read_text()))), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
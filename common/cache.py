@@ -0,0 +1,139 @@
+import hashlib
+import json
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+import redis.asyncio as redis
+
+
+logger = logging.getLogger(__name__)
+
+
+class TokenCache:
+    """In-process LRU of decoded JWT claims keyed by token hash.
+
+    An entry never outlives the token's own ``exp`` (nor ``max_ttl`` seconds).
+    """
+
+    def __init__(self, maxsize: int = 10000, max_ttl: float = 300.0):
+        self.maxsize = maxsize
+        self.max_ttl = max_ttl
+        self._data: "OrderedDict[bytes, tuple[float, Dict[str, Any]]]" = OrderedDict()
+
+    @staticmethod
+    def _key(token: str) -> bytes:
+        return hashlib.sha256(token.encode()).digest()
+
+    def get(self, token: str) -> Optional[Dict[str, Any]]:
+        key = self._key(token)
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        expires_at, claims = entry
+        if expires_at <= time.time():
+            del self._data[key]
+            return None
+        self._data.move_to_end(key)
+        return claims
+
+    def put(self, token: str, claims: Dict[str, Any]):
+        expires_at = time.time() + self.max_ttl
+        if isinstance(claims.get("exp"), (int, float)):
+            expires_at = min(expires_at, claims["exp"])
+        key = self._key(token)
+        self._data[key] = (expires_at, claims)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def clear(self):
+        self._data.clear()
+
+
+class RedisCache:
+    """TTL-bounded JSON cache in Redis. Fails open: Redis errors read as misses."""
+
+    def __init__(self, url: str, prefix: str, ttl: int):
+        self.prefix = prefix
+        self.ttl = ttl
+        self._redis = redis.from_url(url, encoding="utf-8", decode_responses=True)
+
+    def _key(self, key: str) -> str:
+        return f"{self.prefix}:{key}"
+
+    async def get(self, key: str) -> Optional[Any]:
+        try:
+            raw = await self._redis.get(self._key(key))
+        except redis.RedisError as exc:
+            logger.warning("cache get failed: %s", exc)
+            return None
+        return json.loads(raw) if raw is not None else None
+
+    async def set(self, key: str, value: Any):
+        try:
+            await self._redis.set(self._key(key), json.dumps(value), ex=self.ttl)
+        except redis.RedisError as exc:
+            logger.warning("cache set failed: %s", exc)
+
+    async def delete(self, key: str):
+        try:
+            await self._redis.delete(self._key(key))
+        except redis.RedisError as exc:
+            logger.warning("cache delete failed: %s", exc)
+
+    async def aclose(self):
+        await self._redis.aclose()
+
+
+CACHE_INVALIDATE_HEADER = "X-Cache-Invalidate"
+
+
+class ResponseCache:
+    """Per-user cache of upstream GET responses, one Redis hash per user.
+
+    Fields are request targets (path and query). Entries carry their store time and
+    are served for ``ttl`` seconds; dropping the hash invalidates everything cached
+    for that user at once. Fails open like RedisCache.
+    """
+
+    def __init__(self, url: str, prefix: str, ttl: float):
+        self.prefix = prefix
+        self.ttl = ttl
+        self._redis = redis.from_url(url, encoding="utf-8", decode_responses=True)
+
+    def _key(self, user: str) -> str:
+        return f"{self.prefix}:{user}"
+
+    async def get(self, user: str, target: str) -> Optional[Dict[str, Any]]:
+        try:
+            raw = await self._redis.hget(self._key(user), target)
+        except redis.RedisError as exc:
+            logger.warning("response cache get failed: %s", exc)
+            return None
+        if raw is None:
+            return None
+        entry = json.loads(raw)
+        return entry if time.time() - entry["stored_at"] < self.ttl else None
+
+    async def set(self, user: str, target: str, etag: str, content_type: str, body: str):
+        entry = {"stored_at": time.time(), "etag": etag, "content_type": content_type, "body": body}
+        try:
+            async with self._redis.pipeline(transaction=False) as pipe:
+                pipe.hset(self._key(user), target, json.dumps(entry))
+                # the hash outlives its freshest entry only briefly; stale fields are overwritten or dropped with it
+                pipe.expire(self._key(user), max(1, int(self.ttl * 2)))
+                await pipe.execute()
+        except redis.RedisError as exc:
+            logger.warning("response cache set failed: %s", exc)
+
+    async def invalidate(self, *users: str):
+        if not users:
+            return
+        try:
+            await self._redis.delete(*(self._key(u) for u in users))
+        except redis.RedisError as exc:
+            logger.warning("response cache invalidate failed: %s", exc)
+
+    async def aclose(self):
+        await self._redis.aclose()
@@ -10,6 +10,16 @@ class Settings(BaseSettings):
     jwt_secret: str = Field(default="dev-secret-change")
     jwt_algorithm: str = Field(default="HS256")
     jwt_expires_seconds: int = Field(default=86400)
+    jwt_cache_size: int = Field(default=10000)
+    jwt_cache_ttl_seconds: float = Field(default=300.0)
+    # PEM text or file paths, used instead of jwt_secret for RS*/ES*/EdDSA
+    jwt_private_key: str | None = Field(default=None)
+    jwt_public_key: str | None = Field(default=None)
+    internal_auth_secret: str | None = Field(default=None)
+
+    bcrypt_rounds: int = Field(default=12)
+    password_hash_workers: int = Field(default=4)
+    password_hash_max_pending: int = Field(default=32)
 
     cors_origins: str | None = Field(default="*")
 
@@ -19,13 +29,85 @@ class Settings(BaseSettings):
     postgres_user: str = Field(default="control")
     postgres_password: str = Field(default="controlpwd")
 
+    # per service instance; split evenly over its WEB_CONCURRENCY workers (see Database.from_settings)
+    db_pool_size: int = Field(default=10)
+    db_max_overflow: int = Field(default=10)
+    db_pool_timeout: float = Field(default=30.0)
+    db_pool_recycle: int = Field(default=1800)
+    db_pool_pre_ping: bool = Field(default=False)
+    db_liveness_interval: float = Field(default=30.0)
+    db_statement_cache_size: int = Field(default=100)
+    db_statement_timeout_ms: int = Field(default=0)
+    # "host[:port],host[:port]"; replicas use the primary's database and credentials
+    db_replica_hosts: str | None = Field(default=None)
+    db_read_your_writes_seconds: float = Field(default=5.0)
+    db_replica_max_lag_seconds: float = Field(default=2.0)
+    db_replica_check_interval: float = Field(default=1.0)
+
     redis_host: str = Field(default="redis")
     redis_port: int = Field(default=6379)
 
+    user_cache_enabled: bool = Field(default=True)
+    user_cache_ttl_seconds: int = Field(default=60)
+
     users_base_url: str = Field(default="http://service-users:8001")
     orders_base_url: str = Field(default="http://service-orders:8002")
 
+    upstream_max_connections: int = Field(default=100)
+    upstream_max_keepalive_connections: int = Field(default=20)
+    upstream_keepalive_expiry: float = Field(default=30.0)
+    upstream_http2: bool = Field(default=False)
+    upstream_connect_timeout: float = Field(default=5.0)
+    upstream_pool_timeout: float = Field(default=5.0)
+    # exports and SSE hold their connection for minutes; they get their own, 0 leaves them uncapped
+    upstream_stream_max_connections: int = Field(default=0)
+    users_timeout_seconds: float = Field(default=30.0)
+    orders_timeout_seconds: float = Field(default=30.0)
+    proxy_streaming: bool = Field(default=True)
+    gateway_cache_enabled: bool = Field(default=False)
+    gateway_cache_ttl_seconds: float = Field(default=5.0)
+    gateway_singleflight_enabled: bool = Field(default=True)
+    gateway_singleflight_max_wait: float = Field(default=2.0)
+
+    rate_limit_auth: str = Field(default="60/60")
+    rate_limit_users: str = Field(default="120/60")
+    rate_limit_orders: str = Field(default="120/60")
+    rate_limit_redis_sync: bool = Field(default=True)
+    rate_limit_sync_interval: float = Field(default=1.0)
+
+    order_events_stream: str = Field(default="orders:events")
+    order_events_maxlen: int = Field(default=100000)
+    order_events_user_maxlen: int = Field(default=1000)
+    order_events_user_ttl_seconds: int = Field(default=86400)
+    order_events_heartbeat_seconds: float = Field(default=15.0)
+    outbox_batch_size: int = Field(default=500)
+    outbox_poll_interval: float = Field(default=1.0)
+    outbox_retention_seconds: int = Field(default=86400)
+
+    users_count_cap: int = Field(default=1000)
+    orders_bulk_max_items: int = Field(default=1000)
+    # rows fetched per server-side cursor round trip, and bytes buffered per streamed chunk
+    orders_export_batch_size: int = Field(default=1000)
+    orders_export_chunk_bytes: int = Field(default=65536)
+    # partition upkeep and archival of done/canceled orders; archival is opt-in, 0 days disables it
+    orders_maintenance_interval: float = Field(default=3600.0)
+    orders_partition_months_ahead: int = Field(default=3)
+    orders_archive_after_days: int = Field(default=0)
+    orders_archive_batch_size: int = Field(default=1000)
+
+    # common.launcher; 0 workers means one per CPU available to the container, 0 limits mean unlimited
+    web_concurrency: int = Field(default=0)
+    web_backlog: int = Field(default=2048)
+    web_keepalive_seconds: int = Field(default=75)
+    web_limit_max_requests: int = Field(default=0)
+    web_limit_concurrency: int = Field(default=0)
+    web_access_log: bool = Field(default=True)
+
     otel_exporter_otlp_endpoint: str | None = Field(default=None)
+    server_timing: bool = Field(default=False)
+
+    log_queue_size: int = Field(default=10000)
+    log_access_sample_rate: float = Field(default=1.0)
 
     class Config:
         env_file = os.getenv("ENV_FILE", None)
@@ -39,6 +121,22 @@ class Settings(BaseSettings):
             f"@{self.postgres_host}:{self.postgres_port}/{self.postgres_db}"
         )
 
+    @property
+    def replica_sqlalchemy_urls(self) -> List[str]:
+        urls = []
+        for host in (self.db_replica_hosts or "").split(","):
+            host = host.strip()
+            if not host:
+                continue
+            if ":" not in host:
+                host = f"{host}:{self.postgres_port}"
+            urls.append(f"postgresql+asyncpg://{self.postgres_user}:{self.postgres_password}@{host}/{self.postgres_db}")
+        return urls
+
+    @property
+    def redis_url(self) -> str:
+        return f"redis://{self.redis_host}:{self.redis_port}"
+
     @property
     def cors_list(self) -> List[str] | None:
         if not self.cors_origins:
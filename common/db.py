@@ -0,0 +1,316 @@
+import asyncio
+import bisect
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+import redis.asyncio as redis
+from fastapi import Depends
+from sqlalchemy import event, text
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from common.metrics import DB_QUERY_LATENCY
+
+
+logger = logging.getLogger(__name__)
+
+WAIT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class WaitHistogram:
+    def __init__(self, buckets: tuple = WAIT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, seconds: float):
+        self.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+        self.sum += seconds
+        self.count += 1
+
+    def cumulative(self) -> list[tuple[str, int]]:
+        out, running = [], 0
+        for bound, n in zip((*self.buckets, float("inf")), self.counts):
+            running += n
+            out.append(("+Inf" if bound == float("inf") else str(bound), running))
+        return out
+
+
+def _timed_pool_class(histogram: WaitHistogram) -> type:
+    # Pool.recreate() instantiates self.__class__, so the histogram survives engine.dispose()
+    class TimedQueuePool(AsyncAdaptedQueuePool):
+        wait_histogram = histogram
+
+        def _do_get(self):
+            start = time.perf_counter()
+            try:
+                return super()._do_get()
+            finally:
+                self.wait_histogram.observe(time.perf_counter() - start)
+
+    return TimedQueuePool
+
+
+class Database:
+    """Async engine with a tuned pool, checkout-wait timing and an optional liveness probe.
+
+    With ``pre_ping`` off, a background task pings one pooled connection every
+    ``liveness_interval`` seconds instead of paying a round-trip on every checkout;
+    a failed ping invalidates the pool through SQLAlchemy's disconnect handling.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        *,
+        pool_size: int = 10,
+        max_overflow: int = 10,
+        pool_timeout: float = 30.0,
+        pool_recycle: int = 1800,
+        pre_ping: bool = False,
+        liveness_interval: float = 30.0,
+        statement_cache_size: int = 100,
+        statement_timeout_ms: int = 0,
+    ):
+        connect_args: Dict[str, Any] = {"prepared_statement_cache_size": statement_cache_size}
+        if statement_timeout_ms:
+            connect_args["server_settings"] = {"statement_timeout": str(statement_timeout_ms)}
+        self.wait_histogram = WaitHistogram()
+        self.engine: AsyncEngine = create_async_engine(
+            url,
+            poolclass=_timed_pool_class(self.wait_histogram),
+            pool_size=pool_size,
+            max_overflow=max_overflow,
+            pool_timeout=pool_timeout,
+            pool_recycle=pool_recycle,
+            pool_pre_ping=pre_ping,
+            connect_args=connect_args,
+        )
+        self.liveness_interval = 0.0 if pre_ping else liveness_interval
+        self.liveness_failures = 0
+        self._liveness_task: Optional[asyncio.Task] = None
+
+    @classmethod
+    def from_settings(cls, settings, url: Optional[str] = None) -> "Database":
+        # the pool budget is per instance: N workers must not open N times the connections
+        workers = max(1, settings.web_concurrency)
+        return cls(
+            url or settings.sqlalchemy_url,
+            pool_size=max(1, settings.db_pool_size // workers),
+            max_overflow=settings.db_max_overflow // workers,
+            pool_timeout=settings.db_pool_timeout,
+            pool_recycle=settings.db_pool_recycle,
+            pre_ping=settings.db_pool_pre_ping,
+            liveness_interval=settings.db_liveness_interval,
+            statement_cache_size=settings.db_statement_cache_size,
+            statement_timeout_ms=settings.db_statement_timeout_ms,
+        )
+
+    async def start(self):
+        if self.liveness_interval > 0 and self._liveness_task is None:
+            self._liveness_task = asyncio.create_task(self._liveness_loop())
+
+    async def close(self):
+        if self._liveness_task is not None:
+            self._liveness_task.cancel()
+            try:
+                await self._liveness_task
+            except asyncio.CancelledError:
+                pass
+            self._liveness_task = None
+        await self.engine.dispose()
+
+    async def _liveness_loop(self):
+        while True:
+            await asyncio.sleep(self.liveness_interval)
+            try:
+                async with self.engine.connect() as conn:
+                    await conn.execute(text("SELECT 1"))
+            except Exception as exc:
+                self.liveness_failures += 1
+                logger.warning("database liveness check failed: %s", exc)
+
+    def pool_stats(self) -> Dict[str, Any]:
+        pool = self.engine.pool
+        return {
+            "size": pool.size(),
+            "checked_in": pool.checkedin(),
+            "checked_out": pool.checkedout(),
+            "overflow": pool.overflow(),
+            "liveness_failures": self.liveness_failures,
+            "wait_seconds": {
+                "count": self.wait_histogram.count,
+                "sum": round(self.wait_histogram.sum, 6),
+                "buckets": dict(self.wait_histogram.cumulative()),
+            },
+        }
+
+
+def instrument_engine(engine, service: str):
+    histogram = DB_QUERY_LATENCY.labels(service)
+
+    @event.listens_for(engine.sync_engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        context._query_start = time.perf_counter()
+
+    @event.listens_for(engine.sync_engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        histogram.observe(time.perf_counter() - context._query_start)
+
+
+# 0 when the replica has replayed everything it received (an idle primary is not lag)
+REPLICA_LAG_SQL = text(
+    "SELECT CASE WHEN NOT pg_is_in_recovery() OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+    "ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END"
+)
+
+
+class SessionRouter:
+    """Primary sessions for writes, replica sessions for reads.
+
+    A read is sent to the primary instead when the caller wrote within
+    ``read_your_writes`` seconds, or when no replica is currently within ``max_lag``
+    seconds of the primary (measured by a background probe every ``check_interval``).
+    Write markers are kept in-process and, with ``redis_url``, in Redis so that other
+    workers and instances honour them too. Without replicas every read is a primary read.
+    """
+
+    def __init__(
+        self,
+        primary_maker: async_sessionmaker,
+        replicas: Sequence[Database] = (),
+        *,
+        redis_url: Optional[str] = None,
+        prefix: str = "ryw",
+        read_your_writes: float = 5.0,
+        max_lag: float = 2.0,
+        check_interval: float = 1.0,
+        max_markers: int = 100000,
+    ):
+        self.primary_maker = primary_maker
+        self.replicas = list(replicas)
+        self._replica_makers = [async_sessionmaker(r.engine, class_=AsyncSession, expire_on_commit=False) for r in self.replicas]
+        self.prefix = prefix
+        self.read_your_writes = read_your_writes
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self.max_markers = max_markers
+        self._redis = redis.from_url(redis_url, decode_responses=True) if redis_url and self.replicas else None
+        self._markers: "OrderedDict[str, float]" = OrderedDict()
+        # unknown lag counts as too much until the first probe
+        self.lag: List[Optional[float]] = [None] * len(self.replicas)
+        self._healthy: List[int] = []
+        self._next = 0
+        self._task: Optional[asyncio.Task] = None
+        self.reads = {"replica": 0, "primary_ryw": 0, "primary_lag": 0, "primary_no_replica": 0}
+
+    def session(self) -> AsyncSession:
+        return self.primary_maker()
+
+    async def read_session(self, key: Optional[str] = None) -> AsyncSession:
+        if not self.replicas:
+            self.reads["primary_no_replica"] += 1
+            return self.primary_maker()
+        if key is not None and await self.recently_wrote(str(key)):
+            self.reads["primary_ryw"] += 1
+            return self.primary_maker()
+        if not self._healthy:
+            self.reads["primary_lag"] += 1
+            return self.primary_maker()
+        self._next = (self._next + 1) % len(self._healthy)
+        self.reads["replica"] += 1
+        return self._replica_makers[self._healthy[self._next]]()
+
+    async def mark_write(self, key):
+        if not self.replicas:
+            return
+        key = str(key)
+        self._markers[key] = time.monotonic() + self.read_your_writes
+        self._markers.move_to_end(key)
+        while len(self._markers) > self.max_markers:
+            self._markers.popitem(last=False)
+        if self._redis is not None:
+            try:
+                await self._redis.set(f"{self.prefix}:{key}", 1, px=int(self.read_your_writes * 1000))
+            except redis.RedisError as exc:
+                logger.warning("read-your-writes marker set failed: %s", exc)
+
+    async def recently_wrote(self, key: str) -> bool:
+        until = self._markers.get(key)
+        if until is not None:
+            if until > time.monotonic():
+                return True
+            del self._markers[key]
+        if self._redis is None:
+            return False
+        try:
+            return bool(await self._redis.exists(f"{self.prefix}:{key}"))
+        except redis.RedisError as exc:
+            # cannot tell, so stay on the side of correctness
+            logger.warning("read-your-writes marker check failed: %s", exc)
+            return True
+
+    async def start(self):
+        if self.replicas and self._task is None:
+            await self.check_replicas()
+            self._task = asyncio.create_task(self._check_loop())
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        for replica in self.replicas:
+            await replica.close()
+        if self._redis is not None:
+            await self._redis.aclose()
+
+    async def _check_loop(self):
+        while True:
+            await asyncio.sleep(self.check_interval)
+            await self.check_replicas()
+
+    async def check_replicas(self):
+        for i, replica in enumerate(self.replicas):
+            try:
+                async with replica.engine.connect() as conn:
+                    self.lag[i] = float((await conn.execute(REPLICA_LAG_SQL)).scalar_one())
+            except Exception as exc:
+                if self.lag[i] is not None:
+                    logger.warning("replica %d lag check failed: %s", i, exc)
+                self.lag[i] = None
+        self._healthy = [i for i, lag in enumerate(self.lag) if lag is not None and lag <= self.max_lag]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "replicas": [
+                {"lag_seconds": lag, "healthy": i in self._healthy, **self.replicas[i].pool_stats()} for i, lag in enumerate(self.lag)
+            ],
+            "reads": dict(self.reads),
+        }
+
+
+def session_dependencies(sessions: SessionRouter, current_user: Callable) -> Tuple[Callable, Callable]:
+    """``(get_read_session, get_write_session)`` FastAPI dependencies routed by ``sessions``.
+
+    Both key read-your-writes on the ``id`` of whatever ``current_user`` resolves to.
+    """
+
+    async def get_read_session(user=Depends(current_user)) -> AsyncSession:
+        # a replica unless this user wrote within the read-your-writes window
+        async with await sessions.read_session(user.id) as session:
+            yield session
+
+    async def get_write_session(user=Depends(current_user)) -> AsyncSession:
+        async with sessions.session() as session:
+            try:
+                yield session
+            finally:
+                # runs before the response is sent, so the caller's next read already sees the marker
+                await sessions.mark_write(user.id)
+
+    return get_read_session, get_write_session
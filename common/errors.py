@@ -32,6 +32,7 @@ def add_exception_handlers(app: FastAPI):
                 "success": False,
                 "error": {"code": code, "message": message},
             },
+            headers=exc.headers,
         )
 
     @app.exception_handler(404)
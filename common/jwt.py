@@ -1,6 +1,44 @@
+import base64
+import hashlib
+import hmac
 import time
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, List, Optional
 import jwt
-from typing import Any, Dict, List
+import orjson
+from jwt.algorithms import get_default_algorithms
+from common.cache import TokenCache
+from common.config import settings
+
+
+INTERNAL_CLAIMS_HEADER = "X-Internal-Claims"
+
+claims_cache = TokenCache(maxsize=settings.jwt_cache_size, max_ttl=settings.jwt_cache_ttl_seconds)
+
+
+@lru_cache(maxsize=None)
+def _load_key(algorithm: str, key: str):
+    # PEM text or a path to a PEM file; parsed once instead of on every encode/decode
+    if not key.lstrip().startswith("-----BEGIN"):
+        key = Path(key).read_text()
+    return get_default_algorithms()[algorithm].prepare_key(key)
+
+
+def signing_key():
+    if settings.jwt_algorithm.startswith("HS"):
+        return settings.jwt_secret
+    if not settings.jwt_private_key:
+        raise RuntimeError(f"JWT_PRIVATE_KEY is required to sign {settings.jwt_algorithm} tokens")
+    return _load_key(settings.jwt_algorithm, settings.jwt_private_key)
+
+
+def verification_key():
+    if settings.jwt_algorithm.startswith("HS"):
+        return settings.jwt_secret
+    if not settings.jwt_public_key:
+        raise RuntimeError(f"JWT_PUBLIC_KEY is required to verify {settings.jwt_algorithm} tokens")
+    return _load_key(settings.jwt_algorithm, settings.jwt_public_key)
 
 
 def encode_jwt(payload: Dict[str, Any], secret: str, algorithm: str = "HS256") -> str:
@@ -12,6 +50,57 @@ def decode_jwt(token: str, secret: str, algorithms: List[str] | None = None) ->
     return jwt.decode(token, secret, algorithms=algorithms)
 
 
+def decode_jwt_cached(token: str, secret: str, algorithms: List[str] | None = None) -> Dict[str, Any]:
+    # only successfully verified tokens are cached, so a hit skips signature verification safely
+    claims = claims_cache.get(token)
+    if claims is None:
+        claims = decode_jwt(token, secret, algorithms)
+        claims_cache.put(token, claims)
+    return claims
+
+
+def verify_access_token(token: str) -> Dict[str, Any]:
+    return decode_jwt_cached(token, verification_key(), [settings.jwt_algorithm])
+
+
+def _b64(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode()
+
+
+def _unb64(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+
+def sign_internal_claims(claims: Dict[str, Any], secret: str) -> str:
+    """Packs already-verified claims for a trusted hop as ``<payload>.<hmac-sha256>``."""
+    payload = _b64(orjson.dumps({"sub": claims.get("sub"), "roles": claims.get("roles") or [], "exp": claims.get("exp")}))
+    signature = hmac.new(secret.encode(), payload.encode(), hashlib.sha256).digest()
+    return f"{payload}.{_b64(signature)}"
+
+
+def verify_internal_claims(value: str, secret: str) -> Dict[str, Any]:
+    try:
+        payload, signature = value.split(".", 1)
+        expected = hmac.new(secret.encode(), payload.encode(), hashlib.sha256).digest()
+        if not hmac.compare_digest(expected, _unb64(signature)):
+            raise ValueError("bad signature")
+        claims = orjson.loads(_unb64(payload))
+    except ValueError:
+        raise ValueError("invalid internal claims") from None
+    if isinstance(claims.get("exp"), (int, float)) and claims["exp"] <= time.time():
+        raise ValueError("internal claims expired")
+    return claims
+
+
+def request_claims(internal: Optional[str], token: Optional[str]) -> Dict[str, Any]:
+    """Claims for a service request: the gateway's signed header when trusted, else the bearer token."""
+    if internal and settings.internal_auth_secret:
+        return verify_internal_claims(internal, settings.internal_auth_secret)
+    if not token:
+        raise ValueError("no credentials")
+    return verify_access_token(token)
+
+
 def make_access_token(sub: str, roles: list[str], secret: str, algorithm: str, expires_seconds: int) -> str:
     now = int(time.time())
     payload = {
@@ -0,0 +1,125 @@
+"""Production entry point for the gateway and the services.
+
+    python -m common.launcher service-orders [--port 8002] [--workers 4]
+
+Runs uvicorn with uvloop and httptools and ``WEB_CONCURRENCY`` worker processes
+(default: one per CPU the container may use, see available_cpus). Workers are
+spawned, not forked, and import the app themselves, so engines, Redis clients,
+limiters and log listeners are created per worker; ``DB_POOL_SIZE`` and
+``DB_MAX_OVERFLOW`` are split among the workers. With ``WEB_LIMIT_MAX_REQUESTS``
+a worker exits after that many requests and the supervisor starts a fresh one;
+recycling always runs under the supervisor, even with a single worker, which
+uvicorn would otherwise serve in-process and let exit for good.
+"""
+import argparse
+import importlib
+import math
+import os
+import shutil
+import sys
+import tempfile
+import types
+from pathlib import Path
+
+import uvicorn
+from uvicorn.main import STARTUP_FAILURE
+from uvicorn.supervisors import Multiprocess
+
+
+ROOT = Path(__file__).resolve().parents[1]
+APP_DIR_ENV = "LAUNCHER_APP_DIR"
+PROMETHEUS_DIR_ENV = "PROMETHEUS_MULTIPROC_DIR"
+
+
+def import_app_module(app_dir: str, module: str = "main"):
+    """Import ``module`` from an app directory (e.g. service-orders) as a package.
+
+    Service modules use relative imports, so the directory is registered under an
+    importable alias (service_orders) first.
+    """
+    if str(ROOT) not in sys.path:
+        sys.path.insert(0, str(ROOT))
+    package = app_dir.replace("-", "_")
+    if package not in sys.modules:
+        pkg = types.ModuleType(package)
+        pkg.__path__ = [str(ROOT / app_dir)]
+        sys.modules[package] = pkg
+    return importlib.import_module(f"{package}.{module}")
+
+
+def app_factory():
+    # called by uvicorn inside each worker
+    return import_app_module(os.environ[APP_DIR_ENV]).app
+
+
+def available_cpus() -> int:
+    """CPUs this process may actually use: its affinity mask, capped by a cgroup v2 CPU quota."""
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+    try:
+        quota, period = Path("/sys/fs/cgroup/cpu.max").read_text().split()
+        if quota != "max":
+            cpus = min(cpus, max(1, math.ceil(int(quota) / int(period))))
+    except (OSError, ValueError):
+        pass
+    return cpus
+
+
+def _prepare_prometheus_dir(supervised: bool):
+    if not supervised:
+        return
+    # each worker writes its samples here; /metrics aggregates them (common.metrics)
+    path = os.environ.get(PROMETHEUS_DIR_ENV)
+    if path:
+        shutil.rmtree(path, ignore_errors=True)
+        os.makedirs(path, exist_ok=True)
+    else:
+        os.environ[PROMETHEUS_DIR_ENV] = tempfile.mkdtemp(prefix="prometheus-")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("app_dir", choices=["api-gateway", "service-users", "service-orders"])
+    parser.add_argument("--host", default=os.getenv("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", "8000")))
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args(argv)
+
+    from common.config import settings
+
+    workers = args.workers or settings.web_concurrency or available_cpus()
+    supervised = workers > 1 or settings.web_limit_max_requests > 0
+    # workers read these from the environment when they build their settings
+    os.environ[APP_DIR_ENV] = args.app_dir
+    os.environ["WEB_CONCURRENCY"] = str(workers)
+    _prepare_prometheus_dir(supervised)
+
+    config = uvicorn.Config(
+        "common.launcher:app_factory",
+        factory=True,
+        host=args.host,
+        port=args.port,
+        workers=workers,
+        loop="uvloop",
+        http="httptools",
+        backlog=settings.web_backlog,
+        timeout_keep_alive=settings.web_keepalive_seconds,
+        limit_max_requests=settings.web_limit_max_requests or None,
+        limit_concurrency=settings.web_limit_concurrency or None,
+        access_log=settings.web_access_log,
+        proxy_headers=True,
+        server_header=False,
+    )
+    server = uvicorn.Server(config)
+    if supervised:
+        Multiprocess(config, target=server.run, sockets=[config.bind_socket()]).run()
+    else:
+        server.run()
+        if not server.started:
+            sys.exit(STARTUP_FAILURE)
+
+
+if __name__ == "__main__":
+    main()
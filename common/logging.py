@@ -1,6 +1,11 @@
+import atexit
 import logging
-import json
+import logging.handlers
+import queue
+import random
 from typing import Optional
+import orjson
+from common.middleware import request_id_var
 
 
 class JsonFormatter(logging.Formatter):
@@ -12,9 +17,12 @@ class JsonFormatter(logging.Formatter):
         }
         if hasattr(record, "service") and record.service:
             payload["service"] = record.service
-        if hasattr(record, "request_id") and record.request_id:
-            payload["request_id"] = record.request_id
-        return json.dumps(payload, ensure_ascii=False)
+        request_id = getattr(record, "request_id", None) or request_id_var.get()
+        if request_id:
+            payload["request_id"] = request_id
+        if record.exc_info:
+            payload["exc_info"] = self.formatException(record.exc_info)
+        return orjson.dumps(payload, default=str).decode()
 
 
 class ServiceFilter(logging.Filter):
@@ -28,15 +36,89 @@ class ServiceFilter(logging.Filter):
         return True
 
 
-def setup_logging(service_name: str, level: int = logging.INFO):
-    handler = logging.StreamHandler()
-    handler.setFormatter(JsonFormatter())
+class AccessLogSampler(logging.Filter):
+    """Keeps a ``rate`` fraction of uvicorn access records; errors are always kept."""
+
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if self.rate >= 1.0:
+            return True
+        # uvicorn.access args: (client_addr, method, full_path, http_version, status_code)
+        args = record.args
+        if isinstance(args, tuple) and len(args) == 5 and isinstance(args[4], int) and args[4] >= 400:
+            return True
+        return random.random() < self.rate
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """Hands records to a bounded queue; when it is full the record is dropped and counted.
+
+    Formatting is left to the listener thread: only the message and the request ID,
+    which lives in a contextvar the listener cannot see, are resolved here.
+    """
+
+    def __init__(self, q: queue.Queue):
+        super().__init__(q)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record.msg = record.getMessage()
+        record.args = None
+        if getattr(record, "request_id", None) is None:
+            record.request_id = request_id_var.get()
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+_queue_handler: Optional[DroppingQueueHandler] = None
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+def dropped_records() -> int:
+    return _queue_handler.dropped if _queue_handler is not None else 0
+
+
+def stop_logging():
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+atexit.register(stop_logging)
+
+
+def setup_logging(service_name: str, level: int = logging.INFO, queue_size: int = 10000, access_sample_rate: float = 1.0):
+    global _queue_handler, _listener
+    stop_logging()
+
+    stream = logging.StreamHandler()
+    stream.setFormatter(JsonFormatter())
+    _queue_handler = DroppingQueueHandler(queue.Queue(maxsize=queue_size))
+    _queue_handler.addFilter(ServiceFilter(service_name))
+    _listener = logging.handlers.QueueListener(_queue_handler.queue, stream, respect_handler_level=True)
+    _listener.start()
+
     logger = logging.getLogger()
     logger.handlers.clear()
-    logger.addHandler(handler)
+    logger.addHandler(_queue_handler)
     logger.setLevel(level)
-    logger.addFilter(ServiceFilter(service_name))
-    logging.getLogger("uvicorn").setLevel(level)
-    logging.getLogger("uvicorn.error").setLevel(level)
-    logging.getLogger("uvicorn.access").setLevel(level)
+    # uvicorn installs its own synchronous handlers; route its records through the queue instead
+    for name in ("uvicorn", "uvicorn.error", "uvicorn.access"):
+        uv = logging.getLogger(name)
+        uv.handlers.clear()
+        uv.propagate = True
+        uv.setLevel(level)
+    access = logging.getLogger("uvicorn.access")
+    for f in [f for f in access.filters if isinstance(f, AccessLogSampler)]:
+        access.removeFilter(f)
+    access.addFilter(AccessLogSampler(access_sample_rate))
     return logger
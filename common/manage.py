@@ -0,0 +1,22 @@
+"""Offline maintenance commands of a service, run beside it rather than through its API.
+
+    python -m common.manage service-orders rebuild-stats [--user-id ID] [--batch-size 1000]
+
+The service's ``maintenance.main`` parses and runs the command; it connects with the
+same settings (and environment) as the service itself.
+"""
+import argparse
+
+from common.launcher import import_app_module
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("app_dir", choices=["service-orders"])
+    parser.add_argument("command", nargs=argparse.REMAINDER)
+    args = parser.parse_args(argv)
+    import_app_module(args.app_dir, "maintenance").main(args.command)
+
+
+if __name__ == "__main__":
+    main()
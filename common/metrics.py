@@ -0,0 +1,217 @@
+import os
+import time
+from functools import lru_cache
+from typing import Dict, Iterable, Tuple
+from fastapi import FastAPI
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest, multiprocess
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily, HistogramMetricFamily
+from starlette.responses import Response
+from common.logging import dropped_records
+
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+HTTP_REQUESTS = Counter("http_requests_total", "HTTP requests by route template and status", ["service", "method", "route", "status"])
+HTTP_LATENCY = Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route template", ["service", "method", "route"], buckets=LATENCY_BUCKETS
+)
+HTTP_IN_FLIGHT = Gauge("http_requests_in_flight", "HTTP requests currently being served", ["service"], multiprocess_mode="livesum")
+UPSTREAM_LATENCY = Histogram(
+    "upstream_request_duration_seconds", "Gateway time to upstream response headers", ["upstream"], buckets=LATENCY_BUCKETS
+)
+DB_QUERY_LATENCY = Histogram("db_query_duration_seconds", "Database statement latency", ["service"], buckets=LATENCY_BUCKETS)
+RATE_LIMIT_REJECTIONS = Counter("rate_limit_rejections_total", "Requests rejected by the rate limiter", ["route"])
+
+
+@lru_cache(maxsize=None)
+def upstream_latency(upstream: str):
+    return UPSTREAM_LATENCY.labels(upstream)
+
+
+@lru_cache(maxsize=None)
+def rate_limit_rejections(route: str):
+    return RATE_LIMIT_REJECTIONS.labels(route)
+
+
+class MetricsMiddleware:
+    """Pure ASGI request metrics labelled with the matched route template.
+
+    Label children are bound once per (method, route, status) and reused, so the
+    hot path is a dict lookup plus counter/histogram updates.
+    """
+
+    def __init__(self, app, service: str):
+        self.app = app
+        self.service = service
+        self._in_flight = HTTP_IN_FLIGHT.labels(service)
+        self._children: Dict[Tuple[str, str, int], tuple] = {}
+
+    def _bound(self, method: str, route: str, status: int) -> tuple:
+        key = (method, route, status)
+        children = self._children.get(key)
+        if children is None:
+            children = (
+                HTTP_REQUESTS.labels(self.service, method, route, str(status)),
+                HTTP_LATENCY.labels(self.service, method, route),
+            )
+            self._children[key] = children
+        return children
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        start = time.perf_counter()
+        self._in_flight.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            self._in_flight.dec()
+            # FastAPI stores the matched route in the scope; unmatched paths share one label
+            route = scope.get("route")
+            counter, histogram = self._bound(scope["method"], route.path if route is not None else "unmatched", status_code)
+            counter.inc()
+            histogram.observe(time.perf_counter() - start)
+
+
+class DatabaseCollector:
+    """Exposes common.db.Database pool state and checkout waits at scrape time."""
+
+    def __init__(self, service: str, database):
+        self.service = service
+        self.database = database
+
+    def describe(self):
+        # labelled per service; skip the registry's name-collision check so several apps can share a process
+        return []
+
+    def collect(self):
+        stats = self.database.pool_stats()
+        for key in ("size", "checked_in", "checked_out", "overflow"):
+            gauge = GaugeMetricFamily(f"db_pool_{key}", f"Database pool {key.replace('_', ' ')}", labels=["service"])
+            gauge.add_metric([self.service], stats[key])
+            yield gauge
+        waits = self.database.wait_histogram
+        histogram = HistogramMetricFamily("db_pool_wait_seconds", "Time to check a connection out of the pool", labels=["service"])
+        histogram.add_metric([self.service], waits.cumulative(), sum_value=waits.sum)
+        yield histogram
+
+
+class UpstreamPoolCollector:
+    def __init__(self, pool):
+        self.pool = pool
+
+    def describe(self):
+        return []
+
+    def collect(self):
+        gauge = GaugeMetricFamily("upstream_pool_connections", "Gateway upstream connections by state", labels=["upstream", "state"])
+        for name, stats in self.pool.stats().items():
+            for state in ("idle", "active", "queued"):
+                gauge.add_metric([name, state], stats[state])
+        yield gauge
+
+
+class RateLimiterCollector:
+    def __init__(self, limiter):
+        self.limiter = limiter
+
+    def describe(self):
+        return []
+
+    def collect(self):
+        stats = self.limiter.stats()
+        buckets = GaugeMetricFamily("rate_limit_buckets", "Token buckets held in memory by the rate limiter")
+        buckets.add_metric([], stats["buckets"])
+        yield buckets
+        decisions = CounterMetricFamily("rate_limit_decisions", "Rate limiter admission decisions", labels=["result"])
+        decisions.add_metric(["allowed"], stats["allowed"])
+        decisions.add_metric(["rejected"], stats["rejected"])
+        yield decisions
+        syncs = CounterMetricFamily("rate_limit_syncs", "Rate limiter Redis sync rounds", labels=["result"])
+        syncs.add_metric(["ok"], stats["syncs"])
+        syncs.add_metric(["error"], stats["sync_errors"])
+        yield syncs
+        redis_up = GaugeMetricFamily("rate_limit_redis_up", "1 when the rate limiter is syncing through Redis")
+        redis_up.add_metric([], 1 if stats["mode"] == "redis" else 0)
+        yield redis_up
+
+
+class SingleFlightCollector:
+    def __init__(self, coalescer):
+        self.coalescer = coalescer
+
+    def describe(self):
+        return []
+
+    def collect(self):
+        stats = self.coalescer.stats()
+        in_flight = GaugeMetricFamily("singleflight_in_flight", "Coalesced upstream requests currently in flight")
+        in_flight.add_metric([], stats["in_flight"])
+        yield in_flight
+        calls = CounterMetricFamily("singleflight_calls", "Coalescable requests by outcome", labels=["result"])
+        calls.add_metric(["leader"], stats["leaders"])
+        calls.add_metric(["shared"], stats["shared"])
+        calls.add_metric(["timeout"], stats["timeouts"])
+        yield calls
+
+
+class LoggingCollector:
+    def describe(self):
+        return []
+
+    def collect(self):
+        counter = CounterMetricFamily("log_records_dropped", "Log records dropped because the log queue was full")
+        counter.add_metric([], dropped_records())
+        yield counter
+
+
+# scrape-time collectors; in multi-worker mode they report the worker serving the scrape
+_collectors: list = []
+
+
+def register_collector(collector):
+    REGISTRY.register(collector)
+    _collectors.append(collector)
+
+
+register_collector(LoggingCollector())
+
+
+@lru_cache(maxsize=None)
+def _registry():
+    if not os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        return REGISTRY
+    # under common.launcher with several workers: merge every worker's samples from the shared directory
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    for collector in _collectors:
+        registry.register(collector)
+    return registry
+
+
+async def metrics_endpoint():
+    return Response(generate_latest(_registry()), media_type=CONTENT_TYPE_LATEST)
+
+
+def _mark_process_dead():
+    # drops this worker's live gauge files (livesum in-flight) once it exits, e.g. when recycled
+    multiprocess.mark_process_dead(os.getpid())
+
+
+def install_metrics(app: FastAPI, service: str, collectors: Iterable = ()):
+    app.add_middleware(MetricsMiddleware, service=service)
+    app.add_api_route("/metrics", metrics_endpoint, methods=["GET"], include_in_schema=False)
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        app.add_event_handler("shutdown", _mark_process_dead)
+    for collector in collectors:
+        register_collector(collector)
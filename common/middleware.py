@@ -1,16 +1,55 @@
+import time
 import uuid
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.requests import Request
-from starlette.responses import Response
+from contextvars import ContextVar
+from typing import Optional
 
 
 REQUEST_ID_HEADER = "X-Request-ID"
+_REQUEST_ID_KEY = REQUEST_ID_HEADER.lower().encode("latin-1")
+_MAX_REQUEST_ID_LENGTH = 128
 
+request_id_var: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
 
-class RequestIDMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next):
-        req_id = request.headers.get(REQUEST_ID_HEADER) or str(uuid.uuid4())
-        request.state.request_id = req_id
-        response: Response = await call_next(request)
-        response.headers[REQUEST_ID_HEADER] = req_id
-        return response
+
+class RequestContextMiddleware:
+    """Pure ASGI middleware that binds the request ID for the lifetime of a request.
+
+    The ID is taken from X-Request-ID (or generated), stored in ``request_id_var`` and
+    ``request.state.request_id``, and echoed on the response. With ``server_timing`` the
+    time to response start is reported as ``Server-Timing: app;dur=<ms>``.
+    """
+
+    def __init__(self, app, server_timing: bool = False):
+        self.app = app
+        self.server_timing = server_timing
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        req_id = None
+        for key, value in scope["headers"]:
+            if key == _REQUEST_ID_KEY:
+                req_id = value.decode("latin-1")
+                break
+        if not req_id or len(req_id) > _MAX_REQUEST_ID_LENGTH:
+            req_id = str(uuid.uuid4())
+        scope.setdefault("state", {})["request_id"] = req_id
+        raw_id = req_id.encode("latin-1")
+        start = time.perf_counter()
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", ()))
+                headers.append((_REQUEST_ID_KEY, raw_id))
+                if self.server_timing:
+                    headers.append((b"server-timing", b"app;dur=%.2f" % ((time.perf_counter() - start) * 1000)))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        token = request_id_var.set(req_id)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            request_id_var.reset(token)
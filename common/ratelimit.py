@@ -0,0 +1,225 @@
+import asyncio
+import logging
+import math
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Optional, Tuple
+import redis.asyncio as redis
+from fastapi import Depends, HTTPException, Request, status
+from common.metrics import rate_limit_rejections
+
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class Limit:
+    times: int
+    seconds: int
+
+    @classmethod
+    def parse(cls, spec: str) -> "Limit":
+        """Parses ``"<times>/<seconds>"``, e.g. ``"120/60"``."""
+        try:
+            times, seconds = (int(part) for part in spec.split("/", 1))
+        except ValueError:
+            raise ValueError(f"invalid rate limit '{spec}', expected '<times>/<seconds>'") from None
+        if times <= 0 or seconds <= 0:
+            raise ValueError(f"invalid rate limit '{spec}'")
+        return cls(times, seconds)
+
+    @property
+    def rate(self) -> float:
+        return self.times / self.seconds
+
+
+class _Bucket:
+    __slots__ = ("tokens", "updated", "pending", "window", "window_hits", "remote_hits", "synced")
+
+    def __init__(self, capacity: float, now: float):
+        self.tokens = float(capacity)
+        self.updated = now
+        self.pending = 0
+        self.window = 0
+        self.window_hits = 0
+        self.remote_hits = 0
+        self.synced = False
+
+
+class RateLimiter:
+    """In-process token buckets, one per (route, key), reconciled with Redis in the background.
+
+    Admission is decided locally. Every ``sync_interval`` seconds the hits taken since
+    the last sync are pushed with one pipelined INCRBY per active bucket into a counter
+    per fixed window; the hits other gateway instances made in that window are then
+    debited from the local bucket, so the limit holds across instances to within one
+    sync interval. Without Redis (or while it is unreachable) buckets are purely local.
+
+    A new bucket knows nothing of the hits other workers took, so until its first sync
+    it holds only this worker's share of the limit; otherwise every worker could spend a
+    full burst before the first reconciliation.
+    """
+
+    def __init__(self, redis_url: Optional[str] = None, sync_interval: float = 1.0, prefix: str = "rl", workers: int = 1):
+        self.sync_interval = sync_interval
+        self.prefix = prefix
+        self.workers = max(1, workers)
+        self._redis = redis.from_url(redis_url, decode_responses=True) if redis_url else None
+        self._limits: Dict[str, Limit] = {}
+        self._buckets: Dict[Tuple[str, str], _Bucket] = {}
+        self._task: Optional[asyncio.Task] = None
+        self.redis_ok = self._redis is not None
+        self.allowed = 0
+        self.rejected = 0
+        self.syncs = 0
+        self.sync_errors = 0
+
+    def add_limit(self, route: str, spec: str) -> Limit:
+        limit = Limit.parse(spec)
+        if self._redis is None and self.workers > 1:
+            # nothing reconciles the workers of one instance, so each gets an equal share
+            limit = Limit(max(1, limit.times // self.workers), limit.seconds)
+        self._limits[route] = limit
+        return limit
+
+    def hit(self, route: str, key: str, now: Optional[float] = None) -> float:
+        """Takes one token. Returns 0 when allowed, otherwise the seconds until a token is available."""
+        limit = self._limits[route]
+        now = time.monotonic() if now is None else now
+        bucket = self._buckets.get((route, key))
+        if bucket is None:
+            bucket = self._buckets[(route, key)] = _Bucket(self._share(limit), now)
+        else:
+            capacity = limit.times if bucket.synced else self._share(limit)
+            bucket.tokens = min(capacity, bucket.tokens + (now - bucket.updated) * limit.rate)
+            bucket.updated = now
+        if bucket.tokens < 1:
+            self.rejected += 1
+            return (1 - bucket.tokens) / limit.rate
+        bucket.tokens -= 1
+        bucket.pending += 1
+        self.allowed += 1
+        return 0.0
+
+    def _share(self, limit: Limit) -> float:
+        if self._redis is None:
+            return float(limit.times)
+        return max(1.0, limit.times / self.workers)
+
+    def dependency(self, route: str, spec: str, claims: Optional[Callable] = None):
+        """FastAPI dependency taking a token per request.
+
+        With ``claims``, a dependency returning the verified JWT claims, buckets are keyed
+        by ``sub``; FastAPI resolves it once per request, so the token is not verified again.
+        """
+        self.add_limit(route, spec)
+
+        def check(request: Request, key: str):
+            retry_after = self.hit(route, key)
+            if retry_after:
+                rate_limit_rejections(request.scope["route"].path).inc()
+                raise HTTPException(
+                    status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                    detail="Too Many Requests",
+                    headers={"Retry-After": str(math.ceil(retry_after))},
+                )
+
+        if claims is None:
+            async def _limit(request: Request):
+                check(request, client_key(request))
+        else:
+            async def _limit(request: Request, verified: dict = Depends(claims)):
+                check(request, client_key(request, verified))
+
+        return _limit
+
+    async def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._sync_loop())
+
+    async def aclose(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._redis is not None:
+            await self._redis.aclose()
+
+    async def _sync_loop(self):
+        while True:
+            await asyncio.sleep(self.sync_interval)
+            try:
+                await self.sync()
+            except Exception as exc:
+                logger.warning("rate limiter sync failed: %s", exc)
+
+    async def sync(self, now: Optional[float] = None):
+        now = time.monotonic() if now is None else now
+        wall = time.time()
+        active = []
+        for (route, key), bucket in list(self._buckets.items()):
+            limit = self._limits[route]
+            window = int(wall // limit.seconds)
+            if bucket.window != window:
+                bucket.window, bucket.window_hits, bucket.remote_hits = window, 0, 0
+            if bucket.pending:
+                active.append((route, key, bucket, limit))
+            elif now - bucket.updated > limit.seconds:
+                # idle long enough to have refilled completely; nothing to remember
+                del self._buckets[(route, key)]
+        if not active:
+            return
+
+        pushed = [(bucket, bucket.pending) for _, _, bucket, _ in active]
+        for bucket, pending in pushed:
+            bucket.window_hits += pending
+            bucket.pending = 0
+        if self._redis is None:
+            return
+
+        try:
+            async with self._redis.pipeline(transaction=False) as pipe:
+                for (route, key, bucket, limit), (_, pending) in zip(active, pushed):
+                    redis_key = f"{self.prefix}:{route}:{key}:{bucket.window}"
+                    pipe.incrby(redis_key, pending)
+                    pipe.expire(redis_key, limit.seconds * 2)
+                results = await pipe.execute()
+        except redis.RedisError as exc:
+            if self.redis_ok:
+                logger.warning("rate limiter falling back to local buckets: %s", exc)
+            self.redis_ok = False
+            self.sync_errors += 1
+            return
+
+        if not self.redis_ok:
+            logger.info("rate limiter reconnected to redis")
+        self.redis_ok = True
+        self.syncs += 1
+        for (route, key, bucket, limit), total in zip(active, results[::2]):
+            remote = max(0, int(total) - bucket.window_hits)
+            bucket.tokens -= remote - bucket.remote_hits
+            bucket.remote_hits = remote
+            # the window's total is known now; from here the bucket refills to the full limit
+            bucket.synced = True
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "mode": "local" if self._redis is None else ("redis" if self.redis_ok else "local_fallback"),
+            "buckets": len(self._buckets),
+            "allowed": self.allowed,
+            "rejected": self.rejected,
+            "syncs": self.syncs,
+            "sync_errors": self.sync_errors,
+            "limits": {route: f"{limit.times}/{limit.seconds}" for route, limit in self._limits.items()},
+        }
+
+
+def client_key(request: Request, claims: Optional[Dict[str, Any]] = None) -> str:
+    """Rate-limit key: ``sub`` of already verified claims, else the client IP."""
+    sub = claims.get("sub") if claims else None
+    if sub:
+        return f"sub:{sub}"
+    return f"ip:{request.client.host if request.client else 'unknown'}"
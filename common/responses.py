@@ -1,11 +1,69 @@
+import hashlib
+from decimal import Decimal
 from typing import Any, Optional
-from fastapi.responses import JSONResponse
+import orjson
+from fastapi import Request
+from fastapi.responses import JSONResponse, Response
+from pydantic import BaseModel
+
+
+def _default(obj: Any):
+    # pydantic models serialize themselves to JSON bytes in pydantic-core and are embedded as-is
+    if isinstance(obj, BaseModel):
+        return orjson.Fragment(obj.__pydantic_serializer__.to_json(obj))
+    if isinstance(obj, Decimal):
+        return float(obj)
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+
+def dumps(obj: Any) -> bytes:
+    return orjson.dumps(obj, default=_default)
 
 
 def ok(data: Any, status_code: int = 200):
     return {"success": True, "data": data}
 
 
+def etag(*parts: Any) -> str:
+    """Weak validator for a representation identified by ``parts`` (e.g. id and updated_at)."""
+    return 'W/"%s"' % hashlib.blake2b("|".join(map(str, parts)).encode(), digest_size=12).hexdigest()
+
+
+def _opaque(tag: str) -> str:
+    return tag[2:] if tag.startswith("W/") else tag
+
+
+def if_none_match(request: Request, tag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    # weak comparison, RFC 9110 section 13.1.2
+    return _opaque(tag) in (_opaque(t.strip()) for t in header.split(","))
+
+
+def _validator_headers(tag: Optional[str]) -> Optional[dict]:
+    # private: responses are per user; no-cache: clients revalidate every time, which is cheap with the ETag
+    return {"ETag": tag, "Cache-Control": "private, no-cache"} if tag else None
+
+
+def not_modified(tag: str) -> Response:
+    return Response(status_code=304, headers=_validator_headers(tag))
+
+
+def json_response(content: Any, status_code: int = 200, etag: Optional[str] = None) -> Response:
+    return Response(content=dumps(content), status_code=status_code, media_type="application/json", headers=_validator_headers(etag))
+
+
+def ok_json(data: Any, status_code: int = 200, etag: Optional[str] = None) -> Response:
+    """Like ok(), but encoded straight to bytes, skipping jsonable_encoder.
+
+    ``data`` may contain pydantic models; they are not dumped to dicts first.
+    """
+    return json_response({"success": True, "data": data}, status_code, etag)
+
+
 def fail(code: str, message: str, status_code: int = 400, data: Optional[Any] = None):
     payload = {"success": False, "error": {"code": code, "message": message}}
     if data is not None:
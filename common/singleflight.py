@@ -0,0 +1,67 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable, TypeVar
+
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    """Coalesces concurrent identical calls.
+
+    The first caller for a key runs the call; callers arriving while it is in flight
+    await the same result (or exception) instead of starting their own. A follower
+    waits at most ``max_wait`` seconds and then runs the call itself, so one slow
+    leader never holds a crowd longer than that. Results are shared, so they must
+    not be mutated by the callers.
+    """
+
+    def __init__(self, max_wait: float = 2.0):
+        self.max_wait = max_wait
+        self._calls: Dict[Hashable, asyncio.Future] = {}
+        self.leaders = 0
+        self.shared = 0
+        self.timeouts = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        future = self._calls.get(key)
+        if future is not None:
+            try:
+                result = await asyncio.wait_for(asyncio.shield(future), self.max_wait)
+            except asyncio.TimeoutError:
+                self.timeouts += 1
+                return await fn()
+            except asyncio.CancelledError:
+                if not future.cancelled():
+                    raise
+                # the leader was cancelled (its client went away); this caller is still waiting
+                return await fn()
+            self.shared += 1
+            return result
+
+        future = asyncio.get_running_loop().create_future()
+        # followers may all have timed out; don't warn about an exception nobody read
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        self._calls[key] = future
+        self.leaders += 1
+        try:
+            result = await fn()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as exc:
+            future.set_exception(exc)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            if self._calls.get(key) is future:
+                del self._calls[key]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "in_flight": len(self._calls),
+            "leaders": self.leaders,
+            "shared": self.shared,
+            "timeouts": self.timeouts,
+        }
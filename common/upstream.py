@@ -0,0 +1,98 @@
+from typing import Any, Dict, Optional
+import httpx
+
+
+STREAM_SUFFIX = ":stream"
+
+
+class UpstreamPool:
+    """Long-lived httpx clients, one per upstream service, shared by all requests.
+
+    Upstreams registered with ``streams=True`` get a second client for responses that
+    hold their connection for minutes (exports, SSE). It has its own connection cap
+    (``stream_max_connections``, None for none), so open streams can never use up the
+    pool that ordinary request/response traffic waits on.
+    """
+
+    def __init__(
+        self,
+        *,
+        max_connections: int = 100,
+        max_keepalive_connections: int = 20,
+        keepalive_expiry: float = 30.0,
+        http2: bool = False,
+        connect_timeout: float = 5.0,
+        pool_timeout: float = 5.0,
+        stream_max_connections: Optional[int] = None,
+    ):
+        self._limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self._stream_limits = httpx.Limits(
+            max_connections=stream_max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self._http2 = http2
+        self._connect_timeout = connect_timeout
+        self._pool_timeout = pool_timeout
+        self._targets: Dict[str, tuple[str, float, bool]] = {}
+        self._clients: Dict[str, httpx.AsyncClient] = {}
+
+    def register(self, name: str, base_url: str, timeout: float = 30.0, *, streams: bool = False):
+        self._targets[name] = (base_url, timeout, streams)
+
+    async def start(self):
+        for name, (base_url, timeout, streams) in self._targets.items():
+            if name in self._clients:
+                continue
+            self._clients[name] = self._new_client(base_url, timeout, self._limits)
+            if streams:
+                self._clients[name + STREAM_SUFFIX] = self._new_client(base_url, timeout, self._stream_limits)
+
+    def _new_client(self, base_url: str, timeout: float, limits: httpx.Limits) -> httpx.AsyncClient:
+        return httpx.AsyncClient(
+            base_url=base_url,
+            limits=limits,
+            http2=self._http2,
+            timeout=httpx.Timeout(timeout, connect=self._connect_timeout, pool=self._pool_timeout),
+        )
+
+    async def aclose(self):
+        clients, self._clients = self._clients, {}
+        for client in clients.values():
+            await client.aclose()
+
+    def client(self, name: str, stream: bool = False) -> httpx.AsyncClient:
+        """The shared client for ``name``, or its streaming client when ``stream`` is set."""
+        try:
+            return self._clients[name + STREAM_SUFFIX if stream else name]
+        except KeyError:
+            kind = "streaming upstream" if stream else "upstream"
+            raise RuntimeError(f"{kind} '{name}' is not started") from None
+
+    def stats(self) -> Dict[str, Any]:
+        out: Dict[str, Any] = {}
+        for name, client in self._clients.items():
+            pool = _connection_pool(client)
+            if pool is None:
+                continue
+            connections = list(pool.connections)
+            idle = sum(1 for c in connections if c.is_idle())
+            queued = sum(1 for r in getattr(pool, "_requests", []) if r.is_queued())
+            out[name] = {
+                "connections": len(connections),
+                "idle": idle,
+                "active": len(connections) - idle,
+                "queued": queued,
+                "max_connections": (self._stream_limits if name.endswith(STREAM_SUFFIX) else self._limits).max_connections,
+            }
+        return out
+
+
+def _connection_pool(client: httpx.AsyncClient) -> Optional[Any]:
+    # httpx keeps the httpcore pool on its default transport
+    transport = getattr(client, "_transport", None)
+    return getattr(transport, "_pool", None)
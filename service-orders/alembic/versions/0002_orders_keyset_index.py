@@ -0,0 +1,22 @@
+from alembic import op
+
+revision = '0002_orders_keyset_index'
+down_revision = '0001_init'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # built concurrently so existing tables stay writable; it also covers plain user_id lookups
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_orders_user_id_created_at_id', 'orders', ['user_id', 'created_at', 'id'],
+            unique=False, schema='orders', postgresql_concurrently=True,
+        )
+        op.drop_index('ix_orders_user_id', table_name='orders', schema='orders', postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.create_index('ix_orders_user_id', 'orders', ['user_id'], unique=False, schema='orders', postgresql_concurrently=True)
+        op.drop_index('ix_orders_user_id_created_at_id', table_name='orders', schema='orders', postgresql_concurrently=True)
@@ -0,0 +1,33 @@
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+revision = '0003_order_events_outbox'
+down_revision = '0002_orders_keyset_index'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'order_events',
+        sa.Column('id', sa.BigInteger(), sa.Identity(), primary_key=True, nullable=False),
+        sa.Column('order_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('user_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('type', sa.String(length=64), nullable=False),
+        sa.Column('old_status', sa.String(length=32), nullable=True),
+        sa.Column('new_status', sa.String(length=32), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.Column('published_at', sa.DateTime(timezone=True), nullable=True),
+        schema='orders',
+    )
+    # the relay only ever scans unpublished rows
+    op.create_index(
+        'ix_order_events_unpublished', 'order_events', ['id'], unique=False, schema='orders',
+        postgresql_where=sa.text('published_at IS NULL'),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_order_events_unpublished', table_name='order_events', schema='orders')
+    op.drop_table('order_events', schema='orders')
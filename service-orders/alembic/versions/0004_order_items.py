@@ -0,0 +1,40 @@
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+revision = '0004_order_items'
+down_revision = '0003_order_events_outbox'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'order_items',
+        sa.Column('id', sa.BigInteger(), sa.Identity(), primary_key=True, nullable=False),
+        sa.Column('order_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('sku', sa.Text(), nullable=False),
+        sa.Column('qty', sa.Integer(), nullable=False),
+        sa.Column('price', sa.Numeric(12, 2), nullable=False),
+        sa.ForeignKeyConstraint(
+            ['order_id'], ['orders.orders.id'], name='fk_order_items_order_id_orders', ondelete='CASCADE'
+        ),
+        schema='orders',
+    )
+    # backfill from the JSONB documents before indexing, so the indexes are built once in bulk
+    op.execute(
+        """
+        INSERT INTO orders.order_items (order_id, sku, qty, price)
+        SELECT o.id, it->>'sku', (it->>'qty')::int, (it->>'price')::numeric
+        FROM orders.orders o
+        CROSS JOIN LATERAL jsonb_array_elements(o.items) AS it
+        """
+    )
+    op.create_index('ix_order_items_order_id', 'order_items', ['order_id'], unique=False, schema='orders')
+    op.create_index('ix_order_items_sku_order_id', 'order_items', ['sku', 'order_id'], unique=False, schema='orders')
+
+
+def downgrade() -> None:
+    op.drop_index('ix_order_items_sku_order_id', table_name='order_items', schema='orders')
+    op.drop_index('ix_order_items_order_id', table_name='order_items', schema='orders')
+    op.drop_table('order_items', schema='orders')
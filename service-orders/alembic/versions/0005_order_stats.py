@@ -0,0 +1,32 @@
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+revision = '0005_order_stats'
+down_revision = '0004_order_items'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'order_stats',
+        sa.Column('user_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('status', sa.String(length=32), nullable=False),
+        sa.Column('order_count', sa.BigInteger(), nullable=False, server_default='0'),
+        sa.Column('total_amount', sa.Numeric(14, 2), nullable=False, server_default='0'),
+        sa.PrimaryKeyConstraint('user_id', 'status', name='pk_order_stats'),
+        schema='orders',
+    )
+    op.execute(
+        """
+        INSERT INTO orders.order_stats (user_id, status, order_count, total_amount)
+        SELECT user_id, status, count(*), coalesce(sum(total_amount), 0)
+        FROM orders.orders
+        GROUP BY user_id, status
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('order_stats', schema='orders')
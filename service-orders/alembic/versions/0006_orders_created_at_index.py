@@ -0,0 +1,20 @@
+from alembic import op
+
+revision = '0006_orders_created_at_index'
+down_revision = '0005_order_stats'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # keyset order for exports across all users; per-user exports use ix_orders_user_id_created_at_id
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_orders_created_at_id', 'orders', ['created_at', 'id'],
+            unique=False, schema='orders', postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_orders_created_at_id', table_name='orders', schema='orders', postgresql_concurrently=True)
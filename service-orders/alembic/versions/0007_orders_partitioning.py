@@ -0,0 +1,176 @@
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+revision = '0007_orders_partitioning'
+down_revision = '0006_orders_created_at_index'
+branch_labels = None
+depends_on = None
+
+
+# Monthly partitions orders.orders_pYYYYMM (UTC months) from the month of from_ts up to
+# months_ahead months past the current one; returns how many were created. Rows that
+# already sit in the default partition for a new month are moved into it first.
+ENSURE_PARTITIONS = """
+CREATE OR REPLACE FUNCTION orders.ensure_order_partitions(from_ts timestamptz, months_ahead int)
+RETURNS int LANGUAGE plpgsql AS $$
+DECLARE
+    part_month timestamp := date_trunc('month', from_ts AT TIME ZONE 'UTC');
+    last_month timestamp := date_trunc('month', now() AT TIME ZONE 'UTC') + make_interval(months => months_ahead);
+    lo timestamptz;
+    hi timestamptz;
+    part_name text;
+    created int := 0;
+BEGIN
+    WHILE part_month <= last_month LOOP
+        part_name := 'orders_p' || to_char(part_month, 'YYYYMM');
+        lo := part_month AT TIME ZONE 'UTC';
+        hi := (part_month + interval '1 month') AT TIME ZONE 'UTC';
+        IF to_regclass('orders.' || part_name) IS NULL THEN
+            IF EXISTS (SELECT 1 FROM orders.orders_default WHERE created_at >= lo AND created_at < hi) THEN
+                EXECUTE format('CREATE TABLE orders.%I (LIKE orders.orders INCLUDING DEFAULTS)', part_name);
+                EXECUTE format(
+                    'WITH moved AS (DELETE FROM orders.orders_default WHERE created_at >= %L AND created_at < %L RETURNING *) '
+                    'INSERT INTO orders.%I SELECT * FROM moved', lo, hi, part_name
+                );
+                EXECUTE format('ALTER TABLE orders.orders ATTACH PARTITION orders.%I FOR VALUES FROM (%L) TO (%L)', part_name, lo, hi);
+            ELSE
+                EXECUTE format('CREATE TABLE orders.%I PARTITION OF orders.orders FOR VALUES FROM (%L) TO (%L)', part_name, lo, hi);
+            END IF;
+            created := created + 1;
+        END IF;
+        part_month := part_month + interval '1 month';
+    END LOOP;
+    RETURN created;
+END $$
+"""
+
+
+def upgrade() -> None:
+    # FKs into a partitioned table must include the partition key; order_items rows are
+    # written with their order and only removed by the archival job, which deletes them itself
+    op.drop_constraint('fk_order_items_order_id_orders', 'order_items', schema='orders', type_='foreignkey')
+
+    op.execute("ALTER TABLE orders.orders RENAME TO orders_unpartitioned")
+    op.execute(
+        """
+        DO $$
+        DECLARE pk text;
+        BEGIN
+            SELECT conname INTO pk FROM pg_constraint
+            WHERE conrelid = 'orders.orders_unpartitioned'::regclass AND contype = 'p';
+            EXECUTE format('ALTER TABLE orders.orders_unpartitioned RENAME CONSTRAINT %I TO %I', pk, pk || '_unpartitioned');
+        END $$
+        """
+    )
+    op.drop_index('ix_orders_user_id_created_at_id', table_name='orders_unpartitioned', schema='orders')
+    op.drop_index('ix_orders_created_at_id', table_name='orders_unpartitioned', schema='orders')
+
+    # the partition key has to be part of the primary key
+    op.execute(
+        """
+        CREATE TABLE orders.orders (
+            id uuid NOT NULL,
+            user_id uuid NOT NULL,
+            items jsonb NOT NULL,
+            status varchar(32) NOT NULL DEFAULT 'created',
+            total_amount numeric(12, 2) NOT NULL DEFAULT 0,
+            created_at timestamptz NOT NULL DEFAULT now(),
+            updated_at timestamptz NOT NULL DEFAULT now(),
+            CONSTRAINT pk_orders PRIMARY KEY (id, created_at),
+            CONSTRAINT fk_orders_user_id_users_users FOREIGN KEY (user_id) REFERENCES users.users (id) ON DELETE RESTRICT
+        ) PARTITION BY RANGE (created_at)
+        """
+    )
+    op.execute("CREATE TABLE orders.orders_default PARTITION OF orders.orders DEFAULT")
+    op.execute(ENSURE_PARTITIONS)
+    op.execute(
+        "SELECT orders.ensure_order_partitions(coalesce((SELECT min(created_at) FROM orders.orders_unpartitioned), now()), 3)"
+    )
+    op.execute(
+        """
+        INSERT INTO orders.orders (id, user_id, items, status, total_amount, created_at, updated_at)
+        SELECT id, user_id, items, status, total_amount, created_at, updated_at FROM orders.orders_unpartitioned
+        """
+    )
+    op.drop_table('orders_unpartitioned', schema='orders')
+    # indexes on the parent cascade to every partition, present and future
+    op.create_index('ix_orders_user_id_created_at_id', 'orders', ['user_id', 'created_at', 'id'], unique=False, schema='orders')
+    op.create_index('ix_orders_created_at_id', 'orders', ['created_at', 'id'], unique=False, schema='orders')
+
+    op.create_table(
+        'orders_archive',
+        sa.Column('id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('user_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('items', postgresql.JSONB(astext_type=sa.Text()), nullable=False),
+        sa.Column('status', sa.String(length=32), nullable=False),
+        sa.Column('total_amount', sa.Numeric(12, 2), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), nullable=False),
+        sa.Column('updated_at', sa.DateTime(timezone=True), nullable=False),
+        sa.Column('archived_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.PrimaryKeyConstraint('id', name='pk_orders_archive'),
+        schema='orders',
+    )
+    op.create_index(
+        'ix_orders_archive_user_id_created_at_id', 'orders_archive', ['user_id', 'created_at', 'id'], unique=False, schema='orders'
+    )
+    op.execute("ANALYZE orders.orders")
+
+
+def downgrade() -> None:
+    op.execute("ALTER TABLE orders.orders RENAME TO orders_partitioned")
+    op.execute("ALTER TABLE orders.orders_partitioned RENAME CONSTRAINT pk_orders TO pk_orders_partitioned")
+    op.execute("ALTER INDEX orders.ix_orders_user_id_created_at_id RENAME TO ix_orders_partitioned_user_id_created_at_id")
+    op.execute("ALTER INDEX orders.ix_orders_created_at_id RENAME TO ix_orders_partitioned_created_at_id")
+    op.create_table(
+        'orders',
+        sa.Column('id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('user_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('items', postgresql.JSONB(astext_type=sa.Text()), nullable=False),
+        sa.Column('status', sa.String(length=32), nullable=False, server_default='created'),
+        sa.Column('total_amount', sa.Numeric(12, 2), nullable=False, server_default='0'),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.PrimaryKeyConstraint('id', name='pk_orders'),
+        sa.ForeignKeyConstraint(
+            ['user_id'], ['users.users.id'], name='fk_orders_user_id_users_users', ondelete='RESTRICT'
+        ),
+        schema='orders',
+    )
+    # archived orders come back as live ones; order_stats and order_items are rebuilt for them
+    op.execute(
+        """
+        INSERT INTO orders.orders (id, user_id, items, status, total_amount, created_at, updated_at)
+        SELECT id, user_id, items, status, total_amount, created_at, updated_at FROM orders.orders_partitioned
+        UNION ALL
+        SELECT id, user_id, items, status, total_amount, created_at, updated_at FROM orders.orders_archive
+        """
+    )
+    op.execute(
+        """
+        INSERT INTO orders.order_items (order_id, sku, qty, price)
+        SELECT a.id, it->>'sku', (it->>'qty')::int, (it->>'price')::numeric
+        FROM orders.orders_archive a
+        CROSS JOIN LATERAL jsonb_array_elements(a.items) AS it
+        """
+    )
+    op.execute("DELETE FROM orders.order_stats")
+    op.execute(
+        """
+        INSERT INTO orders.order_stats (user_id, status, order_count, total_amount)
+        SELECT user_id, status, count(*), coalesce(sum(total_amount), 0)
+        FROM orders.orders
+        GROUP BY user_id, status
+        """
+    )
+    op.drop_index('ix_orders_archive_user_id_created_at_id', table_name='orders_archive', schema='orders')
+    op.drop_table('orders_archive', schema='orders')
+    op.drop_table('orders_partitioned', schema='orders')
+    op.execute("DROP FUNCTION orders.ensure_order_partitions(timestamptz, int)")
+    op.create_index('ix_orders_user_id_created_at_id', 'orders', ['user_id', 'created_at', 'id'], unique=False, schema='orders')
+    op.create_index('ix_orders_created_at_id', 'orders', ['created_at', 'id'], unique=False, schema='orders')
+    op.create_foreign_key(
+        'fk_order_items_order_id_orders',
+        'order_items', 'orders', ['order_id'], ['id'],
+        source_schema='orders', referent_schema='orders', ondelete='CASCADE'
+    )
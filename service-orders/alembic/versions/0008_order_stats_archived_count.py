@@ -0,0 +1,29 @@
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0008_order_stats_archived_count'
+down_revision = '0007_orders_partitioning'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # order_count stays the lifetime count; live orders are order_count - archived_count
+    op.add_column(
+        'order_stats',
+        sa.Column('archived_count', sa.BigInteger(), nullable=False, server_default='0'),
+        schema='orders',
+    )
+    op.execute(
+        """
+        UPDATE orders.order_stats s SET archived_count = a.n
+        FROM (
+            SELECT user_id, status, count(*) AS n FROM orders.orders_archive GROUP BY user_id, status
+        ) a
+        WHERE s.user_id = a.user_id AND s.status = a.status
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_column('order_stats', 'archived_count', schema='orders')
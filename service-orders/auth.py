@@ -1,9 +1,10 @@
 import uuid
 from typing import Optional
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Request, status
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
-from common.config import settings
-from common.jwt import decode_jwt
+from common.db import session_dependencies
+from common.jwt import INTERNAL_CLAIMS_HEADER, request_claims
+from .db import sessions
 
 http_bearer = HTTPBearer(auto_error=False)
 
@@ -15,12 +16,15 @@ class CurrentUser:
 
 
 async def get_current_user(
+    request: Request,
     creds: Optional[HTTPAuthorizationCredentials] = Depends(http_bearer),
 ) -> CurrentUser:
-    if creds is None or not creds.credentials:
+    internal = request.headers.get(INTERNAL_CLAIMS_HEADER)
+    if not internal and (creds is None or not creds.credentials):
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Not authenticated")
     try:
-        payload = decode_jwt(creds.credentials, settings.jwt_secret, [settings.jwt_algorithm])
+        # claims verified by the gateway arrive HMAC-signed and skip JWT decoding here
+        payload = request_claims(internal, creds.credentials if creds else None)
         sub = payload.get("sub")
         roles = payload.get("roles") or []
         if not sub:
@@ -31,6 +35,9 @@ async def get_current_user(
     return CurrentUser(user_id, roles)
 
 
+get_read_session, get_write_session = session_dependencies(sessions, get_current_user)
+
+
 def require_manager_or_admin(user: CurrentUser):
     if not any(r in ("manager", "admin") for r in (user.roles or [])):
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="forbidden")
@@ -0,0 +1,78 @@
+import csv
+import io
+import logging
+from typing import AsyncIterator, Callable
+import orjson
+from sqlalchemy import Row
+from common.pagination import encode_cursor
+from .db import sessions
+from .repository import stream_orders
+
+
+logger = logging.getLogger(__name__)
+
+MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv; charset=utf-8"}
+CSV_COLUMNS = ("id", "user_id", "status", "total_amount", "created_at", "updated_at", "items", "cursor")
+
+
+def _ndjson_encoder() -> Callable[[Row], bytes]:
+    def encode(row: Row) -> bytes:
+        data = row._asdict()
+        # asyncpg hands back its own UUID type, which orjson does not serialize
+        data["id"], data["user_id"] = str(row.id), str(row.user_id)
+        data["total_amount"] = float(row.total_amount)
+        # resume token: pass the last fully received line's cursor back as ?cursor=
+        data["cursor"] = encode_cursor(row.created_at, row.id)
+        return orjson.dumps(data) + b"\n"
+
+    return encode
+
+
+def _csv_encoder() -> Callable[[Row], bytes]:
+    out = io.StringIO()
+    writer = csv.writer(out)
+
+    def encode(row: Row) -> bytes:
+        writer.writerow((
+            row.id,
+            row.user_id,
+            row.status,
+            row.total_amount,
+            row.created_at.isoformat(),
+            row.updated_at.isoformat(),
+            orjson.dumps(row.items).decode() if "items" in row._fields else "",
+            encode_cursor(row.created_at, row.id),
+        ))
+        data = out.getvalue().encode()
+        out.seek(0)
+        out.truncate()
+        return data
+
+    return encode
+
+
+async def export_orders(key, fmt: str, *, chunk_bytes: int, **filters) -> AsyncIterator[bytes]:
+    """Encoded orders for a StreamingResponse, flushed in chunks of about ``chunk_bytes``.
+
+    The response outlives the request's dependencies, so the stream opens its own
+    (replica) session and holds it until the last row or until the client goes away.
+    """
+    encode = _ndjson_encoder() if fmt == "ndjson" else _csv_encoder()
+    buffer = bytearray()
+    if fmt == "csv":
+        buffer += ",".join(CSV_COLUMNS).encode() + b"\r\n"
+    async with await sessions.read_session(key) as session:
+        try:
+            async for row in stream_orders(session, **filters):
+                buffer += encode(row)
+                if len(buffer) >= chunk_bytes:
+                    yield bytes(buffer)
+                    buffer.clear()
+        except Exception:
+            # the status line is gone; complete rows still reach the client, which resumes from the last cursor
+            logger.exception("order export aborted")
+            if buffer:
+                yield bytes(buffer)
+            raise
+    if buffer:
+        yield bytes(buffer)
@@ -1,14 +1,23 @@
 from fastapi import FastAPI
-from common.middleware import RequestIDMiddleware
+from fastapi.responses import ORJSONResponse
+from common.middleware import RequestContextMiddleware
 from common.errors import add_exception_handlers
+from common.config import settings
 from common.responses import ok
 from common.logging import setup_logging
 from common.otel import setup_tracing
+from common.metrics import install_metrics, DatabaseCollector
+from common.db import instrument_engine
+from .db import database, sessions
 from .routes import router as orders_router
+from .outbox import relay
+from .maintenance import maintenance
 
-app = FastAPI(title="service-orders", version="0.1.0")
-app.add_middleware(RequestIDMiddleware)
+app = FastAPI(title="service-orders", version="0.1.0", default_response_class=ORJSONResponse)
+app.add_middleware(RequestContextMiddleware, server_timing=settings.server_timing)
 add_exception_handlers(app)
+install_metrics(app, "service-orders", [DatabaseCollector("service-orders", database)])
+instrument_engine(database.engine, "service-orders")
 
 
 @app.get("/health")
@@ -16,11 +25,27 @@ async def health():
     return ok({"status": "ok"})
 
 
+@app.get("/health/db")
+async def health_db():
+    return ok({**database.pool_stats(), **sessions.stats()})
+
+
 app.include_router(orders_router)
 
 
 @app.on_event("startup")
 async def on_startup():
-    setup_logging("service-orders")
-    from common.config import settings
+    setup_logging("service-orders", queue_size=settings.log_queue_size, access_sample_rate=settings.log_access_sample_rate)
     setup_tracing(app, "service-orders", settings.otel_exporter_otlp_endpoint)
+    await database.start()
+    await sessions.start()
+    await relay.start()
+    await maintenance.start()
+
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    await maintenance.aclose()
+    await relay.aclose()
+    await sessions.close()
+    await database.close()
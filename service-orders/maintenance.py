@@ -0,0 +1,141 @@
+import argparse
+import asyncio
+import logging
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+from sqlalchemy import func, select
+from common.config import settings
+from .db import async_session_maker, engine
+from .repository import archive_orders, ensure_partitions, rebuild_order_stats, user_ids_after
+
+
+logger = logging.getLogger(__name__)
+
+# pg_try_advisory_xact_lock key, so one worker in the fleet creates partitions per round
+PARTITION_LOCK_KEY = 0x6F726473
+
+
+class OrdersMaintenance:
+    """Keeps future monthly partitions of orders.orders in place and archives old terminal orders.
+
+    Every ``interval`` seconds partitions are created up to ``months_ahead`` months ahead
+    (so inserts never fall into the default partition), then done/canceled orders older
+    than ``archive_after_days`` are moved to orders_archive in batches of ``batch_size``
+    (0, the default, leaves them in place). Each batch is its own short transaction; workers share batches through SKIP LOCKED.
+    """
+
+    def __init__(
+        self,
+        session_maker,
+        *,
+        interval: float = 3600.0,
+        months_ahead: int = 3,
+        archive_after_days: int = 0,
+        batch_size: int = 1000,
+    ):
+        self.session_maker = session_maker
+        self.interval = interval
+        self.months_ahead = months_ahead
+        self.archive_after_days = archive_after_days
+        self.batch_size = batch_size
+        self._task: Optional[asyncio.Task] = None
+        self.partitions_created = 0
+        self.archived = 0
+
+    async def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._loop())
+
+    async def aclose(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _loop(self):
+        while True:
+            try:
+                await self.run_once()
+            except Exception as exc:
+                logger.warning("orders maintenance failed: %s", exc)
+            await asyncio.sleep(self.interval)
+
+    async def run_once(self):
+        async with self.session_maker() as session:
+            locked = (await session.execute(select(func.pg_try_advisory_xact_lock(PARTITION_LOCK_KEY)))).scalar_one()
+            if locked:
+                created = await ensure_partitions(session, self.months_ahead)
+                if created:
+                    logger.info("created %d orders partitions", created)
+                self.partitions_created += created
+        if self.archive_after_days > 0:
+            await self.archive()
+
+    async def archive(self) -> int:
+        before = datetime.now(timezone.utc) - timedelta(days=self.archive_after_days)
+        total = 0
+        while True:
+            async with self.session_maker() as session:
+                moved = await archive_orders(session, before=before, batch_size=self.batch_size)
+            total += moved
+            if moved < self.batch_size:
+                break
+        if total:
+            logger.info("archived %d orders created before %s", total, before.isoformat())
+        self.archived += total
+        return total
+
+    async def rebuild_stats(self, user_id=None, batch_size: Optional[int] = None) -> int:
+        """Recompute order_stats for one user, or for all of them ``batch_size`` users per transaction."""
+        if user_id is not None:
+            async with self.session_maker() as session:
+                return await rebuild_order_stats(session, [user_id])
+        batch_size = batch_size or self.batch_size
+        rows = users = 0
+        after = None
+        while True:
+            async with self.session_maker() as session:
+                user_ids = await user_ids_after(session, after, batch_size)
+                if user_ids:
+                    rows += await rebuild_order_stats(session, user_ids)
+            users += len(user_ids)
+            if len(user_ids) < batch_size:
+                break
+            after = user_ids[-1]
+        logger.info("rebuilt %d order_stats rows for %d users", rows, users)
+        return rows
+
+
+maintenance = OrdersMaintenance(
+    async_session_maker,
+    interval=settings.orders_maintenance_interval,
+    months_ahead=settings.orders_partition_months_ahead,
+    archive_after_days=settings.orders_archive_after_days,
+    batch_size=settings.orders_archive_batch_size,
+)
+
+
+async def _rebuild_stats(user_id, batch_size) -> int:
+    try:
+        return await maintenance.rebuild_stats(user_id, batch_size)
+    finally:
+        await engine.dispose()
+
+
+def main(argv=None):
+    """Offline commands, run with ``python -m common.manage service-orders <command>``."""
+    parser = argparse.ArgumentParser(prog="python -m common.manage service-orders")
+    commands = parser.add_subparsers(dest="command", required=True)
+    rebuild = commands.add_parser("rebuild-stats", help="recompute order_stats from orders and orders_archive")
+    rebuild.add_argument("--user-id", type=uuid.UUID, default=None, help="only this user (default: every user)")
+    rebuild.add_argument("--batch-size", type=int, default=None, help="users per transaction")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    if args.command == "rebuild-stats":
+        rows = asyncio.run(_rebuild_stats(args.user_id, args.batch_size))
+        print(f"order_stats rows: {rows}")
@@ -2,7 +2,7 @@ import uuid
 from datetime import datetime
 from enum import Enum
 from sqlalchemy.orm import Mapped, mapped_column
-from sqlalchemy import DateTime, String, Numeric, text, ForeignKey
+from sqlalchemy import BigInteger, DateTime, Identity, Integer, String, Numeric, Text, text, ForeignKey, Index
 from sqlalchemy.dialects.postgresql import UUID, JSONB
 from .db import Base
 
@@ -15,15 +15,101 @@ class OrderStatus(str, Enum):
 
 
 class Order(Base):
+    """Live orders, range-partitioned by month of ``created_at`` (see ensure_order_partitions).
+
+    The partition key is part of the primary key. New ids are UUIDv7 and ``created_at`` is
+    taken from them, so a lookup by id also pins the partition (see repository._by_id).
+    """
+
     __tablename__ = "orders"
-    __table_args__ = {"schema": "orders"}
+    __table_args__ = (
+        Index("ix_orders_user_id_created_at_id", "user_id", "created_at", "id"),
+        Index("ix_orders_created_at_id", "created_at", "id"),
+        {"schema": "orders", "postgresql_partition_by": "RANGE (created_at)"},
+    )
 
     id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     user_id: Mapped[uuid.UUID] = mapped_column(
-        UUID(as_uuid=True), ForeignKey("users.users.id", ondelete="RESTRICT"), nullable=False, index=True
+        UUID(as_uuid=True), ForeignKey("users.users.id", ondelete="RESTRICT"), nullable=False
     )
     items: Mapped[list] = mapped_column(JSONB, nullable=False)
     status: Mapped[str] = mapped_column(String(32), nullable=False, default=OrderStatus.created.value)
     total_amount: Mapped[float] = mapped_column(Numeric(12, 2), nullable=False, default=0)
-    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=text("now()"), nullable=False)
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), primary_key=True, server_default=text("now()"), nullable=False
+    )
     updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=text("now()"), nullable=False)
+
+
+class OrderArchive(Base):
+    """Done and canceled orders moved out of ``orders`` by the archival job; still counted in order_stats (see OrderStat)."""
+
+    __tablename__ = "orders_archive"
+    __table_args__ = (
+        Index("ix_orders_archive_user_id_created_at_id", "user_id", "created_at", "id"),
+        {"schema": "orders"},
+    )
+
+    id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True)
+    user_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), nullable=False)
+    items: Mapped[list] = mapped_column(JSONB, nullable=False)
+    status: Mapped[str] = mapped_column(String(32), nullable=False)
+    total_amount: Mapped[float] = mapped_column(Numeric(12, 2), nullable=False)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
+    updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
+    archived_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=text("now()"), nullable=False)
+
+
+class OrderItem(Base):
+    """Normalized copy of ``Order.items`` for SKU queries and SQL-side totals; written once, on create.
+
+    No FK to orders (it would have to carry the partition key); the archival job deletes the rows.
+    """
+
+    __tablename__ = "order_items"
+    __table_args__ = (
+        Index("ix_order_items_sku_order_id", "sku", "order_id"),
+        {"schema": "orders"},
+    )
+
+    id: Mapped[int] = mapped_column(BigInteger, Identity(), primary_key=True)
+    order_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), nullable=False, index=True)
+    sku: Mapped[str] = mapped_column(Text, nullable=False)
+    qty: Mapped[int] = mapped_column(Integer, nullable=False)
+    price: Mapped[float] = mapped_column(Numeric(12, 2), nullable=False)
+
+
+class OrderStat(Base):
+    """Per-user order count and spend by status, kept in step with orders in the same transactions.
+
+    Counts are lifetime counts and include archived orders; ``archived_count`` of them are
+    in orders_archive, so the live ones are ``order_count - archived_count``.
+    """
+
+    __tablename__ = "order_stats"
+    __table_args__ = {"schema": "orders"}
+
+    user_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True)
+    status: Mapped[str] = mapped_column(String(32), primary_key=True)
+    order_count: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0)
+    total_amount: Mapped[float] = mapped_column(Numeric(14, 2), nullable=False, default=0)
+    archived_count: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0, server_default=text("0"))
+
+
+class OrderEvent(Base):
+    """Transactional outbox: written with the status change, published to Redis by OutboxRelay."""
+
+    __tablename__ = "order_events"
+    __table_args__ = (
+        Index("ix_order_events_unpublished", "id", postgresql_where=text("published_at IS NULL")),
+        {"schema": "orders"},
+    )
+
+    id: Mapped[int] = mapped_column(BigInteger, Identity(), primary_key=True)
+    order_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), nullable=False)
+    user_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), nullable=False)
+    type: Mapped[str] = mapped_column(String(64), nullable=False)
+    old_status: Mapped[str | None] = mapped_column(String(32), nullable=True)
+    new_status: Mapped[str] = mapped_column(String(32), nullable=False)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=text("now()"), nullable=False)
+    published_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
@@ -0,0 +1,174 @@
+import asyncio
+import logging
+import time
+from datetime import timedelta
+from typing import AsyncIterator, Dict, Optional
+import orjson
+import redis.asyncio as redis
+from sqlalchemy import delete, func, select, update
+from common.config import settings
+from .db import async_session_maker
+from .models import OrderEvent
+
+
+logger = logging.getLogger(__name__)
+
+
+def user_stream(stream: str, user_id) -> str:
+    return f"{stream}:{user_id}"
+
+
+def _fields(event: OrderEvent) -> Dict[str, str]:
+    return {
+        "event_id": str(event.id),
+        "type": event.type,
+        "order_id": str(event.order_id),
+        "user_id": str(event.user_id),
+        "old_status": event.old_status or "",
+        "new_status": event.new_status,
+        "created_at": event.created_at.isoformat(),
+    }
+
+
+class OutboxRelay:
+    """Publishes committed order events from the outbox table to Redis Streams.
+
+    Each event goes to the global stream (for batch consumers, e.g. via XREADGROUP) and
+    to a per-user stream (for SSE subscribers). Rows are claimed with FOR UPDATE SKIP
+    LOCKED, so relays in every replica share the work, and are marked published only
+    after XADD succeeded: delivery is at-least-once, consumers dedupe on ``event_id``.
+    """
+
+    def __init__(
+        self,
+        session_maker,
+        redis_url: str,
+        *,
+        stream: str,
+        stream_maxlen: int = 100000,
+        user_stream_maxlen: int = 1000,
+        user_stream_ttl: int = 86400,
+        batch_size: int = 500,
+        interval: float = 1.0,
+        retention_seconds: int = 86400,
+    ):
+        self.session_maker = session_maker
+        self.stream = stream
+        self.stream_maxlen = stream_maxlen
+        self.user_stream_maxlen = user_stream_maxlen
+        self.user_stream_ttl = user_stream_ttl
+        self.batch_size = batch_size
+        self.interval = interval
+        self.retention_seconds = retention_seconds
+        self._redis = redis.from_url(redis_url, encoding="utf-8", decode_responses=True)
+        self._wake = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._last_purge = 0.0
+        self.published = 0
+
+    def wake(self):
+        """Publish now instead of at the next poll; called after a status change commits."""
+        self._wake.set()
+
+    async def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._loop())
+
+    async def aclose(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self._redis.aclose()
+
+    async def _loop(self):
+        while True:
+            self._wake.clear()
+            try:
+                published = await self.publish_batch()
+                if time.monotonic() - self._last_purge > 300:
+                    await self.purge()
+            except Exception as exc:
+                logger.warning("outbox relay failed: %s", exc)
+                published = 0
+            if published >= self.batch_size:
+                continue
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def publish_batch(self) -> int:
+        async with self.session_maker() as session:
+            stmt = (
+                select(OrderEvent)
+                .where(OrderEvent.published_at.is_(None))
+                .order_by(OrderEvent.id)
+                .limit(self.batch_size)
+                .with_for_update(skip_locked=True)
+            )
+            events = (await session.execute(stmt)).scalars().all()
+            if not events:
+                return 0
+            async with self._redis.pipeline(transaction=False) as pipe:
+                for event in events:
+                    fields = _fields(event)
+                    pipe.xadd(self.stream, fields, maxlen=self.stream_maxlen, approximate=True)
+                    pipe.xadd(user_stream(self.stream, event.user_id), fields, maxlen=self.user_stream_maxlen, approximate=True)
+                # per-user streams of users who go quiet expire instead of piling up
+                for user_id in {event.user_id for event in events}:
+                    pipe.expire(user_stream(self.stream, user_id), self.user_stream_ttl)
+                await pipe.execute()
+            await session.execute(
+                update(OrderEvent).where(OrderEvent.id.in_([e.id for e in events])).values(published_at=func.now())
+            )
+            await session.commit()
+        self.published += len(events)
+        return len(events)
+
+    async def purge(self):
+        self._last_purge = time.monotonic()
+        async with self.session_maker() as session:
+            await session.execute(
+                delete(OrderEvent).where(
+                    OrderEvent.published_at < func.now() - timedelta(seconds=self.retention_seconds)
+                )
+            )
+            await session.commit()
+
+    async def subscribe(self, stream: str, last_id: Optional[str], heartbeat: float) -> AsyncIterator[bytes]:
+        """Server-sent events from ``stream``, resuming after ``last_id`` (the Last-Event-ID)."""
+        if not last_id:
+            # start at the current tail; re-reading "$" on every call could skip events between calls
+            latest = await self._redis.xrevrange(stream, count=1)
+            last_id = latest[0][0] if latest else "0-0"
+        yield b"retry: 3000\n\n"
+        while True:
+            batches = await self._redis.xread({stream: last_id}, count=100, block=int(heartbeat * 1000))
+            if not batches:
+                yield b": keepalive\n\n"
+                continue
+            for _, entries in batches:
+                for entry_id, fields in entries:
+                    last_id = entry_id
+                    yield b"id: %s\nevent: %s\ndata: %s\n\n" % (
+                        entry_id.encode(),
+                        fields.get("type", "message").encode(),
+                        orjson.dumps(fields),
+                    )
+
+
+relay = OutboxRelay(
+    async_session_maker,
+    settings.redis_url,
+    stream=settings.order_events_stream,
+    stream_maxlen=settings.order_events_maxlen,
+    user_stream_maxlen=settings.order_events_user_maxlen,
+    user_stream_ttl=settings.order_events_user_ttl_seconds,
+    batch_size=settings.outbox_batch_size,
+    interval=settings.outbox_poll_interval,
+    retention_seconds=settings.outbox_retention_seconds,
+)
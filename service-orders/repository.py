@@ -1,49 +1,462 @@
-from typing import Optional, Sequence, Tuple
+import os
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from typing import AsyncIterator, Optional, Sequence, Tuple, Union
+import orjson
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func, update
-from .models import Order, OrderStatus
+from sqlalchemy import (
+    ARRAY, DateTime, Integer, Numeric, Row, String, Text,
+    bindparam, cast, select, func, update, insert, delete, exists, tuple_, table, column, union_all, literal,
+)
+from sqlalchemy.dialects.postgresql import JSONB, UUID, insert as pg_insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import defer
+from .models import Order, OrderArchive, OrderEvent, OrderItem, OrderStat, OrderStatus
 
+# only the FK target is needed to pre-check owners for bulk inserts
+users_table = table("users", column("id", UUID(as_uuid=True)), schema="users")
 
-def _calc_total(items: list) -> float:
-    return float(sum((it.get("price", 0) * it.get("qty", 0)) for it in items))
+TERMINAL_STATUSES = (OrderStatus.done.value, OrderStatus.canceled.value)
+ORDER_STATUS_CHANGED = "order.status_changed"
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+def new_order_id() -> uuid.UUID:
+    """UUIDv7 (RFC 9562): 48 bits of Unix milliseconds, version, 74 random bits."""
+    ms = time.time_ns() // 1_000_000
+    rand = int.from_bytes(os.urandom(10), "big")
+    value = (ms << 80) | (0x7 << 76) | (((rand >> 62) & 0xFFF) << 64) | (0b10 << 62) | (rand & ((1 << 62) - 1))
+    return uuid.UUID(int=value)
+
+
+def order_created_at(order_id: uuid.UUID) -> Optional[datetime]:
+    """created_at of an order with a UUIDv7 id; None for ids that predate them."""
+    if order_id.version != 7:
+        return None
+    return EPOCH + timedelta(milliseconds=order_id.int >> 80)
+
+
+def _by_id(order_id) -> list:
+    # with the partition key pinned Postgres probes one partition instead of all of them
+    conditions = [Order.id == order_id]
+    created_at = order_created_at(order_id)
+    if created_at is not None:
+        conditions.append(Order.created_at == created_at)
+    return conditions
+
+
+def _order_row(user_id, items: list) -> dict:
+    order_id = new_order_id()
+    return {
+        "id": order_id,
+        "created_at": order_created_at(order_id),
+        "user_id": user_id,
+        "items": items,
+        "status": OrderStatus.created.value,
+    }
+
+
+def _item_rows(order_id, items: list) -> list[dict]:
+    return [{"order_id": order_id, "sku": it["sku"], "qty": it["qty"], "price": it["price"]} for it in items]
+
+
+async def _bump_stats(session: AsyncSession, deltas: dict):
+    """Apply {(user_id, status): (count, amount[, archived])} deltas to order_stats in one upsert."""
+    if not deltas:
+        return
+    # a fixed key order keeps concurrent transactions from deadlocking on the same rows
+    rows = []
+    for (user_id, status), (count, amount, *archived) in sorted(deltas.items(), key=lambda kv: (str(kv[0][0]), kv[0][1])):
+        rows.append({
+            "user_id": user_id,
+            "status": status,
+            "order_count": count,
+            "total_amount": amount,
+            "archived_count": archived[0] if archived else 0,
+        })
+    stmt = pg_insert(OrderStat).values(rows)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[OrderStat.user_id, OrderStat.status],
+        set_={
+            "order_count": OrderStat.order_count + stmt.excluded.order_count,
+            "total_amount": OrderStat.total_amount + stmt.excluded.total_amount,
+            "archived_count": OrderStat.archived_count + stmt.excluded.archived_count,
+        },
+    )
+    await session.execute(stmt)
+
+
+def _unnest(**columns):
+    """``unnest(:a, :b, ...) AS v(a, b, ...)``: one array parameter per column, whatever the row count."""
+    arrays = [bindparam(f"{name}_values", values, type_=ARRAY(type_)) for name, (type_, values) in columns.items()]
+    return func.unnest(*arrays).table_valued(*columns).render_derived()
+
+
+async def _insert_orders(session: AsyncSession, rows: list[dict]) -> dict:
+    """Insert orders with their order_items rows; totals are summed by Postgres in NUMERIC.
+
+    One statement writes both tables: the items CTE returns each line's amount and the
+    orders are inserted with their totals, so no order row is written twice. Two round
+    trips for any number of orders, order_stats included. Returns the created Orders by id.
+    """
+    item_rows = [item for row in rows for item in _item_rows(row["id"], row["items"])]
+    item_values = _unnest(
+        order_id=(UUID(as_uuid=True), [it["order_id"] for it in item_rows]),
+        sku=(Text, [it["sku"] for it in item_rows]),
+        qty=(Integer, [it["qty"] for it in item_rows]),
+        price=(Numeric(12, 2), [Decimal(str(it["price"])) for it in item_rows]),
+    )
+    new_items = (
+        insert(OrderItem)
+        .from_select(["order_id", "sku", "qty", "price"], select(item_values))
+        .returning(OrderItem.order_id, (OrderItem.qty * OrderItem.price).label("amount"))
+        .cte("new_items")
+    )
+    totals = (
+        select(new_items.c.order_id, func.sum(new_items.c.amount).label("total"))
+        .group_by(new_items.c.order_id)
+        .cte("totals")
+    )
+    order_values = _unnest(
+        id=(UUID(as_uuid=True), [row["id"] for row in rows]),
+        created_at=(DateTime(timezone=True), [row["created_at"] for row in rows]),
+        user_id=(UUID(as_uuid=True), [row["user_id"] for row in rows]),
+        items=(Text, [orjson.dumps(row["items"]).decode() for row in rows]),
+        status=(String(32), [row["status"] for row in rows]),
+    )
+    source = select(
+        order_values.c.id,
+        order_values.c.created_at,
+        order_values.c.user_id,
+        cast(order_values.c["items"], JSONB),
+        order_values.c.status,
+        func.coalesce(totals.c.total, 0),
+    ).select_from(order_values.outerjoin(totals, totals.c.order_id == order_values.c.id))
+    stmt = (
+        insert(Order)
+        .from_select(["id", "created_at", "user_id", "items", "status", "total_amount"], source)
+        .returning(Order)
+    )
+    created = {order.id: order for order in (await session.scalars(stmt)).all()}
+    deltas: dict = {}
+    for order in created.values():
+        count, amount = deltas.get((order.user_id, order.status), (0, 0))
+        deltas[(order.user_id, order.status)] = (count + 1, amount + order.total_amount)
+    await _bump_stats(session, deltas)
+    return created
 
 
 async def create_order(session: AsyncSession, *, user_id, items: list) -> Order:
-    order = Order(user_id=user_id, items=items, status=OrderStatus.created.value, total_amount=_calc_total(items))
-    session.add(order)
+    row = _order_row(user_id, items)
+    order = (await _insert_orders(session, [row]))[row["id"]]
     await session.commit()
-    await session.refresh(order)
     return order
 
 
-async def get_order(session: AsyncSession, order_id) -> Optional[Order]:
-    res = await session.execute(select(Order).where(Order.id == order_id))
-    return res.scalar_one_or_none()
+async def create_orders_bulk(session: AsyncSession, orders: list[tuple]) -> list[Union[Order, str]]:
+    """Insert many (user_id, items) orders in one transaction.
+
+    Returns one entry per input, in order: the created Order or an error code.
+    """
+    user_ids = {user_id for user_id, _ in orders}
+    existing = set((await session.execute(select(users_table.c.id).where(users_table.c.id.in_(user_ids)))).scalars())
+    results: list[Union[Order, str]] = ["user_not_exist"] * len(orders)
+    pending = [(i, _order_row(user_id, items)) for i, (user_id, items) in enumerate(orders) if user_id in existing]
+    if not pending:
+        return results
+
+    try:
+        created = await _insert_orders(session, [row for _, row in pending])
+        await session.commit()
+    except IntegrityError:
+        # an owner vanished after the pre-check; retry order by order to isolate the failures
+        await session.rollback()
+        created = {}
+        for _, row in pending:
+            try:
+                async with session.begin_nested():
+                    created.update(await _insert_orders(session, [row]))
+            except IntegrityError:
+                pass
+        await session.commit()
+    for i, row in pending:
+        results[i] = created.get(row["id"], "user_not_exist")
+    return results
+
+
+async def get_order(session: AsyncSession, order_id) -> Optional[Union[Order, OrderArchive]]:
+    """The live order, or its archived copy once the archival job has moved it."""
+    order = (await session.execute(select(Order).where(*_by_id(order_id)))).scalar_one_or_none()
+    if order is None:
+        order = await session.get(OrderArchive, order_id)
+    return order
 
 
 async def list_orders_by_user(
-    session: AsyncSession, *, user_id, page: int = 1, size: int = 20, sort: str = "-created_at"
-) -> Tuple[Sequence[Order], int]:
-    stmt = select(Order).where(Order.user_id == user_id)
-    # simple sort: created_at asc/desc
-    if sort in ("created_at", "-created_at"):
-        order_by = Order.created_at.desc() if sort.startswith("-") else Order.created_at.asc()
-        stmt = stmt.order_by(order_by)
-    stmt = stmt.offset((page - 1) * size).limit(size)
-    rows = (await session.execute(stmt)).scalars().all()
-    total = (await session.execute(select(func.count()).select_from(Order).where(Order.user_id == user_id))).scalar_one()
-    return rows, total
-
-
-async def update_status(session: AsyncSession, order: Order, *, status: OrderStatus) -> Order:
-    order.status = status.value if isinstance(status, OrderStatus) else str(status)
+    session: AsyncSession,
+    *,
+    user_id,
+    page: int = 1,
+    size: int = 20,
+    sort: str = "-created_at",
+    after: Optional[Tuple[datetime, uuid.UUID]] = None,
+    with_total: bool = True,
+    include_items: bool = True,
+    sku: Optional[str] = None,
+) -> Tuple[Sequence[Order], Optional[int], bool]:
+    conditions = [Order.user_id == user_id]
+    if sku is not None:
+        # semi-join through ix_order_items_sku_order_id
+        conditions.append(exists().where(OrderItem.order_id == Order.id, OrderItem.sku == sku))
+    stmt = select(Order).where(*conditions)
+    if not include_items:
+        stmt = stmt.options(defer(Order.items))
+    # created_at asc/desc, id breaks ties so keyset pages are stable; served by (user_id, created_at, id)
+    descending = sort != "created_at"
+    if descending:
+        stmt = stmt.order_by(Order.created_at.desc(), Order.id.desc())
+    else:
+        stmt = stmt.order_by(Order.created_at.asc(), Order.id.asc())
+    if after is not None:
+        key = tuple_(Order.created_at, Order.id)
+        # the plain created_at bound is what lets the planner skip partitions past the cursor
+        if descending:
+            stmt = stmt.where(key < tuple_(*after), Order.created_at <= after[0])
+        else:
+            stmt = stmt.where(key > tuple_(*after), Order.created_at >= after[0])
+    else:
+        stmt = stmt.offset((page - 1) * size)
+    # one extra row tells whether another page exists without a count
+    rows = (await session.execute(stmt.limit(size + 1))).scalars().all()
+    total = None
+    if with_total:
+        if sku is None:
+            # O(statuses) from the maintained aggregates instead of counting the user's orders;
+            # archived orders are not listed, so they are not counted either
+            count = select(func.coalesce(func.sum(OrderStat.order_count - OrderStat.archived_count), 0)).where(
+                OrderStat.user_id == user_id
+            )
+        else:
+            count = select(func.count()).select_from(Order).where(*conditions)
+        total = (await session.execute(count)).scalar_one()
+    return rows[:size], total, len(rows) > size
+
+
+async def stream_orders(
+    session: AsyncSession,
+    *,
+    user_id=None,
+    status: Optional[str] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    sku: Optional[str] = None,
+    after: Optional[Tuple[datetime, uuid.UUID]] = None,
+    include_items: bool = True,
+    archived: bool = False,
+    batch_size: int = 1000,
+) -> AsyncIterator[Row]:
+    """Orders in (created_at, id) order through a server-side cursor, ``batch_size`` rows per fetch.
+
+    Plain rows instead of ORM objects: nothing is added to the session's identity map,
+    so memory stays flat however many rows are streamed. ``archived`` reads orders_archive.
+    """
+    source = OrderArchive if archived else Order
+    columns = [source.id, source.user_id, source.status, source.total_amount, source.created_at, source.updated_at]
+    if include_items:
+        columns.append(source.items)
+    conditions = []
+    if user_id is not None:
+        conditions.append(source.user_id == user_id)
+    if status is not None:
+        conditions.append(source.status == status)
+    if created_from is not None:
+        conditions.append(source.created_at >= created_from)
+    if created_to is not None:
+        conditions.append(source.created_at < created_to)
+    if sku is not None:
+        if archived:
+            # archived orders keep only their JSONB items
+            conditions.append(source.items.contains([{"sku": sku}]))
+        else:
+            conditions.append(exists().where(OrderItem.order_id == Order.id, OrderItem.sku == sku))
+    if after is not None:
+        conditions.append(tuple_(source.created_at, source.id) > tuple_(*after))
+        conditions.append(source.created_at >= after[0])
+    stmt = (
+        select(*columns)
+        .where(*conditions)
+        .order_by(source.created_at.asc(), source.id.asc())
+        .execution_options(yield_per=batch_size)
+    )
+    result = await session.stream(stmt)
+    async for row in result:
+        yield row
+
+
+async def _update_returning(session: AsyncSession, order_id, *conditions, status: str) -> Optional[Order]:
+    # the CTE locks the row while reading its previous status, so the outbox event is exact
+    by_id = _by_id(order_id)
+    old = select(Order.id, Order.created_at, Order.status).where(*by_id, *conditions).with_for_update().cte("old")
+    stmt = (
+        update(Order)
+        # the literal key conditions let the planner prune partitions for the UPDATE too
+        .where(Order.id == old.c.id, Order.created_at == old.c.created_at, *by_id)
+        .values(status=status, updated_at=func.now())
+        .returning(Order, old.c.status)
+        .execution_options(populate_existing=True)
+    )
+    row = (await session.execute(stmt)).one_or_none()
+    if row is None:
+        await session.commit()
+        return None
+    order, old_status = row
+    if old_status != status:
+        await _bump_stats(
+            session,
+            {
+                (order.user_id, old_status): (-1, -order.total_amount),
+                (order.user_id, status): (1, order.total_amount),
+            },
+        )
+        # same transaction as the update: the event exists if and only if the change committed
+        await session.execute(
+            insert(OrderEvent).values(
+                order_id=order.id, user_id=order.user_id, type=ORDER_STATUS_CHANGED, old_status=old_status, new_status=status
+            )
+        )
     await session.commit()
-    await session.refresh(order)
     return order
 
 
-async def cancel_order(session: AsyncSession, order: Order) -> Order:
-    order.status = OrderStatus.canceled.value
+async def update_status(session: AsyncSession, order_id, *, status: OrderStatus) -> Optional[Order]:
+    """Set the status in a single UPDATE ... RETURNING; None when the order does not exist."""
+    value = status.value if isinstance(status, OrderStatus) else str(status)
+    return await _update_returning(session, order_id, status=value)
+
+
+async def cancel_order(session: AsyncSession, order_id, *, user_id) -> Optional[Order]:
+    """Cancel the user's order unless it is already terminal.
+
+    Ownership and status are checked by the UPDATE itself, so concurrent status changes
+    cannot slip in between a read and the write. None means nothing was updated.
+    """
+    return await _update_returning(
+        session,
+        order_id,
+        Order.user_id == user_id,
+        Order.status.not_in(TERMINAL_STATUSES),
+        status=OrderStatus.canceled.value,
+    )
+
+
+async def get_order_stats(session: AsyncSession, user_id) -> Sequence[OrderStat]:
+    return (await session.scalars(select(OrderStat).where(OrderStat.user_id == user_id))).all()
+
+
+async def user_ids_after(session: AsyncSession, after, limit: int) -> list:
+    """Up to ``limit`` user ids following ``after`` (None: from the first), in id order."""
+    stmt = select(users_table.c.id).order_by(users_table.c.id).limit(limit)
+    if after is not None:
+        stmt = stmt.where(users_table.c.id > after)
+    return list((await session.scalars(stmt)).all())
+
+
+async def rebuild_order_stats(session: AsyncSession, user_ids: Sequence) -> int:
+    """Recompute the order_stats rows of ``user_ids`` from orders and orders_archive; returns the rows kept.
+
+    Only these users' rows are locked, in the order _bump_stats takes them, so writers for
+    other users are not held up and writers for these users wait for the commit and apply
+    their deltas on top of the rebuilt rows. A row for every status is committed first, so
+    no order written meanwhile can land in a row the rebuild does not hold. Rows that end
+    up at zero are dropped; a writer waiting on one inserts it afresh.
+    """
+    user_ids = sorted(set(user_ids), key=str)
+    if not user_ids:
+        return 0
+    statuses = sorted(s.value for s in OrderStatus)
+    await session.execute(
+        pg_insert(OrderStat)
+        .values([{"user_id": u, "status": s, "order_count": 0, "total_amount": 0} for u in user_ids for s in statuses])
+        .on_conflict_do_nothing()
+    )
     await session.commit()
-    await session.refresh(order)
-    return order
+
+    stats = OrderStat.user_id.in_(user_ids)
+    await session.execute(
+        select(OrderStat.user_id).where(stats).order_by(OrderStat.user_id, OrderStat.status.collate("C")).with_for_update()
+    )
+    live = select(Order.user_id, Order.status, Order.total_amount, literal(0).label("archived")).where(Order.user_id.in_(user_ids))
+    archived = (
+        select(OrderArchive.user_id, OrderArchive.status, OrderArchive.total_amount, literal(1).label("archived"))
+        .where(OrderArchive.user_id.in_(user_ids))
+    )
+    orders = union_all(live, archived).subquery("all_orders")
+    totals = (
+        select(
+            orders.c.user_id,
+            orders.c.status,
+            func.count().label("order_count"),
+            func.coalesce(func.sum(orders.c.total_amount), 0).label("total_amount"),
+            func.sum(orders.c.archived).label("archived_count"),
+        )
+        .group_by(orders.c.user_id, orders.c.status)
+        .subquery("totals")
+    )
+    await session.execute(update(OrderStat).where(stats).values(order_count=0, total_amount=0, archived_count=0))
+    result = await session.execute(
+        update(OrderStat)
+        .where(OrderStat.user_id == totals.c.user_id, OrderStat.status == totals.c.status)
+        .values(order_count=totals.c.order_count, total_amount=totals.c.total_amount, archived_count=totals.c.archived_count)
+    )
+    await session.execute(delete(OrderStat).where(stats, OrderStat.order_count == 0))
+    await session.commit()
+    return result.rowcount
+
+
+async def ensure_partitions(session: AsyncSession, months_ahead: int) -> int:
+    """Create the monthly orders partitions up to ``months_ahead`` months ahead; returns how many were new."""
+    created = (await session.execute(select(func.orders.ensure_order_partitions(func.now(), months_ahead)))).scalar_one()
+    await session.commit()
+    return created
+
+
+async def archive_orders(session: AsyncSession, *, before: datetime, batch_size: int) -> int:
+    """Move up to ``batch_size`` done/canceled orders created before ``before`` to orders_archive.
+
+    One statement moves the orders and deletes their order_items. Archived orders are still
+    the user's and keep counting in order_stats; only their archived_count goes up, in the
+    same transaction. The created_at bound keeps every scan in the old partitions,
+    and SKIP LOCKED leaves orders that are being updated for the next batch.
+    """
+    picked = (
+        select(Order.id, Order.created_at)
+        .where(Order.status.in_(TERMINAL_STATUSES), Order.created_at < before)
+        .order_by(Order.created_at)
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+        .cte("picked")
+    )
+    moved = (
+        delete(Order)
+        .where(Order.id == picked.c.id, Order.created_at == picked.c.created_at, Order.created_at < before)
+        .returning(Order.id, Order.user_id, Order.items, Order.status, Order.total_amount, Order.created_at, Order.updated_at)
+        .cte("moved")
+    )
+    dropped = delete(OrderItem).where(OrderItem.order_id == moved.c.id).returning(OrderItem.id).cte("dropped")
+    columns = ["id", "user_id", "items", "status", "total_amount", "created_at", "updated_at"]
+    stmt = (
+        insert(OrderArchive)
+        .from_select(columns, select(*(moved.c[name] for name in columns)))
+        .returning(OrderArchive.user_id, OrderArchive.status)
+        .add_cte(dropped)
+    )
+    rows = (await session.execute(stmt)).all()
+    deltas: dict = {}
+    for row in rows:
+        _, _, archived = deltas.get((row.user_id, row.status), (0, 0, 0))
+        deltas[(row.user_id, row.status)] = (0, 0, archived + 1)
+    await _bump_stats(session, deltas)
+    await session.commit()
+    return len(rows)
@@ -1,36 +1,159 @@
 import uuid
-from fastapi import APIRouter, Depends, HTTPException, Query, status
+from datetime import datetime
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.exc import IntegrityError
-from common.responses import ok
-from .db import get_session
-from .schemas import CreateOrderIn, OrderOut, OrdersPage, UpdateStatusIn
-from .repository import create_order, get_order, list_orders_by_user, update_status, cancel_order
-from .auth import get_current_user, require_manager_or_admin, CurrentUser
-from .models import OrderStatus
+from common.responses import ok_json, etag, if_none_match, not_modified
+from common.cache import CACHE_INVALIDATE_HEADER
+from common.pagination import encode_cursor, decode_cursor
+from common.config import settings
+from .db import sessions
+from .models import OrderArchive, OrderStatus
+from .schemas import CreateOrderIn, BulkCreateOrdersIn, OrderOut, OrderSummaryOut, OrdersPage, UpdateStatusIn
+from .repository import (
+    create_order,
+    create_orders_bulk,
+    get_order,
+    list_orders_by_user,
+    update_status,
+    cancel_order,
+    get_order_stats,
+)
+from .auth import get_current_user, get_read_session, get_write_session, require_manager_or_admin, CurrentUser
+from .outbox import relay, user_stream
+from .export import MEDIA_TYPES, export_orders
 
 router = APIRouter(prefix="/api/v1", tags=["orders"]) 
 
 
+def _invalidate(response: Response, acting_user: uuid.UUID, user_ids) -> Response:
+    # tells the gateway whose cached reads went stale besides the caller's own
+    others = sorted({str(u) for u in user_ids if u != acting_user})
+    if others:
+        response.headers[CACHE_INVALIDATE_HEADER] = ",".join(others)
+    return response
+
+
 @router.post("/orders")
-async def create(payload: CreateOrderIn, session: AsyncSession = Depends(get_session), user: CurrentUser = Depends(get_current_user)):
+async def create(payload: CreateOrderIn, session: AsyncSession = Depends(get_write_session), user: CurrentUser = Depends(get_current_user)):
     try:
         order = await create_order(session, user_id=user.id, items=[i.model_dump() for i in payload.items])
     except IntegrityError:
         # FK violation (e.g., user doesn't exist)
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="user_not_exist")
-    out = OrderOut.model_validate(order).model_dump()
-    return ok(out)
+    return ok_json(OrderOut.model_validate(order))
+
+
+@router.post("/orders/bulk")
+async def create_bulk(payload: BulkCreateOrdersIn, session: AsyncSession = Depends(get_write_session), user: CurrentUser = Depends(get_current_user)):
+    if len(payload.orders) > settings.orders_bulk_max_items:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="too_many_orders")
+    if any(o.user_id not in (None, user.id) for o in payload.orders):
+        require_manager_or_admin(user)
+    results = await create_orders_bulk(
+        session, [(o.user_id or user.id, [i.model_dump() for i in o.items]) for o in payload.orders]
+    )
+    items = []
+    for index, result in enumerate(results):
+        if isinstance(result, str):
+            items.append({"index": index, "ok": False, "error": {"code": result, "message": "user does not exist"}})
+        else:
+            items.append({"index": index, "ok": True, "order": OrderOut.model_validate(result)})
+    created = sum(1 for it in items if it["ok"])
+    for user_id in {o.user_id for o in payload.orders if o.user_id and o.user_id != user.id}:
+        await sessions.mark_write(user_id)
+    response = ok_json({"items": items, "created": created, "failed": len(items) - created})
+    return _invalidate(response, user.id, (o.user_id for o in payload.orders if o.user_id))
+
+
+# the fixed /orders/... paths below are declared before /orders/{order_id}, which would capture them
+@router.get("/orders/stats")
+async def order_stats(session: AsyncSession = Depends(get_read_session), user: CurrentUser = Depends(get_current_user)):
+    # lifetime figures; "archived" of the counted orders have moved to orders_archive
+    by_status = {s.value: {"count": 0, "archived": 0, "total_amount": 0.0} for s in OrderStatus}
+    for row in await get_order_stats(session, user.id):
+        by_status[row.status] = {"count": row.order_count, "archived": row.archived_count, "total_amount": row.total_amount}
+    return ok_json({
+        "count": sum(v["count"] for v in by_status.values()),
+        "archived": sum(v["archived"] for v in by_status.values()),
+        "total_amount": sum(float(v["total_amount"]) for v in by_status.values()),
+        "by_status": by_status,
+    })
+
+
+@router.get("/orders/events")
+async def order_events(
+    request: Request,
+    scope: str = Query("mine", pattern="^(mine|all)$"),
+    user: CurrentUser = Depends(get_current_user),
+):
+    if scope == "all":
+        require_manager_or_admin(user)
+        stream = settings.order_events_stream
+    else:
+        stream = user_stream(settings.order_events_stream, user.id)
+    events = relay.subscribe(stream, request.headers.get("last-event-id"), settings.order_events_heartbeat_seconds)
+    return StreamingResponse(events, media_type="text/event-stream", headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+@router.get("/orders/export")
+async def export(
+    fmt: str = Query("ndjson", alias="format", pattern="^(ndjson|csv)$"),
+    scope: str = Query("mine", pattern="^(mine|all)$"),
+    user_id: uuid.UUID | None = Query(default=None),
+    order_status: OrderStatus | None = Query(default=None, alias="status"),
+    created_from: datetime | None = Query(default=None),
+    created_to: datetime | None = Query(default=None),
+    sku: str | None = Query(default=None, min_length=1),
+    include_items: bool = Query(True),
+    archived: bool = Query(False),
+    cursor: str | None = Query(default=None),
+    user: CurrentUser = Depends(get_current_user),
+):
+    # other users' orders (one user_id, or everyone with scope=all) need manager/admin
+    owner = user.id if user_id is None else user_id
+    if scope == "all" or owner != user.id:
+        require_manager_or_admin(user)
+    after = None
+    if cursor:
+        try:
+            after = decode_cursor(cursor)
+        except ValueError:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="invalid_cursor")
+    rows = export_orders(
+        user.id,
+        fmt,
+        chunk_bytes=settings.orders_export_chunk_bytes,
+        user_id=None if scope == "all" and user_id is None else owner,
+        status=order_status.value if order_status else None,
+        created_from=created_from,
+        created_to=created_to,
+        sku=sku,
+        after=after,
+        include_items=include_items,
+        archived=archived,
+        batch_size=settings.orders_export_batch_size,
+    )
+    headers = {
+        "Content-Disposition": f'attachment; filename="orders.{fmt}"',
+        "Cache-Control": "no-store",
+        "X-Accel-Buffering": "no",
+    }
+    return StreamingResponse(rows, media_type=MEDIA_TYPES[fmt], headers=headers)
 
 
 @router.get("/orders/{order_id}")
-async def get_one(order_id: uuid.UUID, session: AsyncSession = Depends(get_session), user: CurrentUser = Depends(get_current_user)):
+async def get_one(order_id: uuid.UUID, request: Request, session: AsyncSession = Depends(get_read_session), user: CurrentUser = Depends(get_current_user)):
     order = await get_order(session, order_id)
     if not order:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="not_found")
     if order.user_id != user.id and not any(r in ("manager", "admin") for r in (user.roles or [])):
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="forbidden")
-    return ok(OrderOut.model_validate(order).model_dump())
+    tag = etag(order.id, order.updated_at)
+    if if_none_match(request, tag):
+        return not_modified(tag)
+    return ok_json(OrderOut.model_validate(order), etag=tag)
 
 
 @router.get("/orders")
@@ -38,37 +161,70 @@ async def my_orders(
     page: int = Query(1, ge=1),
     size: int = Query(20, ge=1, le=100),
     sort: str = Query("-created_at"),
-    session: AsyncSession = Depends(get_session),
+    cursor: str | None = Query(default=None),
+    with_total: bool | None = Query(default=None),
+    include_items: bool = Query(True),
+    sku: str | None = Query(default=None, min_length=1),
+    session: AsyncSession = Depends(get_read_session),
     user: CurrentUser = Depends(get_current_user),
 ):
-    rows, total = await list_orders_by_user(session, user_id=user.id, page=page, size=size, sort=sort)
-    items = [OrderOut.model_validate(o).model_dump() for o in rows]
-    return ok({"items": items, "total": total, "page": page, "size": size})
+    # any cursor (even empty, for the first page) switches to keyset mode, where the count is opt-in
+    after = None
+    if cursor:
+        try:
+            after = decode_cursor(cursor)
+        except ValueError:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="invalid_cursor")
+    if with_total is None:
+        with_total = cursor is None
+    rows, total, has_more = await list_orders_by_user(
+        session,
+        user_id=user.id,
+        page=page,
+        size=size,
+        sort=sort,
+        after=after,
+        with_total=with_total,
+        include_items=include_items,
+        sku=sku,
+    )
+    schema = OrderOut if include_items else OrderSummaryOut
+    items = [schema.model_validate(o) for o in rows]
+    next_cursor = encode_cursor(rows[-1].created_at, rows[-1].id) if has_more else None
+    return ok_json({"items": items, "total": total, "page": page, "size": size, "next_cursor": next_cursor})
 
 
 @router.patch("/orders/{order_id}/status")
 async def set_status(
     order_id: uuid.UUID,
     payload: UpdateStatusIn,
-    session: AsyncSession = Depends(get_session),
+    session: AsyncSession = Depends(get_write_session),
     user: CurrentUser = Depends(get_current_user),
 ):
     require_manager_or_admin(user)
-    order = await get_order(session, order_id)
+    order = await update_status(session, order_id, status=payload.status)
     if not order:
+        # GET still serves archived orders, so say why they cannot change
+        if isinstance(await get_order(session, order_id), OrderArchive):
+            raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="archived")
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="not_found")
-    order = await update_status(session, order, status=payload.status)
-    return ok(OrderOut.model_validate(order).model_dump())
+    relay.wake()
+    await sessions.mark_write(order.user_id)
+    return _invalidate(ok_json(OrderOut.model_validate(order)), user.id, [order.user_id])
 
 
 @router.post("/orders/{order_id}/cancel")
-async def cancel(order_id: uuid.UUID, session: AsyncSession = Depends(get_session), user: CurrentUser = Depends(get_current_user)):
+async def cancel(order_id: uuid.UUID, session: AsyncSession = Depends(get_write_session), user: CurrentUser = Depends(get_current_user)):
+    order = await cancel_order(session, order_id, user_id=user.id)
+    if order:
+        relay.wake()
+        return ok_json(OrderOut.model_validate(order))
+    # nothing was updated: read once to report why
     order = await get_order(session, order_id)
     if not order:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="not_found")
     if order.user_id != user.id:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="forbidden")
-    if order.status in (OrderStatus.done.value, OrderStatus.canceled.value):
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="not_allowed")
-    order = await cancel_order(session, order)
-    return ok(OrderOut.model_validate(order).model_dump())
+    if isinstance(order, OrderArchive):
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="archived")
+    raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="not_allowed")
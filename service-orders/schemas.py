@@ -14,14 +14,22 @@ class CreateOrderIn(BaseModel):
     items: List[OrderItem]
 
 
+class BulkOrderIn(CreateOrderIn):
+    # defaults to the caller; other owners need manager/admin
+    user_id: Optional[uuid.UUID] = None
+
+
+class BulkCreateOrdersIn(BaseModel):
+    orders: List[BulkOrderIn] = Field(min_length=1)
+
+
 class UpdateStatusIn(BaseModel):
     status: OrderStatus
 
 
-class OrderOut(BaseModel):
+class OrderSummaryOut(BaseModel):
     id: uuid.UUID
     user_id: uuid.UUID
-    items: list
     status: OrderStatus
     total_amount: float
 
@@ -29,8 +37,13 @@ class OrderOut(BaseModel):
         from_attributes = True
 
 
+class OrderOut(OrderSummaryOut):
+    items: list
+
+
 class OrdersPage(BaseModel):
-    items: List[OrderOut]
-    total: int
+    items: List[OrderOut | OrderSummaryOut]
+    total: Optional[int] = None
     page: int
     size: int
+    next_cursor: Optional[str] = None
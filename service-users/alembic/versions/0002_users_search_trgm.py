@@ -0,0 +1,26 @@
+from alembic import op
+
+revision = '0002_users_search_trgm'
+down_revision = '0001_init'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    # expression indexes match the lower(...) LIKE '%q%' predicates in repository.list_users
+    with op.get_context().autocommit_block():
+        op.execute(
+            'CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_users_email_trgm '
+            'ON users.users USING gin (lower(email) gin_trgm_ops)'
+        )
+        op.execute(
+            'CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_users_name_trgm '
+            'ON users.users USING gin (lower(name) gin_trgm_ops)'
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.execute('DROP INDEX CONCURRENTLY IF EXISTS users.ix_users_name_trgm')
+        op.execute('DROP INDEX CONCURRENTLY IF EXISTS users.ix_users_email_trgm')
@@ -0,0 +1,25 @@
+from alembic import op
+
+revision = '0003_users_search_knn'
+down_revision = '0002_users_search_trgm'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # GiST trigram indexes serve ORDER BY lower(...) <-> q, which picks list_users' candidates
+    with op.get_context().autocommit_block():
+        op.execute(
+            'CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_users_email_trgm_gist '
+            'ON users.users USING gist (lower(email) gist_trgm_ops)'
+        )
+        op.execute(
+            'CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_users_name_trgm_gist '
+            'ON users.users USING gist (lower(name) gist_trgm_ops)'
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.execute('DROP INDEX CONCURRENTLY IF EXISTS users.ix_users_name_trgm_gist')
+        op.execute('DROP INDEX CONCURRENTLY IF EXISTS users.ix_users_email_trgm_gist')
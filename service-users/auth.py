@@ -1,36 +1,51 @@
 import uuid
-from typing import Optional
+from datetime import datetime
+from typing import Optional, Tuple
 from passlib.context import CryptContext
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Request, status
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
-from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 from common.config import settings
-from common.jwt import decode_jwt, make_access_token
-from .db import get_session
+from common.cache import RedisCache
+from common.db import session_dependencies
+from common.jwt import INTERNAL_CLAIMS_HEADER, make_access_token, request_claims, signing_key
+from .db import sessions
+from .hashing import PasswordHasher
 from .models import User
 
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# hashes made with a different cost are reported as needing an update, see verify_password
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__rounds=settings.bcrypt_rounds,
+    bcrypt__min_desired_rounds=settings.bcrypt_rounds,
+    bcrypt__max_desired_rounds=settings.bcrypt_rounds,
+)
+password_hasher = PasswordHasher(
+    pwd_context, workers=settings.password_hash_workers, max_pending=settings.password_hash_max_pending
+)
 http_bearer = HTTPBearer(auto_error=False)
+user_cache = RedisCache(settings.redis_url, "users:v1", settings.user_cache_ttl_seconds)
 
 
-def hash_password(password: str) -> str:
-    return pwd_context.hash(password)
+async def hash_password(password: str) -> str:
+    return await password_hasher.hash(password)
 
 
-def verify_password(password: str, hashed: str) -> bool:
-    return pwd_context.verify(password, hashed)
+async def verify_password(password: str, hashed: str) -> Tuple[bool, Optional[str]]:
+    return await password_hasher.verify_and_update(password, hashed)
 
 
 async def get_current_user(
+    request: Request,
     creds: Optional[HTTPAuthorizationCredentials] = Depends(http_bearer),
-    session: AsyncSession = Depends(get_session),
 ) -> User:
-    if creds is None or not creds.credentials:
+    internal = request.headers.get(INTERNAL_CLAIMS_HEADER)
+    if not internal and (creds is None or not creds.credentials):
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Not authenticated")
     try:
-        payload = decode_jwt(creds.credentials, settings.jwt_secret, [settings.jwt_algorithm])
+        payload = request_claims(internal, creds.credentials if creds else None)
         sub = payload.get("sub")
         if not sub:
             raise ValueError("no sub")
@@ -38,18 +53,51 @@ async def get_current_user(
     except Exception:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
 
-    res = await session.execute(select(User).where(User.id == user_id))
-    user = res.scalar_one_or_none()
+    if settings.user_cache_enabled:
+        cached = await user_cache.get(str(user_id))
+        if cached is not None:
+            return _user_from_cache(cached)
+
+    async with await sessions.read_session(user_id) as session:
+        user = (await session.execute(select(User).where(User.id == user_id))).scalar_one_or_none()
     if not user:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found")
+    if settings.user_cache_enabled:
+        await user_cache.set(str(user_id), _user_to_cache(user))
     return user
 
 
+get_read_session, get_write_session = session_dependencies(sessions, get_current_user)
+
+
+def _user_to_cache(user: User) -> dict:
+    # the password hash never leaves the database
+    return {
+        "id": str(user.id),
+        "email": user.email,
+        "name": user.name,
+        "roles": list(user.roles or []),
+        "created_at": user.created_at.isoformat(),
+        "updated_at": user.updated_at.isoformat(),
+    }
+
+
+def _user_from_cache(data: dict) -> User:
+    return User(
+        id=uuid.UUID(data["id"]),
+        email=data["email"],
+        name=data["name"],
+        roles=data["roles"],
+        created_at=datetime.fromisoformat(data["created_at"]),
+        updated_at=datetime.fromisoformat(data["updated_at"]),
+    )
+
+
 def create_access_token(user: User) -> str:
     return make_access_token(
         sub=str(user.id),
         roles=user.roles or [],
-        secret=settings.jwt_secret,
+        secret=signing_key(),
         algorithm=settings.jwt_algorithm,
         expires_seconds=settings.jwt_expires_seconds,
     )
@@ -1,7 +1,8 @@
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import sessionmaker, declarative_base
 from sqlalchemy import MetaData
 from common.config import settings
+from common.db import Database, SessionRouter
 
 NAMING_CONVENTION = {
     "ix": "ix_%(column_0_label)s",
@@ -14,8 +15,18 @@ NAMING_CONVENTION = {
 metadata = MetaData(naming_convention=NAMING_CONVENTION)
 Base = declarative_base(metadata=metadata)
 
-engine = create_async_engine(settings.sqlalchemy_url, pool_pre_ping=True)
+database = Database.from_settings(settings)
+engine = database.engine
 async_session_maker = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+sessions = SessionRouter(
+    async_session_maker,
+    [Database.from_settings(settings, url) for url in settings.replica_sqlalchemy_urls],
+    redis_url=settings.redis_url,
+    prefix="ryw:users",
+    read_your_writes=settings.db_read_your_writes_seconds,
+    max_lag=settings.db_replica_max_lag_seconds,
+    check_interval=settings.db_replica_check_interval,
+)
 
 
 async def get_session() -> AsyncSession:
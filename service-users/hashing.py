@@ -0,0 +1,40 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Tuple
+from passlib.context import CryptContext
+from common.errors import AppError
+
+
+class PasswordHasher:
+    """Runs bcrypt on a bounded thread pool so it never blocks the event loop.
+
+    bcrypt releases the GIL, so threads hash in parallel. Once ``workers + max_pending``
+    operations are in flight new ones are rejected immediately instead of queueing.
+    """
+
+    def __init__(self, context: CryptContext, workers: int = 4, max_pending: int = 32):
+        self.context = context
+        self.limit = workers + max_pending
+        self.in_flight = 0
+        self.rejected = 0
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="pwhash")
+
+    async def _run(self, fn, *args):
+        if self.in_flight >= self.limit:
+            self.rejected += 1
+            raise AppError("hasher_busy", "Too many concurrent password operations, retry later", 503)
+        self.in_flight += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+        finally:
+            self.in_flight -= 1
+
+    async def hash(self, password: str) -> str:
+        return await self._run(self.context.hash, password)
+
+    async def verify_and_update(self, password: str, hashed: str) -> Tuple[bool, Optional[str]]:
+        # the second item is a fresh hash when the stored one uses outdated parameters
+        return await self._run(self.context.verify_and_update, password, hashed)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
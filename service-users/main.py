@@ -1,14 +1,22 @@
 from fastapi import FastAPI
-from common.middleware import RequestIDMiddleware
+from fastapi.responses import ORJSONResponse
+from common.middleware import RequestContextMiddleware
 from common.errors import add_exception_handlers
+from common.config import settings
 from common.responses import ok
 from common.logging import setup_logging
 from common.otel import setup_tracing
+from common.metrics import install_metrics, DatabaseCollector
+from common.db import instrument_engine
+from .db import database, sessions
 from .routes import router as users_router
+from .auth import user_cache, password_hasher
 
-app = FastAPI(title="service-users", version="0.1.0")
-app.add_middleware(RequestIDMiddleware)
+app = FastAPI(title="service-users", version="0.1.0", default_response_class=ORJSONResponse)
+app.add_middleware(RequestContextMiddleware, server_timing=settings.server_timing)
 add_exception_handlers(app)
+install_metrics(app, "service-users", [DatabaseCollector("service-users", database)])
+instrument_engine(database.engine, "service-users")
 
 
 @app.get("/health")
@@ -16,11 +24,25 @@ async def health():
     return ok({"status": "ok"})
 
 
+@app.get("/health/db")
+async def health_db():
+    return ok({**database.pool_stats(), **sessions.stats()})
+
+
 app.include_router(users_router)
 
 
 @app.on_event("startup")
 async def on_startup():
-    setup_logging("service-users")
-    from common.config import settings
+    setup_logging("service-users", queue_size=settings.log_queue_size, access_sample_rate=settings.log_access_sample_rate)
     setup_tracing(app, "service-users", settings.otel_exporter_otlp_endpoint)
+    await database.start()
+    await sessions.start()
+
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    await sessions.close()
+    await database.close()
+    await user_cache.aclose()
+    password_hasher.shutdown()
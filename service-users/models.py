@@ -1,14 +1,20 @@
 import uuid
 from datetime import datetime
 from sqlalchemy.orm import Mapped, mapped_column
-from sqlalchemy import String, DateTime, text
+from sqlalchemy import String, DateTime, text, Index
 from sqlalchemy.dialects.postgresql import UUID, ARRAY
 from .db import Base
 
 
 class User(Base):
     __tablename__ = "users"
-    __table_args__ = {"schema": "users"}
+    __table_args__ = (
+        Index("ix_users_email_trgm", text("lower(email) gin_trgm_ops"), postgresql_using="gin"),
+        Index("ix_users_name_trgm", text("lower(name) gin_trgm_ops"), postgresql_using="gin"),
+        Index("ix_users_email_trgm_gist", text("lower(email) gist_trgm_ops"), postgresql_using="gist"),
+        Index("ix_users_name_trgm_gist", text("lower(name) gist_trgm_ops"), postgresql_using="gist"),
+        {"schema": "users"},
+    )
 
     id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     email: Mapped[str] = mapped_column(String(255), unique=True, index=True, nullable=False)
@@ -1,8 +1,8 @@
 from typing import Optional, Sequence, Tuple
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func
+from sqlalchemy import select, func, update, insert, union
 from .models import User
-from .auth import hash_password
+from .auth import hash_password, user_cache
 
 
 async def get_user_by_email(session: AsyncSession, email: str) -> Optional[User]:
@@ -13,35 +13,70 @@ async def get_user_by_email(session: AsyncSession, email: str) -> Optional[User]
 async def create_user(
     session: AsyncSession, *, email: str, password: str, name: str, roles: Optional[list[str]] = None
 ) -> User:
-    user = User(email=email, password_hash=hash_password(password), name=name, roles=roles or [])
-    session.add(user)
+    password_hash = await hash_password(password)
+    stmt = insert(User).values(email=email, password_hash=password_hash, name=name, roles=roles or []).returning(User)
+    user = await session.scalar(stmt)
     await session.commit()
-    await session.refresh(user)
     return user
 
 
 async def update_user_profile(session: AsyncSession, user: User, *, name: Optional[str] = None) -> User:
-    if name is not None:
-        user.name = name
+    if name is None:
+        return user
+    # by id, so a detached user from the user cache works the same as a loaded one
+    stmt = (
+        update(User)
+        .where(User.id == user.id)
+        .values(name=name, updated_at=func.now())
+        .returning(User)
+        .execution_options(populate_existing=True)
+    )
+    user = await session.scalar(stmt)
     await session.commit()
-    await session.refresh(user)
+    await user_cache.delete(str(user.id))
     return user
 
 
+async def set_password_hash(session: AsyncSession, user: User, password_hash: str):
+    await session.execute(update(User).where(User.id == user.id).values(password_hash=password_hash))
+    await session.commit()
+
+
+def _escape_like(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
 async def list_users(
     session: AsyncSession,
     *,
     page: int = 1,
     size: int = 20,
     query: Optional[str] = None,
-) -> Tuple[Sequence[User], int]:
+    count_cap: int = 1000,
+) -> Tuple[Sequence[User], int, bool]:
     stmt = select(User)
-    count_stmt = select(func.count()).select_from(User)
+    counted = select(User.id)
     if query:
-        q = f"%{query.lower()}%"
-        stmt = stmt.where(func.lower(User.email).like(q) | func.lower(User.name).like(q))
-        count_stmt = count_stmt.where(func.lower(User.email).like(q) | func.lower(User.name).like(q))
+        q = query.lower()
+        email, name = func.lower(User.email), func.lower(User.name)
+        # served by the gin_trgm_ops indexes on lower(email) / lower(name)
+        pattern = f"%{_escape_like(q)}%"
+        cond = email.like(pattern, escape="\\") | name.like(pattern, escape="\\")
+        # candidates are the count_cap closest matches per column, walked in distance order off the
+        # gist_trgm_ops indexes (<-> is 1 - similarity, so the best count_cap by rank are always
+        # among them); similarity and the sort stay bounded however broad q is
+        candidates = union(
+            *(
+                select(User.id).where(column.like(pattern, escape="\\")).order_by(column.op("<->")(q)).limit(count_cap)
+                for column in (email, name)
+            )
+        ).subquery()
+        rank = func.greatest(func.similarity(email, q), func.similarity(name, q))
+        # id breaks ties, so pages are stable between requests
+        stmt = stmt.join(candidates, User.id == candidates.c.id).order_by(rank.desc(), User.id)
+        counted = counted.where(cond)
     stmt = stmt.offset((page - 1) * size).limit(size)
     rows = (await session.execute(stmt)).scalars().all()
-    total = (await session.execute(count_stmt)).scalar_one()
-    return rows, total
+    # count at most count_cap + 1 matches instead of scanning all of them
+    total = (await session.execute(select(func.count()).select_from(counted.limit(count_cap + 1).subquery()))).scalar_one()
+    return rows, min(total, count_cap), total > count_cap
@@ -1,11 +1,12 @@
-from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
-from common.responses import ok
-from .db import get_session
+from common.responses import ok, etag, if_none_match, json_response, not_modified
+from common.config import settings
+from .db import get_session, sessions
 from .schemas import RegisterIn, LoginIn, TokenOut, UserOut, ProfileUpdateIn, UsersPage
-from .repository import get_user_by_email, create_user, update_user_profile, list_users
-from .auth import verify_password, create_access_token, get_current_user
+from .repository import get_user_by_email, create_user, update_user_profile, list_users, set_password_hash
+from .auth import verify_password, create_access_token, get_current_user, get_read_session, get_write_session
 from .models import User
 
 router = APIRouter(prefix="/api/v1", tags=["users"]) 
@@ -28,20 +29,35 @@ async def register(payload: RegisterIn, session: AsyncSession = Depends(get_sess
 
 @router.post("/auth/login", response_model=TokenOut)
 async def login(payload: LoginIn, session: AsyncSession = Depends(get_session)):
-    user = await get_user_by_email(session, payload.email)
-    if not user or not verify_password(payload.password, user.password_hash):
+    # `session` is the primary; it opens no connection unless the replica misses or the hash is upgraded
+    async with await sessions.read_session() as replica:
+        user = await get_user_by_email(replica, payload.email)
+    if not user:
+        # registered moments ago and not replicated yet
+        user = await get_user_by_email(session, payload.email)
+    if not user:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="invalid_credentials")
+    valid, new_hash = await verify_password(payload.password, user.password_hash)
+    if not valid:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="invalid_credentials")
+    if new_hash:
+        # stored hash predates the configured bcrypt cost
+        await set_password_hash(session, user, new_hash)
     token = create_access_token(user)
     return TokenOut(access_token=token)
 
 
 @router.get("/users/me", response_model=UserOut)
-async def me(current: User = Depends(get_current_user)):
-    return current
+async def me(request: Request, current: User = Depends(get_current_user)):
+    # current usually comes from the user cache, so a revalidation never touches the database
+    tag = etag(current.id, current.updated_at, ",".join(current.roles or []))
+    if if_none_match(request, tag):
+        return not_modified(tag)
+    return json_response(UserOut.model_validate(current), etag=tag)
 
 
 @router.put("/users/me", response_model=UserOut)
-async def update_me(payload: ProfileUpdateIn, session: AsyncSession = Depends(get_session), current: User = Depends(get_current_user)):
+async def update_me(payload: ProfileUpdateIn, session: AsyncSession = Depends(get_write_session), current: User = Depends(get_current_user)):
     # Разрешаем менять только имя; роли обновляются админом в отдельном сценарии (опционально)
     user = await update_user_profile(session, current, name=payload.name)
     return user
@@ -57,9 +73,9 @@ async def users_list(
     page: int = Query(1, ge=1),
     size: int = Query(20, ge=1, le=100),
     q: str | None = Query(default=None),
-    session: AsyncSession = Depends(get_session),
+    session: AsyncSession = Depends(get_read_session),
     current: User = Depends(get_current_user),
 ):
     _ensure_admin(current)
-    items, total = await list_users(session, page=page, size=size, query=q)
-    return UsersPage(items=items, total=total, page=page, size=size)
+    items, total, capped = await list_users(session, page=page, size=size, query=q, count_cap=settings.users_count_cap)
+    return UsersPage(items=items, total=total, total_capped=capped, page=page, size=size)
@@ -38,5 +38,6 @@ class ProfileUpdateIn(BaseModel):
 class UsersPage(BaseModel):
     items: List[UserOut]
     total: int
+    total_capped: bool = False
     page: int
     size: int
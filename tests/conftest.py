@@ -0,0 +1,148 @@
+import os
+import sys
+import uuid
+from contextlib import asynccontextmanager
+from pathlib import Path
+import httpx
+import pytest
+from sqlalchemy import Column, MetaData, Table, text
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import NullPool
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from common.config import settings  # noqa: E402
+from common.jwt import make_access_token, signing_key  # noqa: E402
+from common.launcher import import_app_module  # noqa: E402
+
+
+@pytest.fixture
+def gateway():
+    """The api-gateway module; upstream clients are installed per test with ``mock_upstream``."""
+    return import_app_module("api-gateway")
+
+
+@pytest.fixture
+def mock_upstream(gateway, monkeypatch):
+    """Serve an upstream client (``name`` or ``name:stream``) from an httpx handler."""
+
+    def install(name: str, handler) -> list:
+        seen = []
+
+        def record(request: httpx.Request):
+            seen.append(request)
+            return handler(request)
+
+        client = httpx.AsyncClient(base_url="http://upstream.test", transport=httpx.MockTransport(record))
+        monkeypatch.setitem(gateway.upstreams._clients, name, client)
+        return seen
+
+    return install
+
+
+@pytest.fixture
+def bearer():
+    def make(sub: str | None = None, roles: list[str] | None = None) -> dict:
+        token = make_access_token(sub or str(uuid.uuid4()), roles or [], signing_key(), settings.jwt_algorithm, 3600)
+        return {"authorization": f"Bearer {token}"}
+
+    return make
+
+
+@pytest.fixture
+def database_url():
+    """A Postgres database the tests may wipe, as a SQLAlchemy asyncpg URL; skips without one."""
+    url = os.environ.get("TEST_DATABASE_URL")
+    if not url:
+        pytest.skip("TEST_DATABASE_URL is not set")
+    return url
+
+
+@pytest.fixture
+def orders_db(database_url):
+    """Recreates the orders schema (and a bare users.users FK target) on entry; yields a sessionmaker.
+
+    Engines are bound to an event loop, so this is entered inside the test's own loop.
+    """
+    models = import_app_module("service-orders", "models")
+    metadata = MetaData()
+    Table("users", metadata, Column("id", UUID(as_uuid=True), primary_key=True), schema="users")
+    for table in models.Base.metadata.tables.values():
+        table.to_metadata(metadata)
+
+    @asynccontextmanager
+    async def connect():
+        engine = create_async_engine(database_url, poolclass=NullPool)
+        try:
+            async with engine.begin() as conn:
+                for schema in ("orders", "users"):
+                    await conn.execute(text(f"DROP SCHEMA IF EXISTS {schema} CASCADE"))
+                    await conn.execute(text(f"CREATE SCHEMA {schema}"))
+                await conn.run_sync(metadata.create_all)
+                await conn.execute(text("CREATE TABLE orders.orders_default PARTITION OF orders.orders DEFAULT"))
+            yield async_sessionmaker(engine, expire_on_commit=False)
+        finally:
+            await engine.dispose()
+
+    return connect
+
+
+@pytest.fixture
+def users_db(database_url):
+    """Like ``orders_db`` for the users schema; skips when pg_trgm is not installed."""
+    models = import_app_module("service-users", "models")
+
+    @asynccontextmanager
+    async def connect():
+        engine = create_async_engine(database_url, poolclass=NullPool)
+        try:
+            async with engine.begin() as conn:
+                available = await conn.scalar(text("SELECT count(*) FROM pg_available_extensions WHERE name = 'pg_trgm'"))
+                if not available:
+                    pytest.skip("pg_trgm is not available")
+                await conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+                await conn.execute(text("DROP SCHEMA IF EXISTS users CASCADE"))
+                await conn.execute(text("CREATE SCHEMA users"))
+                await conn.run_sync(models.Base.metadata.create_all)
+            yield async_sessionmaker(engine, expire_on_commit=False)
+        finally:
+            await engine.dispose()
+
+    return connect
+
+
+@pytest.fixture
+def add_users():
+    """Coroutine function that inserts users.users rows for the given ids."""
+
+    async def add(session, *user_ids):
+        for user_id in user_ids:
+            await session.execute(text("INSERT INTO users.users (id) VALUES (:id)"), {"id": user_id})
+        await session.commit()
+
+    return add
+
+
+@pytest.fixture
+def orders_api(monkeypatch):
+    """httpx client factory for the service-orders app, acting as one user over a test sessionmaker."""
+    main = import_app_module("service-orders")
+    auth = import_app_module("service-orders", "auth")
+
+    def client(maker, user_id, roles=()) -> httpx.AsyncClient:
+        async def current_user():
+            return auth.CurrentUser(user_id, list(roles))
+
+        async def session():
+            async with maker() as s:
+                yield s
+
+        overrides = {auth.get_current_user: current_user, auth.get_read_session: session, auth.get_write_session: session}
+        for dependency, override in overrides.items():
+            monkeypatch.setitem(main.app.dependency_overrides, dependency, override)
+        return httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://orders.test")
+
+    return client
@@ -0,0 +1,62 @@
+import asyncio
+import uuid
+from contextlib import asynccontextmanager
+import httpx
+from fastapi import Depends, FastAPI
+from common.db import session_dependencies
+
+
+class FakeRouter:
+    """SessionRouter stand-in recording which keys were read for and marked."""
+
+    def __init__(self):
+        self.events = []
+
+    @asynccontextmanager
+    async def _session(self, kind):
+        self.events.append(("open", kind))
+        yield kind
+
+    def session(self):
+        return self._session("primary")
+
+    async def read_session(self, key=None):
+        self.events.append(("read", key))
+        return self._session("replica")
+
+    async def mark_write(self, key):
+        self.events.append(("mark", key))
+
+
+class User:
+    def __init__(self, user_id):
+        self.id = user_id
+
+
+def test_session_dependencies_key_reads_and_writes_on_the_current_user():
+    user_id = uuid.uuid4()
+    router = FakeRouter()
+
+    async def current_user():
+        return User(user_id)
+
+    get_read_session, get_write_session = session_dependencies(router, current_user)
+    app = FastAPI()
+
+    @app.get("/read")
+    async def read(session=Depends(get_read_session)):
+        return {"session": session}
+
+    @app.post("/write")
+    async def write(session=Depends(get_write_session)):
+        return {"session": session}
+
+    async def main():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://app.test") as client:
+            assert (await client.get("/read")).json() == {"session": "replica"}
+            assert router.events == [("read", user_id), ("open", "replica")]
+            router.events.clear()
+            assert (await client.post("/write")).json() == {"session": "primary"}
+            assert router.events == [("open", "primary"), ("mark", user_id)]
+
+    asyncio.run(main())
@@ -0,0 +1,147 @@
+import asyncio
+import uuid
+import httpx
+import pytest
+from common.cache import ResponseCache
+
+
+async def chunks(*parts: bytes):
+    for part in parts:
+        yield part
+
+
+def request(gateway, method, path, **kwargs):
+    async def send():
+        transport = httpx.ASGITransport(app=gateway.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://gateway.test") as client:
+            return await client.request(method, path, **kwargs)
+
+    return asyncio.run(send())
+
+
+@pytest.mark.parametrize("path", ["/api/v1/orders/events", "/api/v1/orders/export"])
+def test_long_lived_streams_use_the_streaming_client(gateway, mock_upstream, bearer, path):
+    shared = mock_upstream("orders", lambda r: httpx.Response(200, content=chunks(b'{"data":[]}')))
+    streaming = mock_upstream(
+        "orders:stream", lambda r: httpx.Response(200, content=chunks(b": keepalive\n\n"), headers={"content-type": "text/event-stream"})
+    )
+    resp = request(gateway, "GET", path, headers=bearer())
+    assert resp.status_code == 200
+    assert resp.content == b": keepalive\n\n"
+    assert [r.url.path for r in streaming] == [path]
+    assert shared == []
+
+    resp = request(gateway, "GET", "/api/v1/orders?limit=5", headers=bearer())
+    assert resp.status_code == 200
+    assert [r.url.path for r in shared] == ["/api/v1/orders"]
+    assert len(streaming) == 1
+
+
+@pytest.mark.parametrize(
+    "method, path, upstream",
+    [
+        ("GET", "/api/v1/users?limit=5", "users"),
+        ("GET", "/api/v1/users/", "users"),
+        ("POST", "/api/v1/orders", "orders"),
+        ("GET", "/api/v1/orders/", "orders"),
+    ],
+)
+def test_bare_collections_proxy_to_the_bare_upstream_path(gateway, mock_upstream, bearer, method, path, upstream):
+    seen = mock_upstream(upstream, lambda r: httpx.Response(200, content=chunks(b'{"data":[]}')))
+    resp = request(gateway, method, path, headers=bearer(), json={} if method == "POST" else None)
+    assert resp.status_code == 200
+    assert [(r.method, r.url.path) for r in seen] == [(method, path.split("?")[0].rstrip("/"))]
+    assert seen[0].url.query == httpx.URL(path).query
+
+
+TAG = 'W/"v1"'
+
+
+class FakePipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.ops = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def hset(self, key, field, value):
+        self.ops.append((key, field, value))
+
+    def expire(self, key, seconds):
+        pass
+
+    async def execute(self):
+        for key, field, value in self.ops:
+            self.redis.hashes.setdefault(key, {})[field] = value
+
+
+class FakeRedis:
+    """The part of redis.asyncio ResponseCache uses: one hash per user."""
+
+    def __init__(self):
+        self.hashes = {}
+
+    async def hget(self, key, field):
+        return self.hashes.get(key, {}).get(field)
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+    async def delete(self, *keys):
+        for key in keys:
+            self.hashes.pop(key, None)
+
+    async def aclose(self):
+        pass
+
+
+@pytest.fixture
+def response_cache(gateway, monkeypatch):
+    cache = ResponseCache("redis://cache.test", "gw:responses:test", 60)
+    monkeypatch.setattr(cache, "_redis", FakeRedis())
+    monkeypatch.setattr(gateway, "response_cache", cache)
+    return cache
+
+
+def test_cached_reads_report_hit_and_miss_and_answer_304(gateway, response_cache, mock_upstream, bearer):
+    order = f"/api/v1/orders/{uuid.uuid4()}"
+    seen = mock_upstream(
+        "orders",
+        lambda r: httpx.Response(200, content=chunks(b'{"data":{"status":"created"}}'), headers={"etag": TAG, "content-type": "application/json"}),
+    )
+    alice, bob = bearer(), bearer()
+
+    resp = request(gateway, "GET", order, headers=alice)
+    assert (resp.status_code, resp.headers["x-cache"], resp.headers["etag"]) == (200, "MISS", TAG)
+    resp = request(gateway, "GET", order, headers=alice)
+    assert (resp.status_code, resp.headers["x-cache"], resp.headers["etag"]) == (200, "HIT", TAG)
+    assert resp.json() == {"data": {"status": "created"}}
+    assert len(seen) == 1
+
+    resp = request(gateway, "GET", order, headers={**alice, "if-none-match": TAG})
+    assert (resp.status_code, resp.headers["x-cache"], resp.content) == (304, "HIT", b"")
+    resp = request(gateway, "GET", order, headers={**alice, "if-none-match": 'W/"stale"'})
+    assert (resp.status_code, resp.headers["x-cache"]) == (200, "HIT")
+    assert len(seen) == 1
+
+    # entries are per user; a miss is still answered 304 when the upstream tag matches
+    resp = request(gateway, "GET", order, headers={**bob, "if-none-match": TAG})
+    assert (resp.status_code, resp.headers["x-cache"]) == (304, "MISS")
+    assert "if-none-match" not in seen[-1].headers
+    assert len(seen) == 2
+
+
+def test_a_write_drops_the_writers_cached_reads(gateway, response_cache, mock_upstream, bearer):
+    order = f"/api/v1/orders/{uuid.uuid4()}"
+    seen = mock_upstream("orders", lambda r: httpx.Response(200, content=chunks(b"{}"), headers={"etag": TAG}))
+    alice = bearer()
+
+    assert request(gateway, "GET", order, headers=alice).headers["x-cache"] == "MISS"
+    assert request(gateway, "GET", order, headers=alice).headers["x-cache"] == "HIT"
+    assert request(gateway, "PATCH", f"{order}/status", headers=alice, json={"status": "done"}).status_code == 200
+    assert request(gateway, "GET", order, headers=alice).headers["x-cache"] == "MISS"
+    assert [r.method for r in seen] == ["GET", "PATCH", "GET"]
@@ -0,0 +1,49 @@
+import time
+import pytest
+from common.jwt import _b64, _unb64, sign_internal_claims, verify_internal_claims
+
+SECRET = "internal-secret"
+
+
+def test_internal_claims_round_trip():
+    exp = int(time.time()) + 60
+    value = sign_internal_claims({"sub": "u1", "roles": ["admin"], "exp": exp, "iat": 1}, SECRET)
+    # only sub, roles and exp are forwarded
+    assert verify_internal_claims(value, SECRET) == {"sub": "u1", "roles": ["admin"], "exp": exp}
+
+
+def test_internal_claims_default_to_no_roles():
+    value = sign_internal_claims({"sub": "u1"}, SECRET)
+    assert verify_internal_claims(value, SECRET) == {"sub": "u1", "roles": [], "exp": None}
+
+
+def test_tampered_payload_is_rejected():
+    payload, signature = sign_internal_claims({"sub": "u1", "roles": []}, SECRET).split(".")
+    forged = _b64(_unb64(payload).replace(b"[]", b'["admin"]'))
+    with pytest.raises(ValueError, match="invalid internal claims"):
+        verify_internal_claims(f"{forged}.{signature}", SECRET)
+
+
+def test_tampered_signature_is_rejected():
+    payload, signature = sign_internal_claims({"sub": "u1"}, SECRET).split(".")
+    flipped = _b64(bytes([_unb64(signature)[0] ^ 1]) + _unb64(signature)[1:])
+    with pytest.raises(ValueError, match="invalid internal claims"):
+        verify_internal_claims(f"{payload}.{flipped}", SECRET)
+
+
+def test_wrong_secret_is_rejected():
+    value = sign_internal_claims({"sub": "u1"}, SECRET)
+    with pytest.raises(ValueError, match="invalid internal claims"):
+        verify_internal_claims(value, "other-secret")
+
+
+@pytest.mark.parametrize("value", ["", "no-signature", "!!!.!!!"])
+def test_malformed_value_is_rejected(value):
+    with pytest.raises(ValueError, match="invalid internal claims"):
+        verify_internal_claims(value, SECRET)
+
+
+def test_expired_claims_are_rejected():
+    value = sign_internal_claims({"sub": "u1", "exp": int(time.time()) - 1}, SECRET)
+    with pytest.raises(ValueError, match="expired"):
+        verify_internal_claims(value, SECRET)
@@ -0,0 +1,63 @@
+import pytest
+from common import launcher
+from common.config import settings
+
+
+class Recorder:
+    def __init__(self):
+        self.calls = []
+
+    def server(self, config):
+        recorder = self
+
+        class Server:
+            started = True
+
+            def __init__(self, config):
+                self.config = config
+
+            def run(self, sockets=None):
+                recorder.calls.append(("server", self.config.workers))
+
+        return Server(config)
+
+    def multiprocess(self, config, target, sockets):
+        recorder = self
+
+        class Supervisor:
+            def run(self):
+                recorder.calls.append(("supervisor", config.workers))
+
+        return Supervisor()
+
+
+@pytest.fixture
+def launched(monkeypatch, tmp_path):
+    recorder = Recorder()
+    monkeypatch.setattr(launcher.uvicorn, "Server", recorder.server)
+    monkeypatch.setattr(launcher, "Multiprocess", recorder.multiprocess)
+    monkeypatch.setattr(launcher.uvicorn.Config, "bind_socket", lambda self: None)
+    monkeypatch.setenv(launcher.PROMETHEUS_DIR_ENV, str(tmp_path / "prometheus"))
+    for name in (launcher.APP_DIR_ENV, "WEB_CONCURRENCY"):
+        monkeypatch.delenv(name, raising=False)
+
+    def run(*argv, max_requests=0):
+        monkeypatch.setattr(settings, "web_limit_max_requests", max_requests)
+        launcher.main(["api-gateway", *argv])
+        return recorder.calls.pop()
+
+    return run
+
+
+def test_single_worker_without_recycling_runs_in_process(launched):
+    assert launched("--workers", "1") == ("server", 1)
+
+
+def test_single_recycled_worker_runs_under_the_supervisor(launched, tmp_path):
+    # without a supervisor the service would exit for good after max_requests
+    assert launched("--workers", "1", max_requests=1000) == ("supervisor", 1)
+    assert (tmp_path / "prometheus").is_dir()
+
+
+def test_several_workers_run_under_the_supervisor(launched):
+    assert launched("--workers", "3") == ("supervisor", 3)
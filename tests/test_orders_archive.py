@@ -0,0 +1,87 @@
+import asyncio
+import uuid
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import func, select
+from common.launcher import import_app_module
+
+repository = import_app_module("service-orders", "repository")
+models = import_app_module("service-orders", "models")
+
+LATER = datetime.now(timezone.utc) + timedelta(days=1)
+
+
+async def seed(maker, add_users, user, live, done):
+    """``live`` created orders and ``done`` done ones, then archives the done ones."""
+    async with maker() as session:
+        await add_users(session, user)
+        for _ in range(live):
+            await repository.create_order(session, user_id=user, items=[{"sku": "a", "qty": 1, "price": 1}])
+        archived = []
+        for _ in range(done):
+            order = await repository.create_order(session, user_id=user, items=[{"sku": "b", "qty": 2, "price": 5}])
+            await repository.update_status(session, order.id, status=models.OrderStatus.done)
+            archived.append(order.id)
+        assert await repository.archive_orders(session, before=LATER, batch_size=100) == done
+    return archived
+
+
+def test_listing_total_counts_only_reachable_orders(orders_db, add_users):
+    user = uuid.uuid4()
+
+    async def main():
+        async with orders_db() as maker:
+            await seed(maker, add_users, user, live=3, done=2)
+            async with maker() as session:
+                rows, total, has_more = await repository.list_orders_by_user(session, user_id=user, size=2)
+                assert total == 3
+                assert len(rows) == 2 and has_more
+                rows, _, has_more = await repository.list_orders_by_user(session, user_id=user, page=2, size=2)
+                assert len(rows) == 1 and not has_more
+
+                # lifetime figures keep the archived orders
+                stats = {s.status: s for s in await repository.get_order_stats(session, user)}
+                assert (stats["created"].order_count, stats["created"].archived_count) == (3, 0)
+                assert (stats["done"].order_count, stats["done"].archived_count) == (2, 2)
+                assert stats["done"].total_amount == 20
+
+    asyncio.run(main())
+
+
+def test_rebuild_keeps_archived_orders_and_their_archived_count(orders_db, add_users):
+    user = uuid.uuid4()
+
+    async def main():
+        async with orders_db() as maker:
+            await seed(maker, add_users, user, live=1, done=2)
+            async with maker() as session:
+                before = {(s.status, s.order_count, s.archived_count, s.total_amount) for s in await repository.get_order_stats(session, user)}
+            async with maker() as session:
+                assert await repository.rebuild_order_stats(session, [user]) == 2
+            async with maker() as session:
+                after = {(s.status, s.order_count, s.archived_count, s.total_amount) for s in await repository.get_order_stats(session, user)}
+            assert after == before
+
+    asyncio.run(main())
+
+
+def test_archived_orders_cannot_change_status(orders_db, add_users, orders_api):
+    user = uuid.uuid4()
+
+    async def main():
+        async with orders_db() as maker:
+            [order_id] = await seed(maker, add_users, user, live=0, done=1)
+            async with orders_api(maker, user, roles=["admin"]) as client:
+                assert (await client.get(f"/api/v1/orders/{order_id}")).status_code == 200
+                resp = await client.patch(f"/api/v1/orders/{order_id}/status", json={"status": "canceled"})
+                assert resp.status_code == 409
+                assert "archived" in resp.text
+                resp = await client.post(f"/api/v1/orders/{order_id}/cancel")
+                assert resp.status_code == 409
+                resp = await client.patch(f"/api/v1/orders/{uuid.uuid4()}/status", json={"status": "canceled"})
+                assert resp.status_code == 404
+            async with orders_api(maker, uuid.uuid4()) as client:
+                assert (await client.post(f"/api/v1/orders/{order_id}/cancel")).status_code == 403
+            async with maker() as session:
+                assert await session.scalar(select(func.count()).select_from(models.OrderEvent)) == 1
+
+    asyncio.run(main())
@@ -0,0 +1,64 @@
+import asyncio
+import uuid
+from sqlalchemy import func, select, text
+from common.launcher import import_app_module
+
+repository = import_app_module("service-orders", "repository")
+models = import_app_module("service-orders", "models")
+
+ITEMS = [{"sku": "a", "qty": 2, "price": 3}]
+
+
+async def order_counts(session) -> dict:
+    rows = await session.execute(select(models.Order.user_id, func.count()).group_by(models.Order.user_id))
+    return dict(rows.all())
+
+
+def test_bulk_create_reports_unknown_owners_per_row(orders_db, add_users):
+    alice, bob, ghost = uuid.uuid4(), uuid.uuid4(), uuid.uuid4()
+
+    async def main():
+        async with orders_db() as maker:
+            async with maker() as session:
+                await add_users(session, alice, bob)
+                results = await repository.create_orders_bulk(session, [(alice, ITEMS), (ghost, ITEMS), (bob, ITEMS)])
+                assert results[1] == "user_not_exist"
+                assert [r.user_id for r in (results[0], results[2])] == [alice, bob]
+                assert await order_counts(session) == {alice: 1, bob: 1}
+
+    asyncio.run(main())
+
+
+def test_bulk_create_falls_back_per_row_when_an_owner_vanishes(orders_db, add_users, monkeypatch):
+    alice, bob = uuid.uuid4(), uuid.uuid4()
+    insert_orders = repository._insert_orders
+    calls = []
+
+    async def main():
+        async with orders_db() as maker:
+
+            async def delete_bob_first(session, rows):
+                # bob passes the pre-check, then is gone by the time the batch is inserted
+                calls.append(len(rows))
+                if len(calls) == 1:
+                    async with maker() as other:
+                        await other.execute(text("DELETE FROM users.users WHERE id = :id"), {"id": bob})
+                        await other.commit()
+                return await insert_orders(session, rows)
+
+            monkeypatch.setattr(repository, "_insert_orders", delete_bob_first)
+            async with maker() as session:
+                await add_users(session, alice, bob)
+                results = await repository.create_orders_bulk(session, [(alice, ITEMS), (bob, ITEMS), (alice, ITEMS)])
+            assert calls == [3, 1, 1, 1]
+            assert results[1] == "user_not_exist"
+            assert all(r.user_id == alice and r.total_amount == 6 for r in (results[0], results[2]))
+
+            async with maker() as session:
+                assert await order_counts(session) == {alice: 2}
+                assert await session.scalar(select(func.count()).select_from(models.OrderItem)) == 2
+                # the failed batch left no stats behind, only the rows that went in count
+                stats = (await session.scalars(select(models.OrderStat))).all()
+                assert [(s.user_id, s.status, s.order_count, s.total_amount) for s in stats] == [(alice, "created", 2, 12)]
+
+    asyncio.run(main())
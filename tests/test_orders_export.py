@@ -0,0 +1,92 @@
+import asyncio
+import csv
+import io
+import uuid
+import orjson
+from common.launcher import import_app_module
+from common.pagination import decode_cursor
+
+repository = import_app_module("service-orders", "repository")
+export = import_app_module("service-orders", "export")
+
+
+class ReadSessions:
+    """Stands in for the SessionRouter: every read goes to the test database."""
+
+    def __init__(self, maker):
+        self.maker = maker
+
+    async def read_session(self, key):
+        return self.maker()
+
+
+async def seed(maker, add_users, user, other, count):
+    async with maker() as session:
+        await add_users(session, user, other)
+        for i in range(count):
+            await repository.create_order(session, user_id=user, items=[{"sku": f"sku-{i}", "qty": i + 1, "price": 2.5}])
+        await repository.create_order(session, user_id=other, items=[{"sku": "theirs", "qty": 1, "price": 1}])
+
+
+async def collect(**kwargs):
+    return [chunk async for chunk in export.export_orders(**kwargs)]
+
+
+def test_ndjson_export_is_streamed_in_chunks_of_whole_lines(orders_db, add_users, monkeypatch):
+    user, other = uuid.uuid4(), uuid.uuid4()
+
+    async def main():
+        async with orders_db() as maker:
+            monkeypatch.setattr(export, "sessions", ReadSessions(maker))
+            await seed(maker, add_users, user, other, 5)
+
+            stream = export.export_orders(user, "ndjson", chunk_bytes=1, user_id=user, batch_size=2)
+            # with chunk_bytes=1 every row is flushed as soon as it is encoded
+            first = await anext(stream)
+            assert first.endswith(b"\n") and first.count(b"\n") == 1
+            chunks = [first] + [chunk async for chunk in stream]
+            assert len(chunks) == 5
+
+            one = await collect(key=user, fmt="ndjson", chunk_bytes=1 << 20, user_id=user, batch_size=2)
+            assert len(one) == 1 and one[0] == b"".join(chunks)
+
+            rows = [orjson.loads(line) for line in b"".join(chunks).splitlines()]
+            assert {row["user_id"] for row in rows} == {str(user)}
+            assert [(row["created_at"], row["id"]) for row in rows] == sorted((row["created_at"], row["id"]) for row in rows)
+            assert sorted(row["total_amount"] for row in rows) == [2.5, 5.0, 7.5, 10.0, 12.5]
+            assert all(len(row["items"]) == 1 for row in rows)
+            assert set(rows[0]) == {"id", "user_id", "status", "total_amount", "created_at", "updated_at", "items", "cursor"}
+
+            # resuming from the second line's cursor yields exactly the rows after it
+            resumed = await collect(
+                key=user, fmt="ndjson", chunk_bytes=1 << 20, user_id=user, after=decode_cursor(rows[1]["cursor"])
+            )
+            assert [orjson.loads(line)["id"] for line in b"".join(resumed).splitlines()] == [row["id"] for row in rows[2:]]
+
+    asyncio.run(main())
+
+
+def test_csv_export_has_a_header_and_one_record_per_order(orders_db, add_users, monkeypatch):
+    user, other = uuid.uuid4(), uuid.uuid4()
+
+    async def main():
+        async with orders_db() as maker:
+            monkeypatch.setattr(export, "sessions", ReadSessions(maker))
+            await seed(maker, add_users, user, other, 3)
+
+            chunks = await collect(key=user, fmt="csv", chunk_bytes=64, user_id=user, include_items=False, batch_size=1)
+            assert len(chunks) > 1
+            assert all(chunk.endswith(b"\r\n") for chunk in chunks)
+            records = list(csv.reader(io.StringIO(b"".join(chunks).decode())))
+            assert tuple(records[0]) == export.CSV_COLUMNS
+            assert len(records) == 4
+            body = [dict(zip(records[0], record)) for record in records[1:]]
+            assert {record["user_id"] for record in body} == {str(user)}
+            assert {record["items"] for record in body} == {""}
+            created_at, order_id = decode_cursor(body[-1]["cursor"])
+            assert str(order_id) == body[-1]["id"] and created_at.isoformat() == body[-1]["created_at"]
+
+            everyone = await collect(key=user, fmt="csv", chunk_bytes=1 << 20, user_id=None)
+            assert b"".join(everyone).count(b"\r\n") == 1 + 4
+
+    asyncio.run(main())
@@ -0,0 +1,64 @@
+import asyncio
+import uuid
+from decimal import Decimal
+from sqlalchemy import inspect, select
+from common.launcher import import_app_module
+
+repository = import_app_module("service-orders", "repository")
+models = import_app_module("service-orders", "models")
+
+CART = [{"sku": "pen", "qty": 3, "price": 0.1}, {"sku": "book", "qty": 2, "price": 19.99}]
+
+
+async def item_rows(session, order_id) -> list:
+    rows = await session.scalars(select(models.OrderItem).where(models.OrderItem.order_id == order_id).order_by(models.OrderItem.id))
+    return [(i.sku, i.qty, i.price) for i in rows]
+
+
+def test_items_are_stored_as_rows_and_totalled_in_numeric(orders_db, add_users):
+    user = uuid.uuid4()
+
+    async def main():
+        async with orders_db() as maker:
+            async with maker() as session:
+                await add_users(session, user)
+                order = await repository.create_order(session, user_id=user, items=CART)
+                # 3 * 0.1 + 2 * 19.99 in floats is 40.279999...
+                assert order.total_amount == Decimal("40.28")
+                assert order.items == CART
+                assert await item_rows(session, order.id) == [("pen", 3, Decimal("0.10")), ("book", 2, Decimal("19.99"))]
+
+                bulk = await repository.create_orders_bulk(session, [(user, CART[:1]), (user, CART[1:])])
+                assert [o.total_amount for o in bulk] == [Decimal("0.30"), Decimal("39.98")]
+                assert await item_rows(session, bulk[0].id) == [("pen", 3, Decimal("0.10"))]
+                assert await item_rows(session, bulk[1].id) == [("book", 2, Decimal("19.99"))]
+
+    asyncio.run(main())
+
+
+def test_summaries_leave_items_out_and_sku_filters_through_order_items(orders_db, add_users, orders_api):
+    user = uuid.uuid4()
+
+    async def main():
+        async with orders_db() as maker:
+            async with maker() as session:
+                await add_users(session, user)
+                pens = await repository.create_order(session, user_id=user, items=CART[:1])
+                await repository.create_order(session, user_id=user, items=CART[1:])
+                both = await repository.create_order(session, user_id=user, items=CART)
+
+            async with maker() as session:
+                rows, _, _ = await repository.list_orders_by_user(session, user_id=user, include_items=False)
+                assert rows and all("items" not in inspect(o).dict for o in rows)
+
+            async with orders_api(maker, user) as client:
+                body = (await client.get("/api/v1/orders", params={"include_items": "false"})).json()["data"]
+                assert body["total"] == 3
+                assert all("items" not in item and "total_amount" in item for item in body["items"])
+
+                body = (await client.get("/api/v1/orders", params={"sku": "pen"})).json()["data"]
+                assert body["total"] == 2
+                assert {item["id"] for item in body["items"]} == {str(pens.id), str(both.id)}
+                assert all(item["items"] for item in body["items"])
+
+    asyncio.run(main())
@@ -0,0 +1,64 @@
+import asyncio
+import uuid
+from datetime import datetime, timezone
+import pytest
+from common.launcher import import_app_module
+from common.pagination import decode_cursor, encode_cursor
+
+repository = import_app_module("service-orders", "repository")
+
+
+def test_cursor_round_trip():
+    created_at = datetime(2026, 3, 1, 12, 30, 15, 123456, tzinfo=timezone.utc)
+    row_id = uuid.uuid4()
+    token = encode_cursor(created_at, row_id)
+    assert "=" not in token
+    assert decode_cursor(token) == (created_at, row_id)
+
+
+@pytest.mark.parametrize("token", ["", "not-a-cursor", encode_cursor(datetime.now(timezone.utc), uuid.uuid4())[:-3]])
+def test_malformed_cursor_is_a_value_error(token):
+    with pytest.raises(ValueError):
+        decode_cursor(token)
+
+
+async def walk(client, size, **params) -> list:
+    """Ids of every page, following next_cursor from the first (empty cursor) page."""
+    ids, cursor = [], ""
+    while cursor is not None:
+        body = (await client.get("/api/v1/orders", params={"size": size, "cursor": cursor, **params})).json()["data"]
+        assert body["total"] is None
+        ids.append([item["id"] for item in body["items"]])
+        cursor = body["next_cursor"]
+    return ids
+
+
+def test_keyset_pages_cover_every_order_once_in_order(orders_db, add_users, orders_api):
+    user = uuid.uuid4()
+
+    async def main():
+        async with orders_db() as maker:
+            async with maker() as session:
+                await add_users(session, user)
+                # one bulk insert: several orders share a millisecond, so the id breaks the ties
+                await repository.create_orders_bulk(session, [(user, [{"sku": "a", "qty": 1, "price": 1}])] * 7)
+                orders = (await repository.list_orders_by_user(session, user_id=user, size=100))[0]
+            newest_first = [str(o.id) for o in sorted(orders, key=lambda o: (o.created_at, o.id), reverse=True)]
+
+            async with orders_api(maker, user) as client:
+                pages = await walk(client, 3)
+                assert [len(p) for p in pages] == [3, 3, 1]
+                assert sum(pages, []) == newest_first
+                assert sum(await walk(client, 3, sort="created_at"), []) == newest_first[::-1]
+
+                # an order placed between pages lands before the cursor and does not shift the rest
+                first = (await client.get("/api/v1/orders", params={"size": 3, "cursor": ""})).json()["data"]
+                async with maker() as session:
+                    await repository.create_order(session, user_id=user, items=[{"sku": "b", "qty": 1, "price": 1}])
+                second = (await client.get("/api/v1/orders", params={"size": 3, "cursor": first["next_cursor"]})).json()["data"]
+                assert [i["id"] for i in second["items"]] == newest_first[3:6]
+
+                resp = await client.get("/api/v1/orders", params={"cursor": "not-a-cursor"})
+                assert resp.status_code == 400
+
+    asyncio.run(main())
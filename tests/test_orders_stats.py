@@ -0,0 +1,87 @@
+import asyncio
+import uuid
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import func, literal, select, union_all, update
+from common.launcher import import_app_module
+
+repository = import_app_module("service-orders", "repository")
+models = import_app_module("service-orders", "models")
+maintenance = import_app_module("service-orders", "maintenance")
+
+LATER = datetime.now(timezone.utc) + timedelta(days=1)
+
+
+async def grouped(session) -> dict:
+    """{(user_id, status): (count, amount, archived)} straight from orders and orders_archive."""
+    Order, OrderArchive = models.Order, models.OrderArchive
+    orders = union_all(
+        select(Order.user_id, Order.status, Order.total_amount, literal(0).label("archived")),
+        select(OrderArchive.user_id, OrderArchive.status, OrderArchive.total_amount, literal(1).label("archived")),
+    ).subquery()
+    rows = await session.execute(
+        select(orders.c.user_id, orders.c.status, func.count(), func.sum(orders.c.total_amount), func.sum(orders.c.archived))
+        .group_by(orders.c.user_id, orders.c.status)
+    )
+    return {(r[0], r[1]): (r[2], r[3], r[4]) for r in rows}
+
+
+async def stats(session) -> dict:
+    rows = (await session.scalars(select(models.OrderStat))).all()
+    return {(s.user_id, s.status): (s.order_count, s.total_amount, s.archived_count) for s in rows}
+
+
+async def seed(maker, add_users, users):
+    async with maker() as session:
+        await add_users(session, *users)
+        for n, user in enumerate(users):
+            for i in range(n + 2):
+                order = await repository.create_order(session, user_id=user, items=[{"sku": "a", "qty": i + 1, "price": 3}])
+                if i % 2:
+                    await repository.update_status(session, order.id, status=models.OrderStatus.done)
+        await repository.archive_orders(session, before=LATER, batch_size=100)
+
+
+def test_rebuild_stats_in_batches_matches_group_by(orders_db, add_users):
+    users = [uuid.uuid4() for _ in range(5)]
+
+    async def main():
+        async with orders_db() as maker:
+            await seed(maker, add_users, users)
+            async with maker() as session:
+                expected = await grouped(session)
+                assert await stats(session) == expected
+                # drift: wrong figures, a row for an order that never existed, a missing row
+                await session.execute(update(models.OrderStat).where(models.OrderStat.user_id == users[0]).values(order_count=99))
+                session.add(models.OrderStat(user_id=users[1], status="canceled", order_count=4, total_amount=1, archived_count=0))
+                await session.execute(
+                    models.OrderStat.__table__.delete().where(models.OrderStat.user_id == users[2], models.OrderStat.status == "done")
+                )
+                await session.commit()
+                assert await stats(session) != expected
+
+            rows = await maintenance.OrdersMaintenance(maker).rebuild_stats(batch_size=2)
+            assert rows == len(expected)
+            async with maker() as session:
+                assert await stats(session) == expected
+
+    asyncio.run(main())
+
+
+def test_rebuild_stats_for_one_user_leaves_the_others_alone(orders_db, add_users):
+    users = [uuid.uuid4() for _ in range(2)]
+
+    async def main():
+        async with orders_db() as maker:
+            await seed(maker, add_users, users)
+            async with maker() as session:
+                expected = await grouped(session)
+                await session.execute(update(models.OrderStat).values(order_count=0))
+                await session.commit()
+
+            await maintenance.OrdersMaintenance(maker).rebuild_stats(users[0])
+            async with maker() as session:
+                rebuilt = await stats(session)
+            assert {k: v for k, v in rebuilt.items() if k[0] == users[0]} == {k: v for k, v in expected.items() if k[0] == users[0]}
+            assert all(v[0] == 0 for k, v in rebuilt.items() if k[0] == users[1])
+
+    asyncio.run(main())
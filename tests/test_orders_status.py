@@ -0,0 +1,89 @@
+import asyncio
+import uuid
+from sqlalchemy import select
+from common.launcher import import_app_module
+
+repository = import_app_module("service-orders", "repository")
+models = import_app_module("service-orders", "models")
+OrderStatus = models.OrderStatus
+
+
+async def stats(session, user) -> dict:
+    return {s.status: (s.order_count, s.total_amount) for s in await repository.get_order_stats(session, user)}
+
+
+async def events(session) -> list:
+    rows = (await session.scalars(select(models.OrderEvent).order_by(models.OrderEvent.id))).all()
+    return [(e.order_id, e.user_id, e.type, e.old_status, e.new_status, e.published_at) for e in rows]
+
+
+def test_status_change_writes_stats_and_outbox_in_the_same_transaction(orders_db, add_users):
+    user = uuid.uuid4()
+
+    async def main():
+        async with orders_db() as maker:
+            async with maker() as session:
+                await add_users(session, user)
+                order = await repository.create_order(session, user_id=user, items=[{"sku": "a", "qty": 3, "price": 2.5}])
+                assert await stats(session, user) == {"created": (1, 7.5)}
+
+                updated = await repository.update_status(session, order.id, status=OrderStatus.in_progress)
+                assert (updated.id, updated.status) == (order.id, "in_progress")
+                assert await stats(session, user) == {"created": (0, 0), "in_progress": (1, 7.5)}
+                assert await events(session) == [
+                    (order.id, user, repository.ORDER_STATUS_CHANGED, "created", "in_progress", None),
+                ]
+
+                # setting the status it already has changes nothing and emits nothing
+                await repository.update_status(session, order.id, status=OrderStatus.in_progress)
+                assert await stats(session, user) == {"created": (0, 0), "in_progress": (1, 7.5)}
+                assert len(await events(session)) == 1
+
+                assert (await repository.cancel_order(session, order.id, user_id=user)).status == "canceled"
+                assert await stats(session, user) == {"created": (0, 0), "in_progress": (0, 0), "canceled": (1, 7.5)}
+                assert [e[3:5] for e in await events(session)] == [("created", "in_progress"), ("in_progress", "canceled")]
+
+    asyncio.run(main())
+
+
+def test_refused_updates_write_nothing(orders_db, add_users):
+    user, other = uuid.uuid4(), uuid.uuid4()
+
+    async def main():
+        async with orders_db() as maker:
+            async with maker() as session:
+                await add_users(session, user, other)
+                order = await repository.create_order(session, user_id=user, items=[{"sku": "a", "qty": 1, "price": 4}])
+                assert await repository.update_status(session, uuid.uuid4(), status=OrderStatus.done) is None
+                assert await repository.cancel_order(session, order.id, user_id=other) is None
+                await repository.update_status(session, order.id, status=OrderStatus.done)
+                # already terminal
+                assert await repository.cancel_order(session, order.id, user_id=user) is None
+
+                assert await stats(session, user) == {"created": (0, 0), "done": (1, 4)}
+                assert [e[3:5] for e in await events(session)] == [("created", "done")]
+                assert (await repository.get_order(session, order.id)).status == "done"
+
+    asyncio.run(main())
+
+
+def test_order_etag_changes_with_the_order(orders_db, add_users, orders_api):
+    user = uuid.uuid4()
+
+    async def main():
+        async with orders_db() as maker:
+            async with maker() as session:
+                await add_users(session, user)
+                order = await repository.create_order(session, user_id=user, items=[{"sku": "a", "qty": 1, "price": 1}])
+            async with orders_api(maker, user, roles=["manager"]) as client:
+                path = f"/api/v1/orders/{order.id}"
+                tag = (await client.get(path)).headers["etag"]
+                resp = await client.get(path, headers={"if-none-match": tag})
+                assert (resp.status_code, resp.headers["etag"]) == (304, tag)
+
+                assert (await client.patch(f"{path}/status", json={"status": "done"})).status_code == 200
+                resp = await client.get(path, headers={"if-none-match": tag})
+                assert resp.status_code == 200
+                assert resp.headers["etag"] != tag
+
+    asyncio.run(main())
@@ -0,0 +1,189 @@
+import asyncio
+import httpx
+import pytest
+import redis.asyncio as redis
+from common import jwt, ratelimit
+from common.ratelimit import RateLimiter
+
+
+class FakePipeline:
+    def __init__(self, store, fail):
+        self.store = store
+        self.fail = fail
+        self.ops = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def incrby(self, key, amount):
+        self.ops.append((key, amount))
+
+    def expire(self, key, seconds):
+        self.ops.append((key, None))
+
+    async def execute(self):
+        if self.fail:
+            raise redis.ConnectionError("redis is down")
+        results = []
+        for key, amount in self.ops:
+            if amount is None:
+                results.append(True)
+            else:
+                self.store[key] = self.store.get(key, 0) + amount
+                results.append(self.store[key])
+        return results
+
+
+class FakeRedis:
+    """The part of redis.asyncio the limiter uses: pipelined INCRBY/EXPIRE."""
+
+    def __init__(self):
+        self.store = {}
+        self.fail = False
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self.store, self.fail)
+
+
+@pytest.fixture
+def wall(monkeypatch):
+    clock = [30.0]
+    monkeypatch.setattr(ratelimit.time, "time", lambda: clock[0])
+    return clock
+
+
+def make_limiters(server, spec="10/60", workers=1):
+    limiters = []
+    for _ in range(2):
+        limiter = RateLimiter(workers=workers)
+        limiter._redis = server
+        limiter.redis_ok = True
+        limiter.add_limit("orders", spec)
+        limiters.append(limiter)
+    return limiters
+
+
+def hits(limiter, n, now=0.0):
+    return [limiter.hit("orders", "sub:u1", now=now) for _ in range(n)]
+
+
+def tokens(limiter):
+    return limiter._buckets[("orders", "sub:u1")].tokens
+
+
+def test_sync_debits_hits_made_by_other_instances(wall):
+    server = FakeRedis()
+    a, b = make_limiters(server)
+    hits(a, 3)
+    hits(b, 4)
+    asyncio.run(a.sync(now=0.0))
+    asyncio.run(b.sync(now=0.0))
+    assert server.store == {"rl:orders:sub:u1:0": 7}
+    assert tokens(a) == 7
+    assert tokens(b) == 3
+
+    hits(a, 1)
+    asyncio.run(a.sync(now=0.0))
+    # only b's 4 hits are remote for a; nothing is debited twice
+    assert tokens(a) == 2
+    assert a._buckets[("orders", "sub:u1")].remote_hits == 4
+
+    hits(b, 3)
+    assert hits(b, 1) != [0.0]
+    assert b.rejected == 1
+
+
+def test_sync_starts_over_in_a_new_window(wall):
+    server = FakeRedis()
+    a, b = make_limiters(server)
+    hits(a, 5)
+    hits(b, 5)
+    asyncio.run(a.sync(now=0.0))
+    asyncio.run(b.sync(now=0.0))
+    assert tokens(b) == 0
+
+    wall[0] = 90.0
+    # refilled by the local clock; the previous window's remote hits are not debited again
+    hits(a, 1, now=60.0)
+    hits(b, 2, now=60.0)
+    asyncio.run(a.sync(now=60.0))
+    asyncio.run(b.sync(now=60.0))
+    assert server.store["rl:orders:sub:u1:1"] == 3
+    assert tokens(a) == 9
+    assert tokens(b) == 7
+    assert b._buckets[("orders", "sub:u1")].window_hits == 2
+    assert b._buckets[("orders", "sub:u1")].remote_hits == 1
+
+
+def test_sync_falls_back_to_local_buckets_when_redis_fails(wall):
+    server = FakeRedis()
+    a, _ = make_limiters(server)
+    server.fail = True
+    hits(a, 2)
+    asyncio.run(a.sync(now=0.0))
+    assert a.redis_ok is False
+    assert a.sync_errors == 1
+    assert a.stats()["mode"] == "local_fallback"
+    assert tokens(a) == 8
+
+    server.fail = False
+    hits(a, 1)
+    asyncio.run(a.sync(now=0.0))
+    assert a.redis_ok is True
+    assert server.store == {"rl:orders:sub:u1:0": 1}
+
+
+def test_new_buckets_hold_one_workers_share_until_synced(wall):
+    server = FakeRedis()
+    a, b = make_limiters(server, workers=4)
+    # 10/60 over 4 workers: 2.5 tokens each instead of a full burst of 10 per worker
+    assert hits(a, 3) == [0.0, 0.0, 3.0]
+    assert hits(b, 2) == [0.0, 0.0]
+    # refilling stops at the share too
+    assert hits(a, 1, now=60.0) == [0.0]
+    assert tokens(a) == 1.5
+
+    asyncio.run(a.sync(now=60.0))
+    asyncio.run(b.sync(now=60.0))
+    assert server.store == {"rl:orders:sub:u1:0": 5}
+    assert tokens(b) == -2.5
+    # once synced, buckets refill to the full limit
+    hits(a, 1, now=120.0)
+    hits(b, 1, now=120.0)
+    assert (tokens(a), tokens(b)) == (9, 9)
+
+
+def test_new_buckets_without_redis_split_the_limit_up_front():
+    limiter = RateLimiter(workers=4)
+    assert limiter.add_limit("orders", "10/60").times == 2
+    assert hits(limiter, 3) == [0.0, 0.0, 30.0]
+
+
+async def chunks(*parts: bytes):
+    for part in parts:
+        yield part
+
+
+def test_gateway_keys_buckets_by_the_verified_sub_without_verifying_again(gateway, mock_upstream, bearer, monkeypatch):
+    verified = []
+
+    def decode(token, *args):
+        verified.append(token)
+        return decode_jwt_cached(token, *args)
+
+    decode_jwt_cached = jwt.decode_jwt_cached
+    monkeypatch.setattr(jwt, "decode_jwt_cached", decode)
+    monkeypatch.setattr(gateway.limiter, "_buckets", {})
+    mock_upstream("orders", lambda r: httpx.Response(200, content=chunks(b"{}")))
+
+    async def send():
+        transport = httpx.ASGITransport(app=gateway.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://gateway.test") as client:
+            return await client.get("/api/v1/orders", headers=bearer("u-42"))
+
+    assert asyncio.run(send()).status_code == 200
+    assert len(verified) == 1
+    assert list(gateway.limiter._buckets) == [("orders", "sub:u-42")]
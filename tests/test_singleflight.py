@@ -0,0 +1,120 @@
+import asyncio
+import pytest
+from common.singleflight import SingleFlight
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_followers_share_the_leaders_result():
+    async def main():
+        flight = SingleFlight()
+        release = asyncio.Event()
+        calls = 0
+
+        async def fetch():
+            nonlocal calls
+            calls += 1
+            await release.wait()
+            return {"id": 1}
+
+        tasks = [asyncio.create_task(flight.do("k", fetch)) for _ in range(3)]
+        await asyncio.sleep(0)
+        release.set()
+        results = await asyncio.gather(*tasks)
+        assert calls == 1
+        assert results[0] is results[1] is results[2]
+        assert flight.stats() == {"in_flight": 0, "leaders": 1, "shared": 2, "timeouts": 0}
+
+    run(main())
+
+
+def test_followers_get_the_leaders_exception():
+    async def main():
+        flight = SingleFlight()
+        release = asyncio.Event()
+
+        async def fetch():
+            await release.wait()
+            raise RuntimeError("upstream down")
+
+        tasks = [asyncio.create_task(flight.do("k", fetch)) for _ in range(2)]
+        await asyncio.sleep(0)
+        release.set()
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+        assert all(isinstance(r, RuntimeError) for r in results)
+        assert results[0] is results[1]
+        assert flight.stats()["in_flight"] == 0
+
+    run(main())
+
+
+def test_follower_runs_its_own_call_after_max_wait():
+    async def main():
+        flight = SingleFlight(max_wait=0.01)
+        release = asyncio.Event()
+
+        async def slow():
+            await release.wait()
+            return "leader"
+
+        async def fast():
+            return "follower"
+
+        leader = asyncio.create_task(flight.do("k", slow))
+        await asyncio.sleep(0)
+        assert await flight.do("k", fast) == "follower"
+        assert flight.timeouts == 1
+        release.set()
+        assert await leader == "leader"
+        assert flight.shared == 0
+
+    run(main())
+
+
+def test_followers_survive_a_cancelled_leader():
+    async def main():
+        flight = SingleFlight()
+        calls = 0
+
+        async def fetch():
+            nonlocal calls
+            calls += 1
+            if calls == 1:
+                await asyncio.Event().wait()
+            return calls
+
+        leader = asyncio.create_task(flight.do("k", fetch))
+        await asyncio.sleep(0)
+        follower = asyncio.create_task(flight.do("k", fetch))
+        await asyncio.sleep(0)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        assert await follower == 2
+        assert flight.stats()["in_flight"] == 0
+
+    run(main())
+
+
+def test_cancelled_follower_leaves_the_leader_running():
+    async def main():
+        flight = SingleFlight()
+        release = asyncio.Event()
+
+        async def fetch():
+            await release.wait()
+            return "ok"
+
+        leader = asyncio.create_task(flight.do("k", fetch))
+        await asyncio.sleep(0)
+        follower = asyncio.create_task(flight.do("k", fetch))
+        await asyncio.sleep(0)
+        follower.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await follower
+        release.set()
+        assert await leader == "ok"
+
+    run(main())
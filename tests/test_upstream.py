@@ -0,0 +1,41 @@
+import asyncio
+from common.upstream import UpstreamPool
+
+
+def test_streaming_client_has_its_own_pool():
+    async def main():
+        pool = UpstreamPool(max_connections=2, stream_max_connections=None)
+        pool.register("users", "http://users.test")
+        pool.register("orders", "http://orders.test", streams=True)
+        await pool.start()
+        try:
+            shared, streaming = pool.client("orders"), pool.client("orders", stream=True)
+            assert shared is not streaming
+            assert shared._transport._pool is not streaming._transport._pool
+            stats = pool.stats()
+            assert stats["orders"]["max_connections"] == 2
+            # uncapped: open exports and SSE subscribers never queue behind each other
+            assert stats["orders:stream"]["max_connections"] is None
+            assert "users:stream" not in stats
+            assert str(streaming.base_url) == "http://orders.test"
+        finally:
+            await pool.aclose()
+
+    asyncio.run(main())
+
+
+def test_streaming_client_only_for_registered_upstreams():
+    async def main():
+        pool = UpstreamPool(stream_max_connections=10)
+        pool.register("users", "http://users.test")
+        await pool.start()
+        try:
+            pool.client("users", stream=True)
+        except RuntimeError as exc:
+            assert "streaming upstream 'users'" in str(exc)
+        else:
+            raise AssertionError("expected RuntimeError")
+        finally:
+            await pool.aclose()
+
+    asyncio.run(main())
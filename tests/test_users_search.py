@@ -0,0 +1,47 @@
+import asyncio
+from sqlalchemy import insert
+from common.launcher import import_app_module
+
+repository = import_app_module("service-users", "repository")
+models = import_app_module("service-users", "models")
+
+
+async def add(session, *names):
+    for i, name in enumerate(names):
+        await session.execute(
+            insert(models.User).values(email=f"{name.replace(' ', '.')}.{i}@example.com", password_hash="x", name=name)
+        )
+    await session.commit()
+
+
+def test_search_ranks_the_closest_matches_not_the_first_found(users_db):
+    async def main():
+        async with users_db() as maker:
+            async with maker() as session:
+                # the broad matches go in first, so a plain LIMIT would pick them as candidates
+                await add(session, *(f"annabelle marie-louise {i}" for i in range(8)))
+                await add(session, "anna", "ann")
+                rows, total, capped = await repository.list_users(session, query="Ann", size=2, count_cap=3)
+                assert [u.name for u in rows] == ["ann", "anna"]
+                assert (total, capped) == (3, True)
+
+    asyncio.run(main())
+
+
+def test_search_pages_are_stable_across_requests(users_db):
+    async def main():
+        async with users_db() as maker:
+            async with maker() as session:
+                # equal names rank equally; the id tiebreaker decides their order
+                await add(session, *(["sam"] * 6))
+                pages = []
+                for _ in range(3):
+                    first, _, _ = await repository.list_users(session, query="sam", page=1, size=3, count_cap=100)
+                    second, _, _ = await repository.list_users(session, query="sam", page=2, size=3, count_cap=100)
+                    pages.append(([u.id for u in first], [u.id for u in second]))
+                assert pages[0] == pages[1] == pages[2]
+                first, second = pages[0]
+                assert first + second == sorted(first + second)
+                assert len(set(first + second)) == 6
+
+    asyncio.run(main())